@@ -0,0 +1,92 @@
+"""
+Benchmark CPU de la construction des e-mails de confirmation SMTP
+Compare, par message, l'arbre MIMEMultipart/MIMEText sérialisé par le paquet
+email (chemin générique de send_email) et le squelette pré-encodé de
+utils.mime_builder (chemin de send_confirmation_email). Aucun envoi réseau.
+
+Usage:
+    python bench_mime.py
+    python bench_mime.py --messages 20000 --form-id mon-formulaire
+"""
+import argparse
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Optional
+
+from utils.mime_builder import MimeBuilder
+from utils.templates import CONFIRMATION_TEMPLATE, confirmation_values, render_confirmation, templates
+
+FROM_EMAIL = "noreply@example.com"
+FROM_NAME = "Auto-Responder"
+
+
+def build_mime_tree(index: int, form_id: Optional[str]) -> bytes:
+    """Chemin générique: rendu des templates puis arbre MIME sérialisé"""
+    to_email = f"user{index}@example.com"
+    display_name = f"Élodie Dupont {index}"
+    html_content, text_content = render_confirmation(display_name, to_email, form_id)
+
+    message = MIMEMultipart('alternative')
+    message['From'] = f"{FROM_NAME} <{FROM_EMAIL}>"
+    message['To'] = to_email
+    message['Subject'] = f"Confirmation - Formulaire recu de {display_name}"
+    message.attach(MIMEText(text_content, 'plain', 'utf-8'))
+    message.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return message.as_bytes(policy=message.policy.clone(linesep='\r\n'))
+
+
+def build_preencoded(builder: MimeBuilder, index: int, form_id: Optional[str]) -> bytes:
+    """Chemin pré-encodé: en-têtes du destinataire et valeurs insérées dans le squelette"""
+    to_email = f"user{index}@example.com"
+    display_name = f"Élodie Dupont {index}"
+    return builder.build(
+        to_email,
+        f"Confirmation - Formulaire recu de {display_name}",
+        templates.get(CONFIRMATION_TEMPLATE, form_id),
+        templates.get_text(CONFIRMATION_TEMPLATE, form_id),
+        confirmation_values(display_name, to_email)
+    ).data
+
+
+def measure(build: Callable[[int], bytes], messages: int, repeat: int) -> float:
+    """
+    Mesure le coût moyen d'un message (meilleure de plusieurs séries)
+
+    Returns:
+        Microsecondes CPU par message
+    """
+    for index in range(min(messages, 200)):
+        build(index)  # préchauffage (templates et squelettes en cache)
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        for index in range(messages):
+            build(index)
+        best = min(best, time.process_time() - start)
+    return best / messages * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de construction des e-mails de confirmation")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages par série")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de séries")
+    parser.add_argument("--form-id", default=None, help="Template d'un formulaire (optionnel)")
+    args = parser.parse_args()
+
+    builder = MimeBuilder(FROM_EMAIL, FROM_NAME)
+    size_tree = len(build_mime_tree(0, args.form_id))
+    size_raw = len(build_preencoded(builder, 0, args.form_id))
+
+    tree = measure(lambda i: build_mime_tree(i, args.form_id), args.messages, args.repeat)
+    raw = measure(lambda i: build_preencoded(builder, i, args.form_id), args.messages, args.repeat)
+
+    print(f"{'Chemin':<28}{'µs/message':>12}{'octets':>10}")
+    print(f"{'MIMEMultipart + as_bytes':<28}{tree:>12.1f}{size_tree:>10}")
+    print(f"{'Squelette pré-encodé':<28}{raw:>12.1f}{size_raw:>10}")
+    print(f"Gain: x{tree / raw:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark du débit de publication AWS SNS
+Compare des envois séquentiels (un publish à la fois) et l'envoi parallèle
+par lot de AWSSNSService (threads d'envoi + pool de connexions HTTP), d'abord
+sans limite de débit (transport seul), puis aux réglages SNS_SENDER_* du
+dispatcher (.env ou valeurs par défaut): c'est ce second débit qu'obtient
+l'application. Par défaut un bouchon SNS local répond à chaque publish après
+--latency ms: aucun SMS réel n'est envoyé.
+
+Usage:
+    python bench_sns.py
+    python bench_sns.py --messages 2000 --latency 40 --concurrency 100
+    python bench_sns.py --sender-rate 200 --sender-burst 20   # quota MPS du compte
+    python bench_sns.py --endpoint http://localhost:4566   # bouchon externe (LocalStack...)
+"""
+import argparse
+import logging
+import os
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs
+
+
+class StubSNSHandler(BaseHTTPRequestHandler):
+    """Répond aux actions SNS (protocole query) avec une réponse vide réussie"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive: connexions réutilisées par le pool botocore
+    latency = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        action = parse_qs(body).get("Action", ["Publish"])[0]
+        time.sleep(self.latency)
+        result = f"<MessageId>{uuid.uuid4()}</MessageId>" if action == "Publish" else ""
+        payload = (
+            f'<{action}Response xmlns="http://sns.amazonaws.com/doc/2010-03-31/">'
+            f"<{action}Result>{result}</{action}Result>"
+            f"<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata>"
+            f"</{action}Response>"
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency_ms: float) -> str:
+    """Démarre le bouchon SNS sur un port libre et retourne son URL"""
+    StubSNSHandler.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSNSHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_batch(recipients, sender_rate: str, sender_burst: str, sequential: int):
+    """
+    Envoie le lot avec un service configuré pour le débit donné
+
+    Returns:
+        (résultats séquentiels, débit séquentiel, résultats du lot, débit du lot, service)
+    """
+    os.environ.update({"SNS_SENDER_RATE": sender_rate, "SNS_SENDER_BURST": sender_burst})
+
+    from services.aws_sns_service import AWSSNSService
+
+    service = AWSSNSService()
+
+    start = time.perf_counter()
+    sequential_results = [service.send_confirmation_sms(phone, name) for phone, name in recipients[:sequential]]
+    sequential_rate = len(sequential_results) / (time.perf_counter() - start) if sequential_results else 0
+
+    # Débit mesuré jusqu'à la fin des SMS différés (close attend la file différée)
+    start = time.perf_counter()
+    parallel = service.send_confirmation_sms_batch(recipients)
+    service.close()
+    parallel_rate = (service.get_publish_stats()["published"] - sequential_results.count(True)) / (
+        time.perf_counter() - start
+    )
+    return sequential_results, sequential_rate, parallel, parallel_rate, service
+
+
+def main():
+    from config.constants import Config
+
+    parser = argparse.ArgumentParser(description="Benchmark du débit de publication SNS")
+    parser.add_argument("--messages", type=int, default=500, help="SMS par série")
+    parser.add_argument("--latency", type=float, default=30, help="Latence du bouchon local (ms)")
+    parser.add_argument("--concurrency", type=int, default=50, help="SNS_PUBLISH_CONCURRENCY")
+    parser.add_argument("--endpoint", default=None, help="Endpoint SNS existant (sinon bouchon local)")
+    parser.add_argument("--sequential", type=int, default=50, help="SMS de la série séquentielle")
+    parser.add_argument("--sender-rate", default=os.getenv("SNS_SENDER_RATE", str(Config.SNS_SENDER_RATE)),
+                        help="SNS_SENDER_RATE de la série aux réglages du dispatcher (0: sans limite)")
+    parser.add_argument("--sender-burst", default=os.getenv("SNS_SENDER_BURST", str(Config.SNS_SENDER_BURST)),
+                        help="SNS_SENDER_BURST de la série aux réglages du dispatcher")
+    args = parser.parse_args()
+
+    endpoint = args.endpoint or start_stub(args.latency)
+    os.environ.update({
+        "AWS_SNS_ENDPOINT_URL": endpoint,
+        "AWS_ACCESS_KEY_ID": os.getenv("AWS_ACCESS_KEY_ID", "bench"),
+        "AWS_SECRET_ACCESS_KEY": os.getenv("AWS_SECRET_ACCESS_KEY", "bench"),
+        "SNS_PUBLISH_CONCURRENCY": str(args.concurrency)
+    })
+    logging.disable(logging.WARNING)  # un log par SMS envoyé ou refusé
+
+    recipients = [(f"+3361234{index:04d}", f"Élodie Dupont {index}") for index in range(args.messages)]
+
+    # Transport seul: débit opérateur hors mesure
+    sequential, sequential_rate, parallel, parallel_rate, service = run_batch(
+        recipients, "0", "1", args.sequential
+    )
+    # Réglages du dispatcher: débit effectif de l'application (SMS différés au-delà de SMS_MAX_QUEUE_WAIT)
+    _, _, limited, limited_rate, limited_service = run_batch(
+        recipients, args.sender_rate, args.sender_burst, 0
+    )
+
+    print(f"Endpoint: {endpoint} ({'bouchon local, ' + format(args.latency, 'g') + ' ms' if not args.endpoint else 'externe'})")
+    print(f"{'Chemin':<44}{'SMS':>7}{'SMS/s':>10}{'échecs':>8}")
+    print(f"{'Séquentiel (1 publish à la fois)':<44}{len(sequential):>7}{sequential_rate:>10.0f}"
+          f"{sequential.count(False):>8}")
+    print(f"{'Lot parallèle (' + str(args.concurrency) + ' connexions)':<44}{len(parallel):>7}"
+          f"{parallel_rate:>10.0f}{parallel.count(False):>8}")
+    print(f"{'Lot, dispatcher ' + args.sender_rate + ' seg/s, burst ' + args.sender_burst:<44}{len(limited):>7}"
+          f"{limited_rate:>10.0f}{limited.count(False):>8}")
+    print(f"Gain du lot parallèle (transport): x{parallel_rate / sequential_rate:.1f}")
+    print(service.get_publish_stats())
+    dispatch = limited_service.get_dispatch_stats()
+    print(f"Dispatcher: {limited_service.get_publish_stats()['published']} publiés, "
+          f"dont {dispatch['deferred']} différés (attente > "
+          f"{os.getenv('SMS_MAX_QUEUE_WAIT', Config.SMS_MAX_QUEUE_WAIT)} s), {dispatch['rejected']} refusés")
+
+if __name__ == "__main__":
+    main()
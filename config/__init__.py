@@ -1,6 +1,7 @@
 """Configuration package"""
 from .constants import (
     Config,
+    WriteStatus,
     ErrorMessages,
     SuccessMessages,
     InfoMessages,
@@ -12,6 +13,7 @@ from .constants import (
 
 __all__ = [
     'Config',
+    'WriteStatus',
     'ErrorMessages',
     'SuccessMessages',
     'InfoMessages',
@@ -3,6 +3,7 @@ Configuration et constantes centralisées
 Tous les messages, templates et configurations sont définis ici
 """
 from datetime import datetime
+from typing import Optional
 
 
 # ============= CONFIGURATION =============
@@ -13,7 +14,134 @@ class Config:
     MAX_RETRIES = 3
     RETRY_DELAY = 2  # secondes
     SMS_MAX_LENGTH = 160
+    SMS_MAX_SEGMENTS = 2  # segments facturés par SMS au maximum (GSM-7: 160/153, UCS-2: 70/67 caractères)
+    SMS_GSM_TRANSLITERATE = False  # remplacer les caractères hors GSM-7 (ç -> c, emoji retirés)
+    
+    # Débit par expéditeur SMS (numéros Twilio / Sender IDs SNS): file lissée au lieu de 429
+    SMS_SENDER_RATE = 1.0  # segments par seconde et par numéro Twilio (long code: 1)
+    SMS_SENDER_BURST = 1
+    # Attente maximum dans la requête (secondes) avant envoi différé: une requête
+    # /api/receive reste ouverte pendant l'attente, à relever seulement avec RECEIVE_MODE=queue
+    SMS_MAX_QUEUE_WAIT = 5
+    SMS_THROTTLE_PAUSE = 5  # pause d'un expéditeur refusé par l'opérateur (secondes)
+    # Au-delà de SMS_MAX_QUEUE_WAIT, le SMS part en arrière-plan au débit autorisé;
+    # True: refuser le message à la place (ancien comportement, SMS perdu)
+    SMS_DROP_ON_SATURATION = False
+    SMS_DEFERRED_DRAIN_TIMEOUT = 30  # attente des SMS différés à l'arrêt (secondes)
+    
+    # Publication AWS SNS: threads d'envoi et connexions HTTP du client (même taille)
+    SNS_PUBLISH_CONCURRENCY = 50
+    # Débit local par Sender ID SNS (segments/s), 0: sans limite (quota MPS appliqué par AWS,
+    # Throttling géré par pause du Sender ID); sinon le quota MPS du compte
+    SNS_SENDER_RATE = 0
+    SNS_SENDER_BURST = 1
+    # SenderID/type par défaut via SetSMSAttributes au démarrage: modifie les réglages SMS
+    # de tout le compte AWS (autres applications comprises), donc à activer explicitement
+    SNS_SET_SMS_ATTRIBUTES = False
+    
     STATS_CACHE_TTL = 300  # 5 minutes
+    STATS_CACHE_MAX_STALE = 3600  # valeur périmée servie pendant le rafraîchissement
+    STATS_CACHE_PATH = "data/stats_cache.bin"  # partagé entre les workers de l'hôte
+    
+    # Mode de réception: "sync" (traitement inline) ou "queue" (202 + workers)
+    RECEIVE_MODE = "sync"
+    DISPATCH_WORKERS = 4
+    DISPATCH_QUEUE_PATH = "data/dispatch_queue.jsonl"
+    DISPATCH_COMPACT_THRESHOLD = 1000  # entrées "done" avant compaction du journal
+    
+    # Pool de threads borné pour les appels bloquants (SDK email/SMS, base de données)
+    SEND_EXECUTOR_WORKERS = 16
+    
+    # Ingestion par lots (/api/receive/batch)
+    BATCH_MAX_ITEMS = 1000
+    BATCH_SEND_CONCURRENCY = 10
+    FIRESTORE_BATCH_SIZE = 500  # limite Firestore par WriteBatch
+    FIRESTORE_BATCH_WRITES = True  # coalescer les écritures unitaires
+    FIRESTORE_BATCH_DELAY_MS = 20
+    
+    # Pool de sessions SMTP authentifiées (EMAIL_PROVIDER=smtp)
+    SMTP_POOL_SIZE = 4
+    SMTP_POOL_IDLE_TIMEOUT = 120  # secondes avant fermeture d'une session inactive
+    SMTP_KEEPALIVE_INTERVAL = 30  # secondes d'inactivité avant NOOP
+    SMTP_MAX_MESSAGES_PER_CONNECTION = 100  # limite par session du serveur (Gmail: 100)
+    SMTP_DRAIN_ENABLED = True  # envoyer les rafales par groupes sur une même session
+    SMTP_DRAIN_DELAY_MS = 5
+    SMTP_DRAIN_MAX_BATCH = 200
+    SMTP_PREENCODED_MIME = True  # confirmations assemblées à partir de parties pré-encodées
+    
+    # Bascule entre providers e-mail (EMAIL_PROVIDER en premier, puis l'autre s'il est configuré)
+    # Désactivée par défaut: les deux providers doivent être configurés et l'expéditeur vérifié sur chacun
+    EMAIL_FAILOVER_ENABLED = False
+    EMAIL_HEDGE_AFTER_MS = 0  # budget de latence avant envoi de couverture (0 = désactivé)
+    BREAKER_WINDOW = 20  # derniers appels évalués par le disjoncteur
+    BREAKER_MIN_CALLS = 5
+    BREAKER_FAILURE_RATE = 0.5
+    BREAKER_SLOW_CALL_MS = 10000
+    BREAKER_SLOW_CALL_RATE = 0.5
+    BREAKER_OPEN_SECONDS = 30  # durée d'ouverture avant l'appel d'essai
+    
+    # Vérification de santé en arrière-plan (/api/status lit le dernier résultat)
+    HEALTH_PROBE_INTERVAL_EMAIL = 300  # secondes (SMTP: connexion TLS + login)
+    HEALTH_PROBE_INTERVAL_SMS = 300  # secondes (Twilio: appel API)
+    HEALTH_PROBE_TIMEOUT = 15
+    
+    # Templates d'e-mails précompilés (templates/forms/<form_id>/ par formulaire)
+    TEMPLATES_DIR = "templates"
+    TEMPLATES_RELOAD_INTERVAL = 2  # secondes entre deux vérifications d'un fichier
+    TEMPLATES_CACHE_SIZE = 256  # chemins en cache (LRU), fichiers absents compris
+    
+    # Transport HTTP async partagé (SendGrid, Twilio)
+    HTTP_MAX_CONNECTIONS = 100
+    HTTP_MAX_CONNECTIONS_PER_HOST = 20
+    HTTP_KEEPALIVE_TIMEOUT = 60  # secondes
+    HTTP_DNS_CACHE_TTL = 300  # secondes (0 = désactivé)
+    HTTP_TIMEOUT = 30
+    HTTP_CONNECT_TIMEOUT = 10
+    
+    # Envoi groupé SendGrid: une requête mail/send avec une personalization par destinataire
+    SENDGRID_BATCH_ENABLED = True
+    SENDGRID_BATCH_DELAY_MS = 50
+    SENDGRID_MAX_PERSONALIZATIONS = 1000  # limite de l'API v3
+    
+    # Spool local des écritures Firestore en échec (rejoué en arrière-plan)
+    SPOOL_ENABLED = True
+    SPOOL_PATH = "data/firestore_spool.jsonl"
+    SPOOL_COMPACT_THRESHOLD = 1000
+    SPOOL_REPLAY_INTERVAL = 5  # secondes
+    
+    # Base locale SQLite (DATABASE_BACKEND=sqlite)
+    SQLITE_PATH = "data/responses.db"
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    
+    # Journal append-only local (DATABASE_BACKEND=logstore)
+    LOG_STORE_DIR = "data/logstore"
+    LOG_STORE_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+    LOG_STORE_COMPACT_MIN_SEGMENTS = 4  # segments scellés avant compaction
+    LOG_STORE_FSYNC = True
+    
+    # Pagination de /api/responses
+    RESPONSES_PAGE_SIZE = 100
+    RESPONSES_MAX_PAGE_SIZE = 1000
+    
+    # Compteurs de statistiques maintenus à l'écriture
+    STATS_COUNTERS_COLLECTION = "stats_counters"
+    STATS_COUNTER_SHARDS = 10
+    STATS_RECONCILE_INTERVAL = 3600  # secondes (0 = désactivé)
+    
+    # Index de déduplication local (Bloom + LRU) devant Firestore
+    DEDUPE_INDEX_ENABLED = True
+    DEDUPE_BLOOM_CAPACITY = 1_000_000
+    DEDUPE_BLOOM_ERROR_RATE = 0.001  # ~1.8 Mo pour 1M d'IDs
+    DEDUPE_LRU_SIZE = 10_000
+    DEDUPE_WARMUP_DAYS = 30
+
+
+# ============= RÉSULTATS D'ÉCRITURE =============
+class WriteStatus:
+    """Résultats distincts des écritures create-if-absent en base"""
+    CREATED = "created"
+    DUPLICATE = "duplicate"
+    FAILED = "failed"
 
 
 # ============= MESSAGES D'ERREUR =============
@@ -38,6 +166,9 @@ class ErrorMessages:
     # Traitement
     ALREADY_PROCESSED = "This response has already been processed"
     PROCESSING_FAILED = "Failed to process form response: {error}"
+    BATCH_TOO_LARGE = "Batch too large: {count} items (max {max_items})"
+    INVALID_QUERY_PARAMETER = "Invalid query parameter {name}: {error}"
+    INVALID_BATCH_FORMAT = "Invalid batch format: expected a JSON array of submissions"
     
     # SendGrid
     SENDGRID_API_KEY_MISSING = "SENDGRID_API_KEY not configured, email service disabled"
@@ -54,6 +185,14 @@ class ErrorMessages:
     FIRESTORE_QUERY_FAILED = "Firestore query failed: {error}"
     FIRESTORE_WRITE_FAILED = "Failed to write to Firestore: {error}"
     FIRESTORE_DELETE_FAILED = "Failed to delete from Firestore: {error}"
+    
+    # Base locale (SQLite / log-structured)
+    LOCAL_DB_INIT_FAILED = "Local database initialization failed: {error}"
+    LOCAL_DB_QUERY_FAILED = "Local database query failed: {error}"
+    LOCAL_DB_WRITE_FAILED = "Failed to write to local database: {error}"
+    LOG_STORE_LOCKED = ("{path} is already opened by another process (pid {pid}): "
+                        "the logstore backend supports a single worker, run uvicorn with --workers 1 "
+                        "or use DATABASE_BACKEND=sqlite for several workers")
 
 
 # ============= MESSAGES DE SUCCÈS =============
@@ -74,6 +213,8 @@ class SuccessMessages:
     # Traitement
     RESPONSE_PROCESSED = "Form response processed successfully"
     RESPONSE_RECORDED = "Response recorded in database: {response_id}"
+    RESPONSE_CLAIMED = "Response claimed for dispatch: {response_id}"
+    RESPONSE_FINALIZED = "Response finalized: {response_id}"
     
     # Base de données
     DATA_SAVED = "Data saved successfully"
@@ -90,6 +231,8 @@ class InfoMessages:
     DUPLICATE_DETECTED = "Duplicate submission detected: {response_id}"
     PARTIAL_SUCCESS = "Partial success: Email={email_ok}, SMS={sms_ok}"
     RESPONSE_PROCESSED = "Form response processed successfully"
+    SUBMISSION_QUEUED = "Submission queued for dispatch: {response_id}"
+    BATCH_PROCESSED = "Batch processed: {total} items, {new} new, {duplicates} duplicates, {invalid} invalid"
 
 
 # ============= TEMPLATES EMAIL =============
@@ -97,122 +240,22 @@ class EmailTemplates:
     """Templates d'emails HTML"""
     
     @staticmethod
-    def get_confirmation_html(display_name: str, email: str) -> str:
-        """Template de confirmation de soumission"""
-        timestamp = datetime.now().strftime("%d/%m/%Y à %H:%M")
-        
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>
-                body {{ 
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-                    line-height: 1.6; 
-                    color: #333;
-                    margin: 0;
-                    padding: 0;
-                    background-color: #f5f5f5;
-                }}
-                .container {{ 
-                    max-width: 600px; 
-                    margin: 20px auto; 
-                    background-color: #ffffff;
-                    border-radius: 8px;
-                    overflow: hidden;
-                    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                }}
-                .header {{ 
-                    background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
-                    color: white; 
-                    padding: 30px 20px; 
-                    text-align: center;
-                }}
-                .header h1 {{
-                    margin: 0;
-                    font-size: 24px;
-                    font-weight: 600;
-                }}
-                .content {{ 
-                    padding: 30px;
-                    background-color: #ffffff;
-                }}
-                .content p {{
-                    margin: 15px 0;
-                    color: #555;
-                }}
-                .highlight {{
-                    background-color: #f0f8f0;
-                    border-left: 4px solid #4CAF50;
-                    padding: 15px;
-                    margin: 20px 0;
-                    border-radius: 4px;
-                }}
-                .details {{
-                    margin-top: 30px;
-                    padding-top: 20px;
-                    border-top: 1px solid #e0e0e0;
-                }}
-                .details p {{
-                    margin: 8px 0;
-                    font-size: 14px;
-                }}
-                .footer {{ 
-                    text-align: center; 
-                    padding: 20px;
-                    background-color: #f9f9f9;
-                    border-top: 1px solid #e0e0e0;
-                }}
-                .footer p {{
-                    margin: 5px 0;
-                    font-size: 12px;
-                    color: #999;
-                }}
-                .icon {{
-                    font-size: 20px;
-                    margin-right: 8px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>✅ Confirmation de réception</h1>
-                </div>
-                <div class="content">
-                    <p>Bonjour <strong>{display_name}</strong>,</p>
-                    
-                    <div class="highlight">
-                        <p style="margin: 0;">
-                            <strong>🎉 Votre formulaire a été enregistré avec succès !</strong>
-                        </p>
-                    </div>
-                    
-                    <p>Nous avons bien reçu votre soumission et elle sera traitée dans les plus brefs délais.</p>
-                    
-                    <p>Notre équipe examinera votre demande et vous contactera si nécessaire.</p>
-                    
-                    <div class="details">
-                        <p><strong>📋 Détails de votre soumission:</strong></p>
-                        <p><span class="icon">📧</span> E-mail: {email}</p>
-                        <p><span class="icon">📅</span> Date: {timestamp}</p>
-                        <p><span class="icon">✓</span> Statut: Confirmé</p>
-                    </div>
-                    
-                    <p style="margin-top: 30px; font-size: 14px; color: #666;">
-                        Si vous avez des questions concernant votre soumission, n'hésitez pas à nous contacter.
-                    </p>
-                </div>
-                <div class="footer">
-                    <p>Cet e-mail a été envoyé automatiquement, merci de ne pas y répondre.</p>
-                    <p>© {datetime.now().year} Google Forms Auto-Responder - Tous droits réservés</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+    def get_confirmation_html(display_name: str, email: str, timestamp: Optional[str] = None,
+                              form_id: Optional[str] = None) -> str:
+        """Template de confirmation de soumission (templates/confirmation.html précompilé)"""
+        from utils.templates import CONFIRMATION_TEMPLATE, confirmation_values, templates
+        return templates.get(CONFIRMATION_TEMPLATE, form_id).render(
+            confirmation_values(display_name, email, timestamp)
+        )
+    
+    @staticmethod
+    def get_confirmation_text(display_name: str, email: str, timestamp: Optional[str] = None,
+                              form_id: Optional[str] = None) -> str:
+        """Alternative texte de la confirmation (templates/confirmation.txt précompilé)"""
+        from utils.templates import CONFIRMATION_TEMPLATE, confirmation_values, templates
+        return templates.get_text(CONFIRMATION_TEMPLATE, form_id).render(
+            confirmation_values(display_name, email, timestamp)
+        )
     
     @staticmethod
     def get_error_notification_html(error_type: str, error_details: str) -> str:
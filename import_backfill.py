@@ -0,0 +1,316 @@
+"""
+Import en streaming d'exports historiques de formulaires (NDJSON ou CSV)
+Lit le fichier ligne par ligne, valide par blocs avec les mêmes règles que
+/api/receive, déduplique contre Firestore et écrit par WriteBatch.
+Un fichier de checkpoint permet de reprendre après un crash.
+
+Usage:
+    python import_backfill.py export.ndjson
+    python import_backfill.py export.csv --format csv --chunk-size 500
+    python import_backfill.py export.ndjson --checkpoint data/import.ckpt --mark-sent
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from config.constants import Config
+from utils.logger import setup_logger
+from utils.validators import parse_submission
+
+load_dotenv()
+
+logger = setup_logger("import_backfill")
+
+# Colonnes reconnues pour l'horodatage dans les exports Google Forms
+TIMESTAMP_COLUMNS = ('timestamp', 'Horodateur', 'Timestamp')
+
+
+def load_checkpoint(path: str, source: str) -> Dict[str, Any]:
+    """
+    Charge le checkpoint d'un import précédent pour le même fichier source
+
+    Args:
+        path: Chemin du fichier de checkpoint
+        source: Chemin du fichier importé
+
+    Returns:
+        État du checkpoint (offset à 0 si absent ou pour un autre fichier)
+    """
+    state = {"source": os.path.abspath(source), "offset": 0, "line": 0,
+             "imported": 0, "duplicates": 0, "invalid": 0, "header": None}
+    if not os.path.exists(path):
+        return state
+
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    if saved.get('source') != state['source']:
+        logger.warning(f"Checkpoint {path} belongs to another source, starting from scratch")
+        return state
+
+    state.update(saved)
+    logger.info(f"Resuming import at line {state['line']} (offset {state['offset']})")
+    return state
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    """
+    Écrit le checkpoint de manière atomique (fichier temporaire + rename)
+
+    Args:
+        path: Chemin du fichier de checkpoint
+        state: État à sauvegarder
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def csv_row_to_submission(row: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Convertit une ligne CSV en soumission compréhensible par parse_submission
+
+    Args:
+        row: Ligne CSV indexée par en-tête
+
+    Returns:
+        Soumission au format direct ou namedValues
+    """
+    timestamp = next((row[col] for col in TIMESTAMP_COLUMNS if row.get(col)), None)
+    if 'email' in row:
+        submission: Dict[str, Any] = dict(row)
+    else:
+        # Export Google Forms: mêmes en-têtes que namedValues
+        submission = {"namedValues": {key: [value] for key, value in row.items() if key}}
+    if timestamp:
+        submission['timestamp'] = timestamp
+    return submission
+
+
+def iter_records(path: str, fmt: str, state: Dict[str, Any]) -> Iterator[Tuple[int, int, Optional[Dict[str, Any]]]]:
+    """
+    Lit le fichier de manière incrémentale à partir de l'offset du checkpoint
+
+    Args:
+        path: Fichier à importer
+        fmt: "ndjson" ou "csv"
+        state: État du checkpoint (l'en-tête CSV y est mémorisé)
+
+    Yields:
+        (numéro de ligne, offset après la ligne, enregistrement ou None si illisible)
+    """
+    with open(path, 'rb') as f:
+        offset = state['offset']
+        line_no = state['line']
+
+        if fmt == 'csv' and state.get('header') is None:
+            raw = f.readline()
+            offset += len(raw)
+            line_no += 1
+            state['header'] = next(csv.reader([raw.decode('utf-8-sig')]))
+        f.seek(offset)
+
+        for raw in f:
+            offset += len(raw)
+            line_no += 1
+            try:
+                line = raw.decode('utf-8').strip()
+            except UnicodeDecodeError:
+                # Ligne non UTF-8: comptée comme invalide
+                yield line_no, offset, None
+                continue
+            if not line:
+                continue
+            try:
+                if fmt == 'csv':
+                    # Les champs multi-lignes ne sont pas supportés (une ligne = un enregistrement)
+                    values = next(csv.reader([line]))
+                    record = csv_row_to_submission(dict(zip(state['header'], values)))
+                else:
+                    record = json.loads(line)
+            except (ValueError, StopIteration):
+                record = None
+            yield line_no, offset, record
+
+
+def call_db(loop: Optional[asyncio.AbstractEventLoop], func, *args) -> Any:
+    """
+    Appelle une méthode du service de base de données depuis le script
+    Les méthodes async (DATABASE_BACKEND=firestore_async) s'exécutent sur la
+    boucle privée de l'import: le client async reste lié à une seule boucle
+
+    Args:
+        loop: Boucle privée de l'import (None: backend synchrone)
+        func: Méthode du service
+        *args: Arguments de la méthode
+
+    Returns:
+        Résultat de la méthode
+    """
+    if asyncio.iscoroutinefunction(func):
+        if loop is None:
+            raise RuntimeError(f"{func.__qualname__} is async: an event loop is required")
+        return loop.run_until_complete(func(*args))
+    return func(*args)
+
+
+def import_chunk(chunk: List[Tuple[int, Dict[str, Any]]], db_service, mark_sent: bool, dry_run: bool,
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> Dict[str, int]:
+    """
+    Valide, déduplique et écrit un bloc d'enregistrements
+
+    Args:
+        chunk: Liste de (numéro de ligne, enregistrement brut)
+        db_service: Service de base de données (sync ou async)
+        mark_sent: Marquer les envois email/SMS comme effectués
+        dry_run: Valider sans écrire
+        loop: Boucle privée pour un backend async (voir call_db)
+
+    Returns:
+        Compteurs imported / duplicates / invalid pour le bloc
+    """
+    counts = {"imported": 0, "duplicates": 0, "invalid": 0}
+    submissions = {}
+
+    for line_no, record in chunk:
+        if record is None:
+            logger.warning(f"Line {line_no}: unreadable record")
+            counts['invalid'] += 1
+            continue
+        try:
+            submission = parse_submission(record)
+        except ValueError as e:
+            logger.warning(f"Line {line_no}: {e}")
+            counts['invalid'] += 1
+            continue
+        if submission['response_id'] in submissions:
+            counts['duplicates'] += 1
+            continue
+        submissions[submission['response_id']] = submission
+
+    existing = call_db(loop, db_service.already_sent_many, list(submissions)) if submissions else set()
+    counts['duplicates'] += len(existing)
+
+    records = [
+        {
+            "response_id": s['response_id'],
+            "email": s['email'],
+            "phone": s['phone'],
+            "sent_mail": mark_sent,
+            "sent_sms": mark_sent
+        }
+        for rid, s in submissions.items() if rid not in existing
+    ]
+
+    if records and not dry_run:
+        written = call_db(loop, db_service.add_responses, records)
+        if written != len(records):
+            raise RuntimeError(f"Only {written}/{len(records)} records written")
+    counts['imported'] = len(records)
+    return counts
+
+
+def run_import(path: str, fmt: str, chunk_size: int, checkpoint_path: str,
+               mark_sent: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Importe un fichier complet par blocs avec checkpoint après chaque commit
+
+    Args:
+        path: Fichier à importer
+        fmt: "ndjson" ou "csv"
+        chunk_size: Nombre d'enregistrements par bloc
+        checkpoint_path: Fichier de checkpoint
+        mark_sent: Marquer les envois comme effectués
+        dry_run: Valider sans écrire (pas de checkpoint)
+
+    Returns:
+        État final de l'import
+    """
+    from utils.service_manager import service_manager
+
+    db_service = service_manager.db_service
+    # Backend async (firestore_async): boucle privée pour toute la durée de l'import
+    loop = asyncio.new_event_loop() if asyncio.iscoroutinefunction(db_service.add_responses) else None
+    state = load_checkpoint(checkpoint_path, path)
+    total_size = os.path.getsize(path)
+    started = time.time()
+    start_offset = state['offset']
+
+    def flush(chunk, line_no, offset):
+        counts = import_chunk(chunk, db_service, mark_sent, dry_run, loop)
+        for key, value in counts.items():
+            state[key] += value
+        state['line'] = line_no
+        state['offset'] = offset
+        if not dry_run:
+            save_checkpoint(checkpoint_path, state)
+
+        elapsed = max(time.time() - started, 1e-6)
+        rate = (offset - start_offset) / elapsed / 1024
+        logger.info(
+            f"Progress: line {line_no}, {offset * 100 // max(total_size, 1)}% "
+            f"({state['imported']} imported, {state['duplicates']} duplicates, "
+            f"{state['invalid']} invalid, {rate:.0f} KiB/s)"
+        )
+
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    line_no, offset = state['line'], state['offset']
+    try:
+        for line_no, offset, record in iter_records(path, fmt, state):
+            chunk.append((line_no, record))
+            if len(chunk) >= chunk_size:
+                flush(chunk, line_no, offset)
+                chunk = []
+        if chunk:
+            flush(chunk, line_no, offset)
+    finally:
+        if loop is not None:
+            loop.close()
+
+    logger.info(f"Import finished in {time.time() - started:.1f}s: {state['imported']} imported, "
+                f"{state['duplicates']} duplicates, {state['invalid']} invalid")
+    return state
+
+
+def main():
+    """Point d'entrée CLI"""
+    parser = argparse.ArgumentParser(description="Streaming backfill import of form responses")
+    parser.add_argument("path", help="NDJSON or CSV export to import")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None,
+                        help="File format (default: guessed from extension)")
+    parser.add_argument("--chunk-size", type=int, default=Config.FIRESTORE_BATCH_SIZE,
+                        help="Records validated and committed per chunk")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--mark-sent", action="store_true",
+                        help="Mark email/SMS as already sent for imported records")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing")
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+    checkpoint = args.checkpoint or args.path + ".checkpoint"
+    # Pas de spool local: rejoué seulement par un serveur, il ferait avancer
+    # le checkpoint sur des écritures non commitées
+    os.environ['SPOOL_ENABLED'] = 'false'
+    
+    from utils.service_manager import service_manager
+    try:
+        run_import(args.path, fmt, args.chunk_size, checkpoint, args.mark_sent, args.dry_run)
+    finally:
+        # Écritures en attente (batcher, spool) terminées avant la sortie
+        service_manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,28 @@ Microservice de réponse automatique aux formulaires Google
 Avec logging centralisé, gestion des services optimisée, et messages centralisés
 """
 import os
-import hashlib
-from typing import Dict, Any, Optional
+import json
+import asyncio
+import itertools
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from datetime import datetime
 
 from fastapi import FastAPI, HTTPException, Header, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr, field_validator
 from dotenv import load_dotenv
 
-from config.constants import Config, ErrorMessages, InfoMessages, APIResponses, StatusCodes
+from config.constants import Config, ErrorMessages, InfoMessages, APIResponses, StatusCodes, WriteStatus
 from utils.logger import setup_logger
 from utils.service_manager import service_manager
-from utils.validators import is_valid_email, is_valid_phone, normalize_phone, sanitize_name
+from utils.http_transport import http_transport
+from utils.templates import CONFIRMATION_TEMPLATE, templates
+from utils.dispatch_queue import DispatchQueue
+from utils.pagination import encode_cursor, decode_cursor, serialize_document, parse_datetime
+from utils.validators import (
+    is_valid_phone, normalize_phone, sanitize_name, parse_submission
+)
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -28,6 +36,15 @@ logger = setup_logger(__name__)
 # Clé secrète pour authentification webhook
 SECRET_KEY = os.getenv('SECRET_KEY', 'your_secret_key_here')
 
+# Mode de réception: "sync" (inline) ou "queue" (réponse 202 + workers en arrière-plan)
+RECEIVE_MODE = os.getenv('RECEIVE_MODE', Config.RECEIVE_MODE).lower()
+
+# File de dispatch (créée au démarrage en mode "queue")
+dispatch_queue: Optional[DispatchQueue] = None
+
+# Tâches de fond lancées au démarrage (références conservées)
+background_tasks = set()
+
 # Initialiser l'application FastAPI
 app = FastAPI(
     title=Config.APP_NAME,
@@ -80,6 +97,7 @@ class StatusResponse(BaseModel):
     timestamp: str
     services: Dict[str, bool]
     stats: Optional[Dict[str, Any]] = None
+    queue: Optional[Dict[str, Any]] = None
 
 
 # Fonctions utilitaires
@@ -106,23 +124,173 @@ def verify_secret_key(authorization: Optional[str]) -> bool:
         return False
 
 
-def generate_response_id(email: str, phone: str, timestamp: Optional[str] = None) -> str:
+async def send_notifications(email: str, phone: str, name: Optional[str],
+                             form_id: Optional[str] = None) -> Dict[str, Any]:
     """
-    Génère un ID unique pour une réponse
+    Envoie l'e-mail et le SMS de confirmation en parallèle
+    Les services async (SendGrid, Twilio) sont attendus directement sur le transport
+    HTTP partagé; les SDK bloquants passent par le pool borné du service manager.
+    La latence devient max(email, sms) au lieu de la somme
     
     Args:
         email: E-mail du répondant
-        phone: Téléphone du répondant
-        timestamp: Timestamp de la réponse
+        phone: Téléphone normalisé du répondant
+        name: Nom du répondant (optionnel)
+        form_id: Identifiant du formulaire (template d'e-mail spécifique optionnel)
+        
+    Returns:
+        Dictionnaire avec mail_sent, sms_sent et errors
+    """
+    email_result, sms_result = await asyncio.gather(
+        service_manager.call_service("email", "send_confirmation_email", email, name, form_id),
+        service_manager.call_service("sms", "send_confirmation_sms", phone, name),
+        return_exceptions=True
+    )
+    return notification_result(email_result, sms_result)
+
+
+def notification_result(email_result: Any, sms_result: Any) -> Dict[str, Any]:
+    """
+    Résume l'issue des envois email et SMS (résultat ou exception)
+    
+    Args:
+        email_result: Retour de l'envoi de l'e-mail, ou exception levée
+        sms_result: Retour de l'envoi du SMS, ou exception levée
         
     Returns:
-        ID unique hashé
+        Dictionnaire avec mail_sent, sms_sent et errors
     """
-    if not timestamp:
-        timestamp = datetime.utcnow().isoformat()
+    mail_sent = False
+    sms_sent = False
+    errors = []
     
-    data = f"{email}:{phone}:{timestamp}"
-    return hashlib.sha256(data.encode()).hexdigest()[:16]
+    if isinstance(email_result, Exception):
+        logger.error(f"Email error: {str(email_result)}")
+        errors.append(f"Email error: {str(email_result)}")
+    else:
+        mail_sent = email_result
+        if not mail_sent:
+            errors.append("Email sending failed")
+    
+    if isinstance(sms_result, Exception):
+        logger.error(f"SMS error: {str(sms_result)}")
+        errors.append(f"SMS error: {str(sms_result)}")
+    else:
+        sms_sent = sms_result
+        if not sms_sent:
+            errors.append("SMS sending failed")
+    
+    return {"mail_sent": mail_sent, "sms_sent": sms_sent, "errors": errors}
+
+
+async def send_confirmation_sms_many(recipients: List[Tuple[str, Optional[str]]],
+                                    concurrency: int) -> List[Any]:
+    """
+    Envoie les SMS de confirmation d'un lot
+    Un service qui propose send_confirmation_sms_batch (AWS SNS) publie le lot
+    en parallèle sur ses propres threads d'envoi; sinon un envoi par destinataire,
+    avec une concurrence bornée
+    
+    Args:
+        recipients: Liste de (numéro, nom)
+        concurrency: Envois simultanés maximum sans méthode de lot
+        
+    Returns:
+        Résultat (ou exception) de chaque envoi, dans l'ordre du lot
+    """
+    if not recipients:
+        return []
+    try:
+        sms_service = await service_manager.run_blocking(getattr, service_manager, "sms_service")
+    except Exception as e:
+        return [e] * len(recipients)
+    
+    send_batch = getattr(sms_service, "send_confirmation_sms_batch", None)
+    if send_batch is not None:
+        try:
+            return await service_manager.run_blocking(send_batch, recipients)
+        except Exception as e:
+            return [e] * len(recipients)
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def send_bounded(phone: str, name: Optional[str]) -> bool:
+        async with semaphore:
+            return await service_manager.call_service("sms", "send_confirmation_sms", phone, name)
+    
+    return await asyncio.gather(*(send_bounded(phone, name) for phone, name in recipients),
+                                return_exceptions=True)
+
+
+async def claim_submission(submission: Dict[str, Any]) -> WriteStatus:
+    """
+    Réserve l'ID de la soumission avant l'envoi (déduplication atomique):
+    un seul réplica peut obtenir la réservation
+    
+    Args:
+        submission: Soumission normalisée (voir parse_submission)
+        
+    Returns:
+        Statut de la réservation (DUPLICATE ou FAILED: ne rien envoyer)
+    """
+    response_id = submission['response_id']
+    claim = await service_manager.call(
+        service_manager.db_service.claim_response, response_id, submission['email'], submission['phone']
+    )
+    if claim == WriteStatus.DUPLICATE:
+        logger.info(InfoMessages.DUPLICATE_DETECTED.format(response_id=response_id))
+    return claim
+
+
+async def record_submission(submission: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Finalise l'enregistrement d'une soumission réservée puis envoyée
+    
+    Args:
+        submission: Soumission normalisée
+        result: Issue des envois (voir notification_result)
+        
+    Returns:
+        Le résultat des envois, avec duplicate à False
+    """
+    await service_manager.call(
+        service_manager.db_service.finalize_response,
+        submission['response_id'], result['mail_sent'], result['sms_sent']
+    )
+    
+    logger.info(InfoMessages.PARTIAL_SUCCESS.format(email_ok=result['mail_sent'], sms_ok=result['sms_sent']))
+    
+    result["duplicate"] = False
+    return result
+
+
+async def dispatch_submission(submission: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Traite une soumission validée: réservation (déduplication atomique),
+    envoi email/SMS, finalisation de l'enregistrement
+    Utilisé inline par /api/receive et par les workers de la file de dispatch
+    
+    Args:
+        submission: Soumission normalisée (voir parse_submission)
+        
+    Returns:
+        Dictionnaire avec duplicate, mail_sent, sms_sent et errors
+    """
+    claim = await claim_submission(submission)
+    if claim == WriteStatus.DUPLICATE:
+        return {"duplicate": True, "mail_sent": False, "sms_sent": False, "errors": []}
+    if claim == WriteStatus.FAILED:
+        # Réservation non écrite: envoyer maintenant renverrait les messages à chaque retry
+        raise HTTPException(
+            status_code=StatusCodes.SERVICE_UNAVAILABLE,
+            detail=ErrorMessages.SERVICE_UNAVAILABLE.format(service="database")
+        )
+    
+    # Envoi des messages (avec gestion d'erreurs robuste)
+    result = await send_notifications(
+        submission['email'], submission['phone'], submission['name'], submission.get('form_id')
+    )
+    return await record_submission(submission, result)
 
 
 # Routes API
@@ -134,32 +302,46 @@ async def root():
             "service": Config.APP_NAME,
             "version": Config.APP_VERSION,
             "endpoints": {
+                "health": "/healthz",
                 "status": "/api/status",
-                "receive": "/api/receive (POST)"
-            }
+                "receive": "/api/receive (POST)",
+                "receive_batch": "/api/receive/batch (POST)"
+            },
+            "receive_mode": RECEIVE_MODE
         },
         message="API is running"
     )
 
 
+@app.get("/healthz")
+async def healthz():
+    """
+    Sonde de vivacité (liveness): répond tant que la boucle d'événements tourne
+    Aucun appel aux services ni à la base
+    """
+    return {"status": "alive"}
+
+
 @app.get("/api/status", response_model=StatusResponse)
 async def check_status():
     """
     Endpoint de vérification du statut du service
-    Retourne l'état des différents services et statistiques (avec cache de 5 min)
+    Retourne l'état des différents services (derniers tests en arrière-plan)
+    et statistiques (avec cache de 5 min)
     """
     try:
-        # Vérifier l'état des services via le service manager
+        # État des services: résultats en mémoire des tests de santé
         health_status = service_manager.health_check()
         
         # Récupérer les statistiques (avec cache de 5 minutes)
-        stats = service_manager.get_stats()
+        stats = await service_manager.get_stats()
         
         return StatusResponse(
             status="operational" if all(health_status.values()) else "degraded",
             timestamp=datetime.utcnow().isoformat() + "Z",
             services=health_status,
-            stats=stats
+            stats=stats,
+            queue=dispatch_queue.get_stats() if dispatch_queue is not None else None
         )
     except Exception as e:
         logger.error(f"Status check failed: {str(e)}")
@@ -181,9 +363,12 @@ async def receive_form_response(
     Workflow:
         1. Vérifie l'authentification
         2. Parse et valide les données
-        3. Vérifie si déjà traité (déduplication)
+        3. Réserve l'ID dans Firestore (déduplication atomique)
         4. Envoie email et SMS
-        5. Enregistre dans Firestore
+        5. Finalise l'enregistrement dans Firestore
+    
+    En mode RECEIVE_MODE=queue, les étapes 3 à 5 sont confiées aux workers
+    de la file de dispatch et l'endpoint répond 202 dès la mise en file.
     
     Headers requis:
         Authorization: Bearer <secret_key>
@@ -208,53 +393,31 @@ async def receive_form_response(
         # Parser les données reçues
         data = await request.json()
         
-        # Extraire les champs (support multi-formats)
-        if isinstance(data, dict) and 'namedValues' in data:
-            # Format Google Apps Script standard
-            named_values = data['namedValues']
-            email = named_values.get('Adresse e-mail', named_values.get('Email', ['']))[0]
-            phone = named_values.get('Téléphone', named_values.get('Phone', ['']))[0]
-            name = named_values.get('Nom', named_values.get('Name', ['']))[0]
-            timestamp = data.get('timestamp', datetime.utcnow().isoformat())
-        else:
-            # Format direct
-            email = data.get('email')
-            phone = data.get('phone')
-            name = data.get('name')
-            timestamp = data.get('timestamp', datetime.utcnow().isoformat())
-        
-        # Valider les données
-        if not email or not phone:
-            raise HTTPException(
-                status_code=StatusCodes.BAD_REQUEST,
-                detail=ErrorMessages.MISSING_REQUIRED_FIELDS.format(fields="email, phone")
-            )
+        # Extraire, valider et normaliser les champs (support multi-formats)
+        try:
+            submission = parse_submission(data)
+        except ValueError as e:
+            raise HTTPException(status_code=StatusCodes.BAD_REQUEST, detail=str(e))
         
-        # Validation supplémentaire
-        if not is_valid_email(email):
-            raise HTTPException(
-                status_code=StatusCodes.BAD_REQUEST,
-                detail=ErrorMessages.INVALID_EMAIL.format(email=email)
-            )
+        response_id = submission['response_id']
+        logger.info(InfoMessages.PROCESSING_REQUEST.format(email=submission['email']))
         
-        if not is_valid_phone(phone):
-            raise HTTPException(
-                status_code=StatusCodes.BAD_REQUEST,
-                detail=ErrorMessages.INVALID_PHONE.format(phone=phone)
+        # Mode file d'attente: journaliser et répondre immédiatement
+        if dispatch_queue is not None:
+            queued = dispatch_queue.enqueue(response_id, submission)
+            if queued:
+                logger.info(InfoMessages.SUBMISSION_QUEUED.format(response_id=response_id))
+            return JSONResponse(
+                status_code=StatusCodes.ACCEPTED,
+                content=APIResponses.success(
+                    message="Submission accepted for processing" if queued else ErrorMessages.ALREADY_PROCESSED,
+                    data={"response_id": response_id, "status": "queued" if queued else "duplicate"}
+                )
             )
         
-        # Normaliser les données
-        phone = normalize_phone(phone)
-        name = sanitize_name(name) if name else None
+        result = await dispatch_submission(submission)
         
-        logger.info(InfoMessages.PROCESSING_REQUEST.format(email=email))
-        
-        # Générer un ID unique pour cette réponse
-        response_id = generate_response_id(email, phone, timestamp)
-        
-        # Vérifier si déjà traité
-        if service_manager.db_service.already_sent(response_id):
-            logger.info(InfoMessages.DUPLICATE_DETECTED.format(response_id=response_id))
+        if result['duplicate']:
             return JSONResponse(
                 status_code=StatusCodes.OK,
                 content=APIResponses.success(
@@ -263,39 +426,9 @@ async def receive_form_response(
                 )
             )
         
-        # Envoi des messages (avec gestion d'erreurs robuste)
-        mail_sent = False
-        sms_sent = False
-        errors = []
-        
-        # Envoyer l'e-mail
-        try:
-            mail_sent = service_manager.email_service.send_confirmation_email(email, name)
-            if not mail_sent:
-                errors.append("Email sending failed")
-        except Exception as e:
-            logger.error(f"Email error: {str(e)}")
-            errors.append(f"Email error: {str(e)}")
-        
-        # Envoyer le SMS
-        try:
-            sms_sent = service_manager.sms_service.send_confirmation_sms(phone, name)
-            if not sms_sent:
-                errors.append("SMS sending failed")
-        except Exception as e:
-            logger.error(f"SMS error: {str(e)}")
-            errors.append(f"SMS error: {str(e)}")
-        
-        # Enregistrer dans la base de données
-        service_manager.db_service.add_response(
-            response_id=response_id,
-            email=email,
-            phone=phone,
-            sent_mail=mail_sent,
-            sent_sms=sms_sent
-        )
-        
-        logger.info(InfoMessages.PARTIAL_SUCCESS.format(email_ok=mail_sent, sms_ok=sms_sent))
+        mail_sent = result['mail_sent']
+        sms_sent = result['sms_sent']
+        errors = result['errors']
         
         # Construire la réponse
         response_data = {
@@ -330,11 +463,275 @@ async def receive_form_response(
         )
 
 
+@app.post("/api/receive/batch")
+async def receive_form_responses_batch(
+    request: Request,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Endpoint d'ingestion par lots (pics de trafic, rattrapages)
+    
+    Workflow:
+        1. Vérifie l'authentification (une seule fois pour tout le lot)
+        2. Parse et valide chaque soumission
+        3. Écarte les doublons connus en une lecture multi-documents (get_all)
+        4. Réserve chaque nouvelle réponse (create-if-absent)
+        5. Envoie les emails avec une concurrence bornée et les SMS du lot en
+           une fois (send_confirmation_sms_batch si le service le propose)
+        6. Finalise l'enregistrement de chaque réponse
+    
+    Body (JSON):
+        Tableau de soumissions au format direct ou namedValues,
+        ou {"submissions": [...]}
+    
+    Returns:
+        Un résultat par élément, dans l'ordre d'entrée
+    """
+    if not verify_secret_key(authorization):
+        logger.warning("Unauthorized access attempt")
+        raise HTTPException(
+            status_code=StatusCodes.UNAUTHORIZED,
+            detail=ErrorMessages.UNAUTHORIZED
+        )
+    
+    try:
+        data = await request.json()
+        items = data.get('submissions') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise HTTPException(status_code=StatusCodes.BAD_REQUEST, detail=ErrorMessages.INVALID_BATCH_FORMAT)
+        
+        max_items = int(os.getenv('BATCH_MAX_ITEMS', Config.BATCH_MAX_ITEMS))
+        if len(items) > max_items:
+            raise HTTPException(
+                status_code=StatusCodes.BAD_REQUEST,
+                detail=ErrorMessages.BATCH_TOO_LARGE.format(count=len(items), max_items=max_items)
+            )
+        
+        results = [None] * len(items)
+        to_process = []  # (index, submission)
+        seen_ids = set()
+        
+        # Valider chaque élément et écarter les doublons internes au lot
+        for index, item in enumerate(items):
+            try:
+                submission = parse_submission(item)
+            except ValueError as e:
+                results[index] = {"index": index, "status": "invalid", "errors": [str(e)]}
+                continue
+            
+            response_id = submission['response_id']
+            if response_id in seen_ids:
+                results[index] = {"index": index, "response_id": response_id, "status": "duplicate"}
+                continue
+            seen_ids.add(response_id)
+            to_process.append((index, submission))
+        
+        # Mode file d'attente: mettre en file sans appeler les providers
+        if dispatch_queue is not None:
+            for index, submission in to_process:
+                queued = dispatch_queue.enqueue(submission['response_id'], submission)
+                results[index] = {
+                    "index": index,
+                    "response_id": submission['response_id'],
+                    "status": "queued" if queued else "duplicate"
+                }
+            return JSONResponse(
+                status_code=StatusCodes.ACCEPTED,
+                content=APIResponses.success(data={"total": len(items), "results": results})
+            )
+        
+        # Déduplication en une seule lecture multi-documents
+        try:
+            existing = await service_manager.call(
+                service_manager.db_service.already_sent_many,
+                [submission['response_id'] for _, submission in to_process]
+            )
+        except Exception:
+            # Base illisible: aucun envoi, le client réessaie le lot
+            raise HTTPException(
+                status_code=StatusCodes.SERVICE_UNAVAILABLE,
+                detail=ErrorMessages.SERVICE_UNAVAILABLE.format(service="database")
+            )
+        new_items = []
+        for index, submission in to_process:
+            if submission['response_id'] in existing:
+                results[index] = {"index": index, "response_id": submission['response_id'], "status": "duplicate"}
+            else:
+                new_items.append((index, submission))
+        
+        # Réservation avant tout envoi, comme /api/receive, avec concurrence bornée:
+        # l'index local peut ignorer un ID ancien ou écrit par un autre réplica,
+        # seule la réservation create-if-absent garantit un envoi unique
+        concurrency = int(os.getenv('BATCH_SEND_CONCURRENCY', Config.BATCH_SEND_CONCURRENCY))
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+        
+        # Une exception sur un élément ne doit pas faire échouer le lot: les autres IDs sont déjà réservés
+        claims = await asyncio.gather(*(bounded(claim_submission(submission)) for _, submission in new_items),
+                                      return_exceptions=True)
+        claimed = []  # (index, submission)
+        for (index, submission), claim in zip(new_items, claims):
+            if isinstance(claim, BaseException) or claim == WriteStatus.FAILED:
+                # Réservation non écrite: aucun envoi, le client réessaie cet élément
+                if isinstance(claim, BaseException):
+                    error = ErrorMessages.PROCESSING_FAILED.format(error=str(claim))
+                    logger.error(error)
+                else:
+                    error = ErrorMessages.SERVICE_UNAVAILABLE.format(service="database")
+                results[index] = {
+                    "index": index,
+                    "response_id": submission['response_id'],
+                    "status": "error",
+                    "errors": [error]
+                }
+            elif claim == WriteStatus.DUPLICATE:
+                results[index] = {"index": index, "response_id": submission['response_id'], "status": "duplicate"}
+            else:
+                claimed.append((index, submission))
+        
+        # E-mails un par un (concurrence bornée), SMS du lot en un seul envoi parallèle
+        email_results, sms_results = await asyncio.gather(
+            asyncio.gather(*(
+                bounded(service_manager.call_service(
+                    "email", "send_confirmation_email",
+                    submission['email'], submission['name'], submission.get('form_id')
+                ))
+                for _, submission in claimed
+            ), return_exceptions=True),
+            send_confirmation_sms_many(
+                [(submission['phone'], submission['name']) for _, submission in claimed], concurrency
+            )
+        )
+        
+        outcomes = [notification_result(email_result, sms_result)
+                    for email_result, sms_result in zip(email_results, sms_results)]
+        records = await asyncio.gather(*(
+            bounded(record_submission(submission, outcome))
+            for (_, submission), outcome in zip(claimed, outcomes)
+        ), return_exceptions=True)
+        
+        for (index, submission), sent, record in zip(claimed, outcomes, records):
+            result = {
+                "index": index,
+                "response_id": submission['response_id'],
+                "status": "processed" if sent['mail_sent'] and sent['sms_sent'] else "partial",
+                "processed": {"email": sent['mail_sent'], "sms": sent['sms_sent']}
+            }
+            if isinstance(record, BaseException):
+                # Messages déjà envoyés: signaler l'échec de finalisation sans masquer les envois
+                error = ErrorMessages.PROCESSING_FAILED.format(error=str(record))
+                logger.error(error)
+                result["status"] = "error"
+                sent['errors'].append(error)
+            if sent['errors']:
+                result["errors"] = sent['errors']
+            results[index] = result
+        
+        invalid = sum(1 for r in results if r['status'] == 'invalid')
+        duplicates = sum(1 for r in results if r['status'] == 'duplicate')
+        logger.info(InfoMessages.BATCH_PROCESSED.format(
+            total=len(items), new=len(items) - duplicates - invalid, duplicates=duplicates, invalid=invalid
+        ))
+        
+        all_ok = all(r['status'] in ('processed', 'duplicate') for r in results)
+        return JSONResponse(
+            status_code=StatusCodes.OK if all_ok else StatusCodes.PARTIAL_SUCCESS,
+            content=APIResponses.success(data={"total": len(items), "results": results})
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(ErrorMessages.PROCESSING_FAILED.format(error=str(e)))
+        raise HTTPException(
+            status_code=StatusCodes.INTERNAL_ERROR,
+            detail=ErrorMessages.PROCESSING_FAILED.format(error=str(e))
+        )
+
+
+async def _aiter_documents(documents, chunk_size: int = 100) -> AsyncIterator[Dict]:
+    """
+    Itère de manière asynchrone sur un itérateur de documents sync ou async
+    Les itérateurs bloquants sont consommés par blocs dans le pool de threads
+    """
+    if hasattr(documents, '__aiter__'):
+        async for document in documents:
+            yield document
+        return
+    
+    iterator = iter(documents)
+    while True:
+        chunk = await service_manager.run_blocking(lambda: list(itertools.islice(iterator, chunk_size)))
+        if not chunk:
+            return
+        for document in chunk:
+            yield document
+
+
+async def _stream_responses(documents, limit: int, fmt: str) -> AsyncIterator[str]:
+    """
+    Sérialise une page de réponses au fil de l'eau (JSON ou NDJSON)
+    Le curseur de la page suivante est émis à la fin du flux
+    """
+    count = 0
+    last = None
+    error = None
+    
+    if fmt == 'json':
+        head = APIResponses.success()
+        yield json.dumps(head)[:-1] + ', "data": {"responses": ['
+    
+    try:
+        async for document in _aiter_documents(documents):
+            item = json.dumps(serialize_document(document), default=str)
+            if fmt == 'json':
+                yield ("," if count else "") + item
+            else:
+                yield item + "\n"
+            count += 1
+            last = document
+    except Exception as e:
+        error = ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e))
+        logger.error(error)
+    
+    next_cursor = None
+    if not error and count == limit and isinstance(last.get('created_at'), datetime):
+        next_cursor = encode_cursor(last['created_at'], last['responseId'])
+    
+    page = {"total": count, "next_cursor": next_cursor}
+    if error:
+        page["error"] = error
+    
+    if fmt == 'json':
+        yield "], " + json.dumps(page)[1:] + "}"
+    else:
+        yield json.dumps({"_page": page}) + "\n"
+
+
 @app.get("/api/responses")
-async def get_all_responses(authorization: Optional[str] = Header(None)):
+async def get_all_responses(
+    authorization: Optional[str] = Header(None),
+    cursor: Optional[str] = None,
+    limit: int = Config.RESPONSES_PAGE_SIZE,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    sent_mail: Optional[bool] = None,
+    sent_sms: Optional[bool] = None,
+    format: str = "json"
+):
     """
-    Récupère toutes les réponses enregistrées
+    Récupère les réponses enregistrées, paginées par curseur (plus récentes d'abord)
     (Endpoint d'administration - nécessite authentification)
+    
+    Query params:
+        cursor: next_cursor renvoyé par la page précédente
+        limit: Taille de la page (max RESPONSES_MAX_PAGE_SIZE)
+        start / end: Plage de dates ISO 8601 sur created_at (end exclue)
+        sent_mail / sent_sms: Filtres sur le statut d'envoi
+        format: "json" (défaut) ou "ndjson"
     """
     if not verify_secret_key(authorization):
         raise HTTPException(
@@ -342,20 +739,89 @@ async def get_all_responses(authorization: Optional[str] = Header(None)):
             detail=ErrorMessages.UNAUTHORIZED
         )
     
-    responses = service_manager.db_service.get_all_responses()
-    return APIResponses.success(
-        data={
-            "total": len(responses),
-            "responses": responses
-        }
+    # Valider les paramètres avant de commencer le flux
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=StatusCodes.BAD_REQUEST,
+            detail=ErrorMessages.INVALID_QUERY_PARAMETER.format(name="cursor", error=str(e))
+        )
+    dates = {}
+    for name, value in (("start", start), ("end", end)):
+        try:
+            dates[name] = parse_datetime(value)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=StatusCodes.BAD_REQUEST,
+                detail=ErrorMessages.INVALID_QUERY_PARAMETER.format(name=name, error=str(e))
+            )
+    if format not in ("json", "ndjson"):
+        raise HTTPException(
+            status_code=StatusCodes.BAD_REQUEST,
+            detail=ErrorMessages.INVALID_QUERY_PARAMETER.format(name="format", error=format)
+        )
+    limit = max(1, min(limit, Config.RESPONSES_MAX_PAGE_SIZE))
+    
+    documents = service_manager.db_service.iter_responses(
+        limit=limit, cursor=cursor, start=dates["start"], end=dates["end"],
+        sent_mail=sent_mail, sent_sms=sent_sms
     )
+    media_type = "application/json" if format == "json" else "application/x-ndjson"
+    return StreamingResponse(_stream_responses(documents, limit, format), media_type=media_type)
+
+
+async def reconcile_counters_periodically(interval: int):
+    """
+    Réconcilie périodiquement les compteurs de statistiques avec count()
+    Première passe au démarrage (initialise les compteurs d'une base existante)
+    """
+    while True:
+        await service_manager.reconcile_stats_counters()
+        await asyncio.sleep(interval)
 
 
 # Événements de démarrage et arrêt
 @app.on_event("startup")
 async def startup_event():
     """Initialisation au démarrage de l'application"""
+    global dispatch_queue
     logger.info(InfoMessages.STARTUP.format(app_name=Config.APP_NAME, version=Config.APP_VERSION))
+    
+    # Démarrer les workers de dispatch en mode file d'attente
+    if RECEIVE_MODE == 'queue':
+        dispatch_queue = DispatchQueue(
+            handler=dispatch_submission,
+            workers=int(os.getenv('DISPATCH_WORKERS', Config.DISPATCH_WORKERS)),
+            journal_path=os.getenv('DISPATCH_QUEUE_PATH', Config.DISPATCH_QUEUE_PATH)
+        )
+        await dispatch_queue.start()
+    
+    # Journal local mono-processus: l'ouvrir dès le démarrage pour qu'un worker
+    # supplémentaire échoue immédiatement avec un message explicite
+    if os.getenv('DATABASE_BACKEND', 'firestore').lower() == 'logstore':
+        await service_manager.run_blocking(getattr, service_manager, "db_service")
+    
+    # Préchauffer l'index de déduplication local sans bloquer le démarrage
+    if os.getenv('DEDUPE_INDEX_ENABLED', str(Config.DEDUPE_INDEX_ENABLED)).lower() == 'true':
+        task = asyncio.create_task(service_manager.warm_dedupe_index())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    
+    # Réconciliation des compteurs de statistiques
+    reconcile_interval = int(os.getenv('STATS_RECONCILE_INTERVAL', Config.STATS_RECONCILE_INTERVAL))
+    if reconcile_interval > 0:
+        task = asyncio.create_task(reconcile_counters_periodically(reconcile_interval))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    
+    # Compiler les templates d'e-mails une fois (rechargés à chaud s'ils changent)
+    templates.preload(CONFIRMATION_TEMPLATE)
+    
+    # Tests de santé des services en arrière-plan (/api/status ne les appelle plus)
+    service_manager.start_health_prober()
+    
     # Les services seront initialisés à la demande (lazy loading)
     logger.info(InfoMessages.SERVICE_READY)
 
@@ -363,6 +829,13 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Nettoyage à l'arrêt de l'application"""
+    for task in list(background_tasks):
+        task.cancel()
+    if dispatch_queue is not None:
+        await dispatch_queue.stop()
+    await service_manager.stop_health_prober()
+    service_manager.shutdown()
+    await http_transport.close()
     logger.info(InfoMessages.SHUTDOWN.format(app_name=Config.APP_NAME))
 
 
@@ -2,18 +2,33 @@
 Service d'envoi de SMS avec AWS SNS (Amazon Simple Notification Service)
 Alternative à Twilio pour l'envoi de SMS
 VERSION OPTIMISÉE avec logging et templates centralisés
+Envois parallèles: pool de connexions HTTP dimensionné et threads de publication dédiés
 """
+import asyncio
+import math
 import os
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError, BotoCoreError
 
-from config.constants import ErrorMessages, SuccessMessages, SMSTemplates
+from config.constants import Config, ErrorMessages, SuccessMessages, SMSTemplates
 from utils.logger import setup_logger
+from utils.sms_dispatcher import SMSDispatcher, parse_senders
+from utils.sms_encoding import analyze, prepare_sms
 from utils.validators import normalize_phone
 
 logger = setup_logger(__name__)
 
+# Codes d'erreur SNS de dépassement de débit
+THROTTLING_ERRORS = ('Throttling', 'ThrottlingException', 'ThrottledException')
+
+SMS_TYPE = 'Transactional'  # Prioritaire (pas de marketing)
+
 
 class AWSSNSService:
     """Service d'envoi de SMS via AWS SNS"""
@@ -23,7 +38,39 @@ class AWSSNSService:
         self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
         self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         self.aws_region = os.getenv('AWS_REGION', 'us-east-1')
+        # Endpoint alternatif (bouchon local pour les benchmarks, ex: http://localhost:4566)
+        self.endpoint_url = os.getenv('AWS_SNS_ENDPOINT_URL') or None
         self.sender_id = os.getenv('AWS_SNS_SENDER_ID', 'AutoResp')  # Nom affiché (max 11 caractères)
+        # Plusieurs Sender IDs (AWS_SNS_SENDER_IDS="Id1,Id2"): débit réparti entre eux
+        self.sender_ids = parse_senders(os.getenv('AWS_SNS_SENDER_IDS'), self.sender_id)
+        # Débit propre à SNS (quota MPS du compte), distinct du débit des numéros Twilio;
+        # 0 par défaut: pas de limite locale, les Throttling SNS mettent le Sender ID en pause
+        self.dispatcher = SMSDispatcher(
+            self.sender_ids,
+            rate=float(os.getenv('SNS_SENDER_RATE', Config.SNS_SENDER_RATE)),
+            burst=int(os.getenv('SNS_SENDER_BURST', Config.SNS_SENDER_BURST)),
+            max_wait=float(os.getenv('SMS_MAX_QUEUE_WAIT', Config.SMS_MAX_QUEUE_WAIT)),
+            throttle_pause=float(os.getenv('SMS_THROTTLE_PAUSE', Config.SMS_THROTTLE_PAUSE)),
+            drop_on_saturation=os.getenv(
+                'SMS_DROP_ON_SATURATION', str(Config.SMS_DROP_ON_SATURATION)
+            ).lower() == 'true'
+        )
+        self.max_segments = int(os.getenv('SMS_MAX_SEGMENTS', Config.SMS_MAX_SEGMENTS))
+        self.gsm_transliterate = os.getenv('SMS_GSM_TRANSLITERATE', str(Config.SMS_GSM_TRANSLITERATE)).lower() == 'true'
+        
+        # Publications simultanées: autant de connexions HTTP que de threads d'envoi
+        self.publish_concurrency = int(os.getenv('SNS_PUBLISH_CONCURRENCY', Config.SNS_PUBLISH_CONCURRENCY))
+        self._publisher: Optional[ThreadPoolExecutor] = None
+        # Attributs SMS du compte (SetSMSAttributes) appliqués: publish sans MessageAttributes
+        self.default_attributes = False
+        
+        self._stats_lock = Lock()
+        self._published = 0
+        self._failed = 0
+        self._publish_calls = 0
+        self._publish_time = 0.0
+        self._in_flight = 0
+        self._in_flight_max = 0
         
         if not self.aws_access_key or not self.aws_secret_key:
             logger.warning("AWS SNS credentials missing, SMS service disabled")
@@ -34,25 +81,88 @@ class AWSSNSService:
                     'sns',
                     aws_access_key_id=self.aws_access_key,
                     aws_secret_access_key=self.aws_secret_key,
-                    region_name=self.aws_region
+                    region_name=self.aws_region,
+                    endpoint_url=self.endpoint_url,
+                    config=BotoConfig(
+                        max_pool_connections=self.publish_concurrency,
+                        retries={'mode': 'standard'}
+                    )
                 )
+                self._publisher = ThreadPoolExecutor(
+                    max_workers=self.publish_concurrency, thread_name_prefix="sns-publish"
+                )
+                self.default_attributes = self._set_default_attributes()
                 logger.info(SuccessMessages.SERVICE_INITIALIZED.format(
-                    service=f"AWS SNS (Region: {self.aws_region}, Sender: {self.sender_id})"
+                    service=f"AWS SNS (Region: {self.aws_region}, Sender: {', '.join(self.sender_ids)}, "
+                            f"{self.publish_concurrency} connections"
+                            + (f", endpoint: {self.endpoint_url}" if self.endpoint_url else "") + ")"
                 ))
             except Exception as e:
                 logger.error(f"AWS SNS initialization failed: {str(e)}")
                 self.client = None
     
+    def _set_default_attributes(self) -> bool:
+        """
+        Applique une fois SenderID et type de SMS au niveau du compte (SetSMSAttributes)
+        au lieu de les répéter dans chaque publish
+        
+        Returns:
+            True si appliqués (sinon les attributs restent passés par message)
+        """
+        if os.getenv('SNS_SET_SMS_ATTRIBUTES', str(Config.SNS_SET_SMS_ATTRIBUTES)).lower() != 'true':
+            return False
+        try:
+            self.client.set_sms_attributes(attributes={
+                'DefaultSenderID': self.sender_ids[0],
+                'DefaultSMSType': SMS_TYPE
+            })
+            return True
+        except Exception as e:
+            logger.warning(f"AWS SNS SetSMSAttributes failed, using per-message attributes: {str(e)}")
+            return False
+    
+    def _publish_params(self, phone: str, content: str, sender_id: str) -> Dict[str, Any]:
+        """
+        Paramètres de l'envoi SNS
+        Avec les attributs du compte appliqués, seul un Sender ID autre que
+        celui par défaut (pool de plusieurs Sender IDs) est passé par message
+        """
+        params: Dict[str, Any] = {'PhoneNumber': phone, 'Message': content}
+        attributes = {}
+        if not self.default_attributes or sender_id != self.sender_ids[0]:
+            attributes['AWS.SNS.SMS.SenderID'] = {'DataType': 'String', 'StringValue': sender_id}
+        if not self.default_attributes:
+            attributes['AWS.SNS.SMS.SMSType'] = {'DataType': 'String', 'StringValue': SMS_TYPE}
+        if attributes:
+            params['MessageAttributes'] = attributes
+        return params
+    
+    def _publish(self, phone: str, content: str, sender_id: str) -> Dict[str, Any]:
+        """Appel publish (bloquant) avec comptage des envois en cours et de la latence"""
+        with self._stats_lock:
+            self._in_flight += 1
+            self._in_flight_max = max(self._in_flight_max, self._in_flight)
+        start = time.monotonic()
+        try:
+            return self.client.publish(**self._publish_params(phone, content, sender_id))
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+                self._publish_calls += 1
+                self._publish_time += time.monotonic() - start
+    
     def send_sms(self, phone: str, message: str) -> bool:
         """
         Envoie un SMS via AWS SNS
+        Si le débit des Sender IDs est saturé au-delà de SMS_MAX_QUEUE_WAIT,
+        le SMS part en arrière-plan (file différée du dispatcher)
         
         Args:
             phone: Numéro de téléphone (format international: +33...)
-            message: Contenu du SMS
+            message: Contenu du SMS (tronqué à SMS_MAX_SEGMENTS segments)
             
         Returns:
-            True si envoyé avec succès, False sinon
+            True si envoyé (ou mis en file) avec succès, False sinon
         """
         if not self.client:
             logger.error("AWS SNS service not initialized")
@@ -62,45 +172,192 @@ class AWSSNSService:
             # Normaliser le numéro (format E.164: +33...)
             phone = normalize_phone(phone)
             
-            # Paramètres de l'envoi SNS
-            params = {
-                'PhoneNumber': phone,
-                'Message': message,
-                'MessageAttributes': {
-                    'AWS.SNS.SMS.SenderID': {
-                        'DataType': 'String',
-                        'StringValue': self.sender_id
-                    },
-                    'AWS.SNS.SMS.SMSType': {
-                        'DataType': 'String',
-                        'StringValue': 'Transactional'  # Prioritaire (pas de marketing)
-                    }
-                }
-            }
+            content = prepare_sms(message, self.max_segments, self.gsm_transliterate)
+            segments = analyze(content).segments
             
-            response = self.client.publish(**params)
+            sent = self._deliver(phone, content, segments)
+            if sent is None:
+                return self._defer(phone, content, segments)
+            return sent
             
-            if response.get('MessageId'):
-                logger.info(SuccessMessages.SMS_SENT.format(phone=phone))
-                logger.debug(f"AWS SNS MessageId: {response['MessageId']}")
-                return True
-            else:
-                logger.warning(f"AWS SNS unexpected response: {response}")
-                return False
-                
-        except ClientError as e:
-            error_code = e.response['Error']['Code']
-            error_msg = e.response['Error']['Message']
-            logger.error(f"AWS SNS ClientError [{error_code}]: {error_msg}")
-            return False
+        except Exception as e:
+            return self._send_failed(e)
+    
+    async def send_sms_async(self, phone: str, message: str) -> bool:
+        """
+        Envoie un SMS via AWS SNS depuis la boucle d'événements
+        L'attente du créneau ne bloque aucun thread; le publish s'exécute
+        dans les threads d'envoi SNS (pool dimensionné sur les connexions HTTP)
+        
+        Args:
+            phone: Numéro de téléphone (format international: +33...)
+            message: Contenu du SMS (tronqué à SMS_MAX_SEGMENTS segments)
             
-        except BotoCoreError as e:
-            logger.error(f"AWS SNS BotoCoreError: {str(e)}")
+        Returns:
+            True si envoyé (ou mis en file) avec succès, False sinon
+        """
+        if not self.client:
+            logger.error("AWS SNS service not initialized")
             return False
+        
+        try:
+            phone = normalize_phone(phone)
+            content = prepare_sms(message, self.max_segments, self.gsm_transliterate)
+            segments = analyze(content).segments
+            loop = asyncio.get_running_loop()
+            
+            for attempt in range(2):
+                sender_id = await self.dispatcher.acquire_async(segments)
+                if sender_id is None:
+                    # File saturée: envoi en arrière-plan au débit autorisé
+                    return self._defer(phone, content, segments)
+                try:
+                    response = await loop.run_in_executor(self._publisher, self._publish, phone, content, sender_id)
+                except ClientError as e:
+                    if e.response['Error']['Code'] in THROTTLING_ERRORS and attempt == 0:
+                        self.dispatcher.throttled(sender_id)
+                        continue
+                    raise
+                return self._check_response(response, phone)
+            return self._record(False)
             
         except Exception as e:
-            logger.error(f"Failed to send SMS via AWS SNS: {str(e)}")
-            return False
+            return self._send_failed(e)
+    
+    def _deliver(self, phone: str, content: str, segments: int,
+                 max_wait: Optional[float] = None) -> Optional[bool]:
+        """
+        Attend le créneau d'un Sender ID puis publie le SMS préparé
+        (un nouvel essai sur le pool après un Throttling)
+        
+        Args:
+            phone: Numéro normalisé
+            content: Texte préparé (prepare_sms)
+            segments: Segments facturés du texte
+            max_wait: Attente acceptée (secondes, défaut: SMS_MAX_QUEUE_WAIT)
+            
+        Returns:
+            True/False selon l'envoi, None si la file est saturée
+        """
+        for attempt in range(2):
+            # Créneau libre d'un Sender ID (attente si le débit est atteint)
+            sender_id = self.dispatcher.acquire(segments, max_wait)
+            if sender_id is None:
+                return None
+            try:
+                response = self._publish(phone, content, sender_id)
+            except ClientError as e:
+                if e.response['Error']['Code'] in THROTTLING_ERRORS and attempt == 0:
+                    # Débit dépassé: pause du Sender ID et nouvel essai sur le pool
+                    self.dispatcher.throttled(sender_id)
+                    continue
+                raise
+            return self._check_response(response, phone)
+        return self._record(False)
+    
+    def _defer(self, phone: str, content: str, segments: int) -> bool:
+        """Confie un SMS saturé à la file différée (refusé si SMS_DROP_ON_SATURATION)"""
+        if self.dispatcher.defer(partial(self._send_deferred, phone, content, segments)):
+            return True
+        return self._record(False)
+    
+    def _send_deferred(self, phone: str, content: str, segments: int) -> bool:
+        """Envoi d'un SMS de la file différée (attente du créneau sans limite)"""
+        try:
+            return bool(self._deliver(phone, content, segments, math.inf))
+        except Exception as e:
+            return self._send_failed(e)
+    
+    def send_sms_batch(self, messages: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Envoie un lot de SMS en parallèle sur les threads d'envoi SNS
+        Les créneaux du dispatcher sont réservés d'abord; seul le thread appelant
+        attend chaque créneau, les threads d'envoi ne font que publier
+        
+        Args:
+            messages: Liste de (numéro, contenu)
+            
+        Returns:
+            Résultat de chaque envoi (True si mis en file différée), dans l'ordre du lot
+        """
+        if not self.client:
+            logger.error("AWS SNS service not initialized")
+            return [False] * len(messages)
+        
+        results = [False] * len(messages)
+        scheduled = []  # (attente, index, numéro, contenu, segments, Sender ID)
+        for index, (phone, message) in enumerate(messages):
+            try:
+                phone = normalize_phone(phone)
+                content = prepare_sms(message, self.max_segments, self.gsm_transliterate)
+                segments = analyze(content).segments
+            except Exception as e:
+                results[index] = self._send_failed(e)
+                continue
+            slot = self.dispatcher.reserve(segments)
+            if slot is None:
+                results[index] = self._defer(phone, content, segments)
+                continue
+            sender_id, wait = slot
+            scheduled.append((wait, index, phone, content, segments, sender_id))
+        
+        # Soumission de chaque publish à son créneau
+        start = time.monotonic()
+        submitted = []
+        for wait, index, phone, content, segments, sender_id in sorted(scheduled, key=lambda item: item[0]):
+            if wait > 0:
+                time.sleep(max(0.0, start + wait - time.monotonic()))
+                self.dispatcher.dequeue()
+            future = self._publisher.submit(self._publish, phone, content, sender_id)
+            submitted.append((index, phone, content, segments, sender_id, future))
+        
+        for index, phone, content, segments, sender_id, future in submitted:
+            try:
+                results[index] = self._check_response(future.result(), phone)
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                    results[index] = self._send_failed(e)
+                    continue
+                # Débit dépassé: pause du Sender ID et nouvel essai sur le pool
+                self.dispatcher.throttled(sender_id)
+                try:
+                    sent = self._deliver(phone, content, segments)
+                    results[index] = self._defer(phone, content, segments) if sent is None else sent
+                except Exception as retry_error:
+                    results[index] = self._send_failed(retry_error)
+            except Exception as e:
+                results[index] = self._send_failed(e)
+        return results
+    
+    def _check_response(self, response: Dict[str, Any], phone: str) -> bool:
+        """Vérifie que SNS a accepté le message (MessageId)"""
+        if response.get('MessageId'):
+            logger.info(SuccessMessages.SMS_SENT.format(phone=phone))
+            logger.debug(f"AWS SNS MessageId: {response['MessageId']}")
+            return self._record(True)
+        logger.warning(f"AWS SNS unexpected response: {response}")
+        return self._record(False)
+    
+    def _send_failed(self, error: Exception) -> bool:
+        """Journalise l'échec d'un envoi"""
+        if isinstance(error, ClientError):
+            error_code = error.response['Error']['Code']
+            error_msg = error.response['Error']['Message']
+            logger.error(f"AWS SNS ClientError [{error_code}]: {error_msg}")
+        elif isinstance(error, BotoCoreError):
+            logger.error(f"AWS SNS BotoCoreError: {str(error)}")
+        else:
+            logger.error(f"Failed to send SMS via AWS SNS: {str(error)}")
+        return self._record(False)
+    
+    def _record(self, success: bool) -> bool:
+        """Comptabilise l'issue d'un envoi et la retourne"""
+        with self._stats_lock:
+            if success:
+                self._published += 1
+            else:
+                self._failed += 1
+        return success
     
     def send_confirmation_sms(self, phone: str, name: Optional[str] = None) -> bool:
         """
@@ -113,12 +370,77 @@ class AWSSNSService:
         Returns:
             True si envoyé avec succès, False sinon
         """
+        return self.send_sms(phone, self._confirmation_content(name))
+    
+    async def send_confirmation_sms_async(self, phone: str, name: Optional[str] = None) -> bool:
+        """
+        Envoie un SMS de confirmation sans bloquer la boucle d'événements
+        
+        Args:
+            phone: Numéro de téléphone du destinataire
+            name: Nom du destinataire (optionnel)
+            
+        Returns:
+            True si envoyé avec succès, False sinon
+        """
+        return await self.send_sms_async(phone, self._confirmation_content(name))
+    
+    def send_confirmation_sms_batch(self, recipients: List[Tuple[str, Optional[str]]]) -> List[bool]:
+        """
+        Envoie les SMS de confirmation d'un lot de soumissions en parallèle
+        
+        Args:
+            recipients: Liste de (numéro, nom)
+            
+        Returns:
+            Résultat de chaque envoi, dans l'ordre du lot
+        """
+        return self.send_sms_batch([(phone, self._confirmation_content(name)) for phone, name in recipients])
+    
+    @staticmethod
+    def _confirmation_content(name: Optional[str]) -> str:
+        """Génère le texte du SMS de confirmation"""
         from utils.validators import sanitize_name
         
         display_name = sanitize_name(name) if name else "Utilisateur"
-        message = SMSTemplates.get_confirmation_message(display_name)
+        return SMSTemplates.get_confirmation_message(display_name)
+    
+    def get_dispatch_stats(self) -> dict:
+        """
+        Retourne le débit et l'attente par Sender ID
+        
+        Returns:
+            Dictionnaire de statistiques du pool d'expéditeurs
+        """
+        return self.dispatcher.get_stats()
+    
+    def get_publish_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de publication SNS
         
-        return self.send_sms(phone, message)
+        Returns:
+            Dictionnaire avec envois réussis/en échec, concurrence et latence moyenne
+        """
+        with self._stats_lock:
+            return {
+                "concurrency": self.publish_concurrency,
+                "default_attributes": self.default_attributes,
+                "published": self._published,
+                "failed": self._failed,
+                "in_flight": self._in_flight,
+                "in_flight_max": self._in_flight_max,
+                "avg_publish_ms": round(self._publish_time / self._publish_calls * 1000, 1) if self._publish_calls else 0
+            }
+    
+    def close(self):
+        """
+        Attend les SMS différés et les publications en cours, puis libère
+        les threads d'envoi (arrêt de l'application)
+        """
+        self.dispatcher.close(float(os.getenv('SMS_DEFERRED_DRAIN_TIMEOUT', Config.SMS_DEFERRED_DRAIN_TIMEOUT)))
+        if self._publisher is not None:
+            self._publisher.shutdown(wait=True)
+            self._publisher = None
     
     def test_connection(self) -> bool:
         """
@@ -1,33 +1,64 @@
 """
-Factory pour créer l'instance de service Firestore
-Utilise uniquement Firestore pour le stockage (pas de JSON local)
+Factory pour créer l'instance de service de base de données
+Backend sélectionné via DATABASE_BACKEND:
+- firestore (défaut): client Firestore synchrone
+- firestore_async: client Firestore asynchrone (AsyncClient)
+- sqlite: base locale SQLite en mode WAL (auto-hébergé / hors ligne)
+- logstore: journal append-only local avec index en mémoire (edge, un seul processus)
 """
 import os
 
 from .firestore_service import FirestoreService
 
 
-def get_database_service() -> FirestoreService:
+def get_database_service():
     """
-    Crée et retourne le service Firestore
+    Crée et retourne le service de base de données configuré
     
-    Les credentials peuvent être fournis via :
+    Les credentials Firestore peuvent être fournis via :
     - Variable d'environnement FIREBASE_CREDENTIALS_JSON (production)
     - Fichier firestore-credentials.json (développement)
     
     Returns:
-        Instance de FirestoreService
+        Instance de FirestoreService, AsyncFirestoreService, SQLiteService ou LogStoreService
     """
+    backend = os.getenv('DATABASE_BACKEND', 'firestore').lower()
+    
+    if backend == 'sqlite':
+        from config.constants import Config
+        from .sqlite_service import SQLiteService
+        sqlite_path = os.getenv('SQLITE_PATH', Config.SQLITE_PATH)
+        print(f">> Initialisation de SQLite pour le stockage ({sqlite_path})...")
+        return SQLiteService(sqlite_path)
+    
+    if backend == 'logstore':
+        from config.constants import Config
+        from .log_store_service import LogStoreService
+        log_store_dir = os.getenv('LOG_STORE_DIR', Config.LOG_STORE_DIR)
+        print(f">> Initialisation du journal local pour le stockage ({log_store_dir})...")
+        return LogStoreService(
+            log_store_dir,
+            segment_max_bytes=int(os.getenv('LOG_STORE_SEGMENT_MAX_BYTES', Config.LOG_STORE_SEGMENT_MAX_BYTES)),
+            compact_min_segments=int(os.getenv('LOG_STORE_COMPACT_MIN_SEGMENTS', Config.LOG_STORE_COMPACT_MIN_SEGMENTS)),
+            fsync=os.getenv('LOG_STORE_FSYNC', str(Config.LOG_STORE_FSYNC)).lower() == 'true'
+        )
+    
     firebase_creds_json = os.getenv('FIREBASE_CREDENTIALS_JSON')
     firebase_creds_path = os.getenv('FIREBASE_CREDENTIALS_PATH', 'firestore-credentials.json')
     
-    print(">> Initialisation de Firestore pour le stockage...")
+    if backend == 'firestore_async':
+        from .firestore_async_service import AsyncFirestoreService
+        service_class = AsyncFirestoreService
+    else:
+        service_class = FirestoreService
+    
+    print(f">> Initialisation de Firestore pour le stockage ({backend})...")
     
     try:
         if firebase_creds_json:
-            return FirestoreService(credentials_json=firebase_creds_json)
+            return service_class(credentials_json=firebase_creds_json)
         else:
-            return FirestoreService(credentials_path=firebase_creds_path)
+            return service_class(credentials_path=firebase_creds_path)
     except Exception as e:
         raise ValueError(
             f"[ERREUR] Erreur lors de l'initialisation de Firestore: {str(e)}\n"
@@ -0,0 +1,315 @@
+"""
+Service e-mail composite avec bascule entre providers (SendGrid, SMTP)
+Chaque provider a son disjoncteur (taux d'erreur et latence); les envois
+vont au premier provider disponible dans l'ordre de préférence, avec un
+envoi de couverture optionnel quand le premier dépasse un budget de latence
+"""
+import asyncio
+import os
+import time
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from config.constants import Config
+from utils.circuit_breaker import CallRejected, CircuitBreaker
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class _Provider:
+    """Service e-mail, son disjoncteur et ses compteurs"""
+
+    def __init__(self, name: str, service: Any):
+        self.name = name
+        self.service = service
+        self.breaker = CircuitBreaker(
+            f"email:{name}",
+            window=int(os.getenv('BREAKER_WINDOW', Config.BREAKER_WINDOW)),
+            min_calls=int(os.getenv('BREAKER_MIN_CALLS', Config.BREAKER_MIN_CALLS)),
+            failure_rate=float(os.getenv('BREAKER_FAILURE_RATE', Config.BREAKER_FAILURE_RATE)),
+            slow_call_ms=float(os.getenv('BREAKER_SLOW_CALL_MS', Config.BREAKER_SLOW_CALL_MS)),
+            slow_call_rate=float(os.getenv('BREAKER_SLOW_CALL_RATE', Config.BREAKER_SLOW_CALL_RATE)),
+            open_seconds=float(os.getenv('BREAKER_OPEN_SECONDS', Config.BREAKER_OPEN_SECONDS))
+        )
+
+
+class FailoverEmailService:
+    """
+    Service e-mail exposant l'interface des providers (send_email,
+    send_confirmation_email et leurs variantes async)
+
+    Un provider dont le circuit est ouvert est sauté; un envoi en échec
+    (5xx, délai, transport) est retenté sur le provider suivant. Un refus de
+    la requête (CallRejected: destinataire ou contenu invalide) n'est ni un
+    échec du provider ni une raison de renvoyer le même e-mail ailleurs.
+    Si tous les circuits sont ouverts, le provider principal est tout de même essayé.
+
+    Envoi de couverture (hedging, variantes async): si le premier envoi n'a
+    pas répondu après EMAIL_HEDGE_AFTER_MS, le provider suivant est lancé en
+    parallèle et la première réussite est retenue. L'envoi le plus lent n'est
+    pas annulé (son issue alimente le disjoncteur): le destinataire peut
+    recevoir deux e-mails, d'où un budget désactivé par défaut.
+    """
+
+    def __init__(self, providers: List[Tuple[str, Any]],
+                 run_blocking: Optional[Callable[..., Awaitable[Any]]] = None,
+                 hedge_after_ms: Optional[float] = None):
+        """
+        Args:
+            providers: Liste de (nom, service) par ordre de préférence
+            run_blocking: Exécuteur des méthodes bloquantes depuis la boucle
+                          (ServiceManager.run_blocking; thread par défaut sinon)
+            hedge_after_ms: Budget de latence avant envoi de couverture (0 = désactivé)
+        """
+        if not providers:
+            raise ValueError("At least one email provider is required")
+        self._providers = [_Provider(name, service) for name, service in providers]
+        for provider in self._providers:
+            # Refus 4xx signalés par CallRejected plutôt que confondus avec une panne
+            if hasattr(provider.service, 'raise_rejected'):
+                provider.service.raise_rejected = True
+        self._run_blocking = run_blocking or asyncio.to_thread
+        if hedge_after_ms is None:
+            hedge_after_ms = float(os.getenv('EMAIL_HEDGE_AFTER_MS', Config.EMAIL_HEDGE_AFTER_MS))
+        self.hedge_after = max(0.0, hedge_after_ms) / 1000
+
+        # Envois de couverture encore en cours après la réponse (références conservées)
+        self._background: Set[asyncio.Future] = set()
+        self._lock = Lock()
+        self._failovers = 0
+        self._hedges = 0
+        self._forced = 0
+        self._rejected = 0
+
+        logger.info(f"Email failover ready: {' -> '.join(p.name for p in self._providers)}"
+                    + (f", hedge after {hedge_after_ms:g} ms" if self.hedge_after else ""))
+
+    @property
+    def enabled(self) -> bool:
+        """Au moins un provider configuré"""
+        return any(getattr(p.service, 'enabled', True) for p in self._providers)
+
+    def send_email(self, *args, **kwargs) -> bool:
+        """Envoie un e-mail (voir SendGridEmailService.send_email)"""
+        return self._send("send_email", args, kwargs)
+
+    def send_confirmation_email(self, *args, **kwargs) -> bool:
+        """Envoie un e-mail de confirmation (voir SendGridEmailService.send_confirmation_email)"""
+        return self._send("send_confirmation_email", args, kwargs)
+
+    async def send_email_async(self, *args, **kwargs) -> bool:
+        """Variante async de send_email (avec envoi de couverture)"""
+        return await self._send_async("send_email", args, kwargs)
+
+    async def send_confirmation_email_async(self, *args, **kwargs) -> bool:
+        """Variante async de send_confirmation_email (avec envoi de couverture)"""
+        return await self._send_async("send_confirmation_email", args, kwargs)
+
+    def _send(self, method: str, args: tuple, kwargs: dict) -> bool:
+        """
+        Envoie sur les providers disponibles, dans l'ordre, jusqu'à une réussite
+
+        Args:
+            method: Nom de la méthode d'envoi
+            args, kwargs: Arguments de la méthode
+
+        Returns:
+            True si un provider a envoyé le message
+        """
+        attempted = False
+        for provider in self._providers:
+            if not provider.breaker.allow():
+                continue
+            if attempted:
+                self._count("_failovers")
+            attempted = True
+            result = self._call(provider, method, args, kwargs)
+            if result is None:
+                # Requête refusée: pas de renvoi sur un autre provider
+                return False
+            if result:
+                return True
+
+        if not attempted:
+            # Tous les circuits ouverts: tentative sur le provider principal
+            self._count("_forced")
+            return bool(self._call(self._providers[0], method, args, kwargs))
+        return False
+
+    async def _send_async(self, method: str, args: tuple, kwargs: dict) -> bool:
+        """
+        Variante async de _send: un provider à la fois, plus un envoi de
+        couverture si le budget de latence est dépassé
+
+        Args:
+            method: Nom de la méthode d'envoi
+            args, kwargs: Arguments de la méthode
+
+        Returns:
+            True si un provider a envoyé le message
+        """
+        next_index = 0
+
+        def start_next() -> Optional[asyncio.Future]:
+            nonlocal next_index
+            while next_index < len(self._providers):
+                provider = self._providers[next_index]
+                next_index += 1
+                if provider.breaker.allow():
+                    return asyncio.ensure_future(self._call_async(provider, method, args, kwargs))
+            return None
+
+        first = start_next()
+        if first is None:
+            # Tous les circuits ouverts: tentative sur le provider principal
+            self._count("_forced")
+            return bool(await self._call_async(self._providers[0], method, args, kwargs))
+
+        pending = {first}
+        while pending:
+            hedge = self.hedge_after > 0 and len(pending) == 1 and next_index < len(self._providers)
+            done, pending = await asyncio.wait(
+                pending, timeout=self.hedge_after if hedge else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            results = [task.result() for task in done]
+            if any(results):
+                self._detach(pending)
+                return True
+            if any(result is None for result in results):
+                # Requête refusée: pas de renvoi sur un autre provider
+                self._detach(pending)
+                return False
+
+            if done and pending:
+                # L'un des deux envois a échoué: attendre l'autre
+                continue
+            task = start_next()
+            if task is None:
+                continue
+            pending.add(task)
+            if done:
+                self._count("_failovers")
+            else:
+                # Budget de latence dépassé: envoi de couverture sur le provider suivant
+                self._count("_hedges")
+                logger.warning(f"Email provider slow (> {self.hedge_after * 1000:g} ms), hedging")
+        return False
+
+    def _call(self, provider: _Provider, method: str, args: tuple, kwargs: dict) -> Optional[bool]:
+        """
+        Appelle un provider (bloquant) et enregistre l'issue dans son disjoncteur
+
+        Returns:
+            Résultat de l'envoi, None si le provider a refusé la requête
+        """
+        start = time.monotonic()
+        try:
+            result = bool(getattr(provider.service, method)(*args, **kwargs))
+        except CallRejected as e:
+            return self._rejected_by(provider, e, time.monotonic() - start)
+        except Exception as e:
+            logger.error(f"Email provider {provider.name} failed: {e}")
+            result = False
+        provider.breaker.record(result, time.monotonic() - start)
+        return result
+
+    async def _call_async(self, provider: _Provider, method: str, args: tuple, kwargs: dict) -> Optional[bool]:
+        """
+        Appelle un provider (variante async native, sinon méthode bloquante hors boucle)
+
+        Returns:
+            Résultat de l'envoi, None si le provider a refusé la requête
+        """
+        start = time.monotonic()
+        try:
+            func = getattr(provider.service, f"{method}_async", None)
+            if func is not None:
+                result = bool(await func(*args, **kwargs))
+            else:
+                result = bool(await self._run_blocking(getattr(provider.service, method), *args, **kwargs))
+        except CallRejected as e:
+            return self._rejected_by(provider, e, time.monotonic() - start)
+        except Exception as e:
+            logger.error(f"Email provider {provider.name} failed: {e}")
+            result = False
+        provider.breaker.record(result, time.monotonic() - start)
+        return result
+
+    def _rejected_by(self, provider: _Provider, error: CallRejected, latency: float) -> None:
+        """Refus de la requête: le provider a répondu, son circuit reste sain"""
+        logger.warning(f"Email rejected by provider {provider.name}: {error}")
+        provider.breaker.record(True, latency)
+        self._count("_rejected")
+        return None
+
+    def _detach(self, tasks: Set[asyncio.Future]):
+        """Laisse finir en arrière-plan les envois devenus inutiles"""
+        for task in tasks:
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    def _count(self, counter: str):
+        """Incrémente un compteur de bascule"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def test_connection(self) -> bool:
+        """
+        Teste les providers
+
+        Returns:
+            True si au moins un provider répond
+        """
+        for provider in self._providers:
+            try:
+                if provider.service.test_connection():
+                    return True
+            except Exception as e:
+                logger.warning(f"Email provider {provider.name} connection test failed: {e}")
+        return False
+
+    def get_failover_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état des disjoncteurs et les compteurs de bascule
+
+        Returns:
+            Dictionnaire avec ordre des providers, compteurs et état de chaque circuit
+        """
+        with self._lock:
+            stats = {
+                "providers": [p.name for p in self._providers],
+                "hedge_after_ms": self.hedge_after * 1000,
+                "failovers": self._failovers,
+                "hedges": self._hedges,
+                "forced": self._forced,
+                "rejected": self._rejected
+            }
+        stats["breakers"] = {p.name: p.breaker.get_stats() for p in self._providers}
+        return stats
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """Statistiques du pool SMTP (si le provider SMTP est présent)"""
+        return self._provider_stats('get_pool_stats')
+
+    def get_batch_stats(self) -> Optional[Dict[str, Any]]:
+        """Statistiques de regroupement SendGrid (si le provider SendGrid est présent)"""
+        return self._provider_stats('get_batch_stats')
+
+    def _provider_stats(self, method: str) -> Optional[Dict[str, Any]]:
+        """Premier résultat non vide d'une méthode de statistiques des providers"""
+        for provider in self._providers:
+            if hasattr(provider.service, method):
+                stats = getattr(provider.service, method)()
+                if stats is not None:
+                    return stats
+        return None
+
+    def close(self):
+        """Ferme tous les providers (arrêt de l'application)"""
+        for provider in self._providers:
+            if hasattr(provider.service, 'close'):
+                try:
+                    provider.service.close()
+                except Exception as e:
+                    logger.error(f"Failed to close email provider {provider.name}: {e}")
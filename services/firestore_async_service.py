@@ -0,0 +1,543 @@
+"""
+Service Firestore asynchrone (google.cloud.firestore.AsyncClient)
+Même surface que FirestoreService, mais chaque méthode est une coroutine:
+les endpoints async de main.py peuvent garder des centaines de soumissions
+en vol sans bloquer la boucle d'événements
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Set, AsyncIterator
+
+from google.api_core.exceptions import AlreadyExists
+from google.cloud import firestore as gcloud_firestore
+
+from config.constants import ErrorMessages, SuccessMessages, Config, WriteStatus
+from services.firestore_batcher import apply_ops
+from services.firestore_service import init_firebase_app, create_dedupe_index, build_responses_query
+from services.stats_counters import ShardedCounters, build_stats, counters_drift
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AsyncFirestoreService:
+    def __init__(self, credentials_path: Optional[str] = None, credentials_json: Optional[str] = None):
+        """
+        Initialise le client Firestore asynchrone
+
+        Args:
+            credentials_path: Chemin vers le fichier credentials JSON
+            credentials_json: JSON credentials en string (pour variables d'environnement)
+        """
+        self.collection_name = "responses"
+        self._stats_cache = None
+        self._stats_cache_time = 0
+
+        # Réutiliser les credentials de l'application Firebase
+        app = init_firebase_app(credentials_path, credentials_json)
+        self.db = gcloud_firestore.AsyncClient(
+            project=app.project_id,
+            credentials=app.credential.get_credential()
+        )
+        self.collection = self.db.collection(self.collection_name)
+
+        # Index de déduplication local (Bloom + LRU)
+        self._dedupe = create_dedupe_index()
+
+        # Compteurs de statistiques incrémentés avec chaque écriture
+        self._counters = ShardedCounters(self.db)
+        logger.info(SuccessMessages.SERVICE_INITIALIZED.format(service="Firestore (async)"))
+
+    async def warm_dedupe_index(self, days: Optional[int] = None) -> int:
+        """
+        Préchauffe l'index local en streamant les IDs des N derniers jours
+
+        Args:
+            days: Fenêtre de préchauffage (défaut: DEDUPE_WARMUP_DAYS)
+
+        Returns:
+            Nombre d'IDs chargés
+        """
+        if self._dedupe is None:
+            return 0
+
+        days = days if days is not None else int(os.getenv('DEDUPE_WARMUP_DAYS', Config.DEDUPE_WARMUP_DAYS))
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        try:
+            loaded = 0
+            async for doc in self.collection.where('created_at', '>=', cutoff).select([]).stream():
+                self._dedupe.warm([doc.id])
+                loaded += 1
+            self._dedupe.mark_ready()
+            logger.info(f"Dedupe index warmed with {loaded} response ids ({days} days)")
+            return loaded
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            return 0
+
+    def get_dedupe_stats(self) -> Optional[Dict]:
+        """
+        Retourne les compteurs de l'index de déduplication local
+
+        Returns:
+            Dictionnaire de statistiques ou None si désactivé
+        """
+        return self._dedupe.get_stats() if self._dedupe is not None else None
+
+    def _remember(self, response_id: str, exists: bool):
+        """Met à jour l'index local après une réponse de Firestore"""
+        if self._dedupe is None:
+            return
+        if exists:
+            self._dedupe.add(response_id)
+        else:
+            self._dedupe.record_absent(response_id)
+
+    async def already_sent(self, response_id: str) -> bool:
+        """
+        Vérifie si une réponse a déjà été traitée
+
+        Args:
+            response_id: Identifiant unique de la réponse
+
+        Returns:
+            True si déjà envoyé, False sinon
+
+        Raises:
+            Exception: Firestore indisponible (état inconnu, à réessayer)
+        """
+        if self._dedupe is not None:
+            known = self._dedupe.check(response_id)
+            if known is not None:
+                return known
+
+        try:
+            doc = await self.collection.document(response_id).get()
+            self._remember(response_id, doc.exists)
+            return doc.exists
+        except Exception as e:
+            # État inconnu: ne pas répondre "non envoyé" (risque de double envoi)
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            raise
+
+    async def already_sent_many(self, response_ids: List[str]) -> Set[str]:
+        """
+        Vérifie en une seule lecture multi-documents quelles réponses ont déjà été traitées
+
+        Args:
+            response_ids: Identifiants des réponses à vérifier
+
+        Returns:
+            Ensemble des identifiants déjà présents dans Firestore
+
+        Raises:
+            Exception: Firestore indisponible (état inconnu, à réessayer)
+        """
+        existing = set()
+        unique_ids = []
+        for response_id in dict.fromkeys(response_ids):
+            known = self._dedupe.check(response_id) if self._dedupe is not None else None
+            if known is True:
+                existing.add(response_id)
+            elif known is None:
+                unique_ids.append(response_id)
+
+        try:
+            for i in range(0, len(unique_ids), Config.FIRESTORE_BATCH_SIZE):
+                refs = [self.collection.document(rid) for rid in unique_ids[i:i + Config.FIRESTORE_BATCH_SIZE]]
+                async for doc in self.db.get_all(refs):
+                    self._remember(doc.id, doc.exists)
+                    if doc.exists:
+                        existing.add(doc.id)
+            return existing
+        except Exception as e:
+            # État inconnu: ne pas répondre "non envoyé" (risque de double envoi)
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            raise
+
+    async def create_response(self, response_id: str, email: str, phone: str,
+                              sent_mail: bool = True, sent_sms: bool = True) -> str:
+        """
+        Crée une réponse uniquement si elle n'existe pas (create-if-absent atomique)
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            WriteStatus.CREATED, WriteStatus.DUPLICATE ou WriteStatus.FAILED
+        """
+        doc_data = {
+            "responseId": response_id,
+            "email": email,
+            "phone": phone,
+            "sent_mail": sent_mail,
+            "sent_sms": sent_sms,
+            "status": "completed",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "created_at": gcloud_firestore.SERVER_TIMESTAMP
+        }
+        counter_ops = self._counters.increment(total=1, sent_mail=sent_mail, sent_sms=sent_sms)
+        status = await self._create_document(response_id, doc_data, counter_ops)
+        if status == WriteStatus.CREATED:
+            logger.info(SuccessMessages.RESPONSE_RECORDED.format(response_id=response_id))
+        return status
+
+    async def add_response(self, response_id: str, email: str, phone: str,
+                           sent_mail: bool = True, sent_sms: bool = True) -> bool:
+        """
+        Ajoute une nouvelle réponse traitée dans Firestore
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            True si ajouté avec succès, False si déjà existant
+        """
+        return await self.create_response(response_id, email, phone, sent_mail, sent_sms) == WriteStatus.CREATED
+
+    async def claim_response(self, response_id: str, email: str, phone: str) -> str:
+        """
+        Réserve une réponse avant l'envoi des messages (étape 1 du claim-then-finalize)
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+
+        Returns:
+            Statut WriteStatus de la réservation
+        """
+        doc_data = {
+            "responseId": response_id,
+            "email": email,
+            "phone": phone,
+            "sent_mail": False,
+            "sent_sms": False,
+            "status": "pending",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "created_at": gcloud_firestore.SERVER_TIMESTAMP
+        }
+        status = await self._create_document(response_id, doc_data, self._counters.increment(total=1))
+        if status == WriteStatus.CREATED:
+            logger.info(SuccessMessages.RESPONSE_CLAIMED.format(response_id=response_id))
+        return status
+
+    async def finalize_response(self, response_id: str, sent_mail: bool, sent_sms: bool) -> bool:
+        """
+        Complète une réponse réservée avec le résultat des envois (étape 2 du claim-then-finalize)
+
+        Args:
+            response_id: Identifiant de la réponse réservée
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            True si mise à jour avec succès
+        """
+        try:
+            await self._commit([('update', self.collection.document(response_id), {
+                "sent_mail": sent_mail,
+                "sent_sms": sent_sms,
+                "status": "completed",
+                "completed_at": gcloud_firestore.SERVER_TIMESTAMP
+            })] + self._counters.increment(sent_mail=sent_mail, sent_sms=sent_sms))
+            logger.info(SuccessMessages.RESPONSE_FINALIZED.format(response_id=response_id))
+            self._invalidate_stats_cache()
+            return True
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    async def _create_document(self, response_id: str, doc_data: Dict,
+                               counter_ops: Optional[List] = None) -> str:
+        """
+        Crée un document avec la précondition "n'existe pas"
+
+        Args:
+            response_id: Identifiant du document
+            doc_data: Données du document
+            counter_ops: Incréments de compteurs commités avec la création
+
+        Returns:
+            Statut WriteStatus de l'écriture
+        """
+        # Doublon récent connu localement: pas d'appel réseau
+        if self._dedupe is not None and self._dedupe.seen_recently(response_id):
+            logger.info(f"Response already exists: {response_id}")
+            return WriteStatus.DUPLICATE
+
+        try:
+            await self._commit([('create', self.collection.document(response_id), doc_data)] + (counter_ops or []))
+            self._invalidate_stats_cache()
+            self._remember(response_id, True)
+            return WriteStatus.CREATED
+        except AlreadyExists:
+            logger.info(f"Response already exists: {response_id}")
+            self._remember(response_id, True)
+            return WriteStatus.DUPLICATE
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(e)))
+            return WriteStatus.FAILED
+
+    async def _commit(self, ops: List):
+        """
+        Commite un groupe d'écritures de manière atomique
+
+        Args:
+            ops: Liste de (op, référence, données)
+        """
+        batch = self.db.batch()
+        apply_ops(batch, ops)
+        await batch.commit()
+
+    async def add_responses(self, records: List[Dict]) -> int:
+        """
+        Enregistre plusieurs réponses par WriteBatch (500 documents max par commit)
+        Les documents sont créés (jamais écrasés); si un lot échoue parce qu'un
+        document existe déjà, ses réponses sont recréées une par une
+
+        Args:
+            records: Liste de dictionnaires avec response_id, email, phone, sent_mail, sent_sms
+
+        Returns:
+            Nombre de réponses enregistrées (créées ou déjà présentes)
+        """
+        written = 0
+        # Une écriture du lot est réservée à l'incrément des compteurs
+        chunk_size = Config.FIRESTORE_BATCH_SIZE - 1
+        try:
+            for i in range(0, len(records), chunk_size):
+                chunk = records[i:i + chunk_size]
+                ops = []
+                for record in chunk:
+                    ops.append(('create', self.collection.document(record['response_id']), {
+                        "responseId": record['response_id'],
+                        "email": record['email'],
+                        "phone": record['phone'],
+                        "sent_mail": record.get('sent_mail', True),
+                        "sent_sms": record.get('sent_sms', True),
+                        "status": "completed",
+                        "timestamp": datetime.utcnow().isoformat() + "Z",
+                        "created_at": gcloud_firestore.SERVER_TIMESTAMP
+                    }))
+                ops += self._counters.increment(
+                    total=len(chunk),
+                    sent_mail=sum(bool(op[2]['sent_mail']) for op in ops),
+                    sent_sms=sum(bool(op[2]['sent_sms']) for op in ops)
+                )
+                try:
+                    await self._commit(ops)
+                    written += len(chunk)
+                    for record in chunk:
+                        self._remember(record['response_id'], True)
+                except AlreadyExists:
+                    # Lot atomique rejeté: isoler les doublons document par document
+                    for record in chunk:
+                        status = await self.create_response(
+                            record['response_id'], record['email'], record['phone'],
+                            record.get('sent_mail', True), record.get('sent_sms', True)
+                        )
+                        if status == WriteStatus.FAILED:
+                            raise RuntimeError(f"Failed to create response {record['response_id']}")
+                        written += 1
+
+            logger.info(SuccessMessages.DATA_SAVED + f": {written} responses (batch)")
+            return written
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(e)))
+            return written
+        finally:
+            if written:
+                self._invalidate_stats_cache()
+
+    async def get_response(self, response_id: str) -> Optional[Dict]:
+        """
+        Récupère une réponse spécifique par son ID
+
+        Args:
+            response_id: Identifiant unique de la réponse
+
+        Returns:
+            Les données de la réponse ou None si non trouvée
+        """
+        try:
+            doc = await self.collection.document(response_id).get()
+            if doc.exists:
+                return doc.to_dict()
+            return None
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            return None
+
+    async def get_all_responses(self, limit: int = 100) -> List[Dict]:
+        """
+        Récupère toutes les réponses enregistrées
+
+        Args:
+            limit: Nombre maximum de résultats à retourner
+
+        Returns:
+            Liste des réponses
+        """
+        try:
+            results = [doc.to_dict() async for doc in self.collection.limit(limit).stream()]
+            logger.info(SuccessMessages.DATA_RETRIEVED.format(count=len(results)))
+            return results
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            return []
+
+    async def iter_responses(self, limit: int = Config.RESPONSES_PAGE_SIZE, cursor: Optional[str] = None,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             sent_mail: Optional[bool] = None, sent_sms: Optional[bool] = None) -> AsyncIterator[Dict]:
+        """
+        Streame une page de réponses (plus récentes d'abord) sans la charger en mémoire
+
+        Args:
+            limit: Taille de la page
+            cursor: Curseur opaque de la page précédente
+            start: Date minimale (incluse)
+            end: Date maximale (exclue)
+            sent_mail: Filtre sur l'envoi email
+            sent_sms: Filtre sur l'envoi SMS
+
+        Yields:
+            Données de chaque document (responseId = id du document)
+
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        query = build_responses_query(self.collection, gcloud_firestore.AsyncQuery, limit, cursor,
+                                      start, end, sent_mail, sent_sms)
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data['responseId'] = doc.id
+            yield data
+
+    async def get_stats(self) -> Dict:
+        """
+        Génère des statistiques sur les envois
+        Lit les compteurs maintenus à l'écriture; tant qu'aucun compteur
+        n'existe, utilise les agrégations count() en cache (TTL: STATS_CACHE_TTL)
+
+        Returns:
+            Dictionnaire avec les statistiques
+        """
+        try:
+            counts = await self.read_counters()
+            if counts is not None:
+                return build_stats(counts)
+        except Exception as e:
+            logger.error(f"Failed to read stats counters (using count()): {str(e)}")
+
+        current_time = time.time()
+        if self._stats_cache and (current_time - self._stats_cache_time) < Config.STATS_CACHE_TTL:
+            logger.debug("Returning cached stats")
+            return self._stats_cache
+
+        try:
+            counts = await self._count_totals()
+            stats = build_stats(counts)
+
+            self._stats_cache = stats
+            self._stats_cache_time = current_time
+
+            logger.info(f"Stats calculated: {counts['total']} responses, {counts['sent_mail']} emails, {counts['sent_sms']} SMS")
+            return stats
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            return {
+                "total_responses": 0,
+                "mails_sent": 0,
+                "sms_sent": 0,
+                "success_rate": 0,
+                "error": str(e)
+            }
+
+    async def read_counters(self) -> Optional[Dict[str, int]]:
+        """
+        Lit et additionne les shards de compteurs
+
+        Returns:
+            Totaux total / sent_mail / sent_sms, ou None si aucun compteur n'existe
+        """
+        return ShardedCounters.sum_shards([doc async for doc in self.db.get_all(self._counters.refs)])
+
+    async def _count_totals(self) -> Dict[str, int]:
+        """Compte les réponses par agrégations count() (trois requêtes)"""
+        return {
+            "total": await self._count(self.collection),
+            "sent_mail": await self._count(self.collection.where('sent_mail', '==', True)),
+            "sent_sms": await self._count(self.collection.where('sent_sms', '==', True))
+        }
+
+    async def reconcile_counters(self) -> Optional[Dict[str, int]]:
+        """
+        Corrige la dérive des compteurs par rapport aux agrégations count()
+
+        Returns:
+            Correction appliquée par champ, ou None si reportée (écritures concurrentes)
+        """
+        before = await self.read_counters()
+        actual = await self._count_totals()
+        after = await self.read_counters()
+
+        drift = counters_drift(before, actual, after)
+        if drift is None:
+            logger.info("Stats counters changed during reconciliation, retrying later")
+            return None
+
+        if any(drift.values()):
+            logger.warning(f"Stats counters drift corrected: {drift}")
+            await self._commit(self._counters.increment(**drift))
+        else:
+            logger.info("Stats counters are in sync")
+        return drift
+
+    @staticmethod
+    async def _count(query) -> int:
+        """Exécute une agrégation count() et retourne la valeur"""
+        result = await query.count().get()
+        return result[0][0].value if result else 0
+
+    def _invalidate_stats_cache(self):
+        """Invalide le cache des statistiques"""
+        self._stats_cache = None
+        self._stats_cache_time = 0
+
+    async def delete_response(self, response_id: str) -> bool:
+        """
+        Supprime une réponse (utile pour les tests)
+
+        Args:
+            response_id: Identifiant de la réponse à supprimer
+
+        Returns:
+            True si supprimé avec succès
+        """
+        try:
+            ref = self.collection.document(response_id)
+            doc = await ref.get()
+            if not doc.exists:
+                return True
+            data = doc.to_dict() or {}
+            await self._commit([('delete', ref, None)] + self._counters.increment(
+                total=-1, sent_mail=-int(bool(data.get('sent_mail'))), sent_sms=-int(bool(data.get('sent_sms')))
+            ))
+            if self._dedupe is not None:
+                self._dedupe.discard(response_id)
+            self._invalidate_stats_cache()
+            logger.info(f"Response deleted: {response_id}")
+            return True
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_DELETE_FAILED.format(error=str(e)))
+            return False
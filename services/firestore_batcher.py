@@ -0,0 +1,150 @@
+"""
+Écriture différée et coalescée pour Firestore
+Regroupe les écritures unitaires (create/set/update/delete) en WriteBatch
+commités toutes les N ms ou tous les M documents
+Les écritures 'increment' (compteurs) d'un même commit sont fusionnées en
+une seule écriture par document
+"""
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from firebase_admin import firestore
+
+from config.constants import Config
+from utils.batching import MicroBatcher
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Une écriture: (opération, référence du document, données)
+WriteOp = Tuple[str, Any, Optional[Dict]]
+
+
+def apply_ops(batch, ops: List[WriteOp]):
+    """
+    Ajoute des écritures à un WriteBatch (client sync ou async)
+    Les incréments visant le même document sont additionnés en un seul set(merge)
+    
+    Args:
+        batch: WriteBatch Firestore
+        ops: Liste de (op, référence, données) avec op parmi create/set/update/delete/increment
+    """
+    increments: Dict[str, Tuple[Any, Dict[str, int]]] = {}
+    for op, ref, data in ops:
+        if op == 'create':
+            batch.create(ref, data)
+        elif op == 'set':
+            batch.set(ref, data)
+        elif op == 'update':
+            batch.update(ref, data)
+        elif op == 'delete':
+            batch.delete(ref)
+        elif op == 'increment':
+            deltas = increments.setdefault(ref.path, (ref, {}))[1]
+            for field, delta in data.items():
+                deltas[field] = deltas.get(field, 0) + delta
+        else:
+            raise ValueError(f"Unknown write operation: {op}")
+    
+    for ref, deltas in increments.values():
+        fields = {field: firestore.Increment(delta) for field, delta in deltas.items() if delta}
+        if fields:
+            batch.set(ref, fields, merge=True)
+
+
+class FirestoreWriteBatcher:
+    """
+    Batcher d'écritures Firestore
+
+    Chaque élément soumis est un groupe d'écritures appliqué atomiquement
+    (ex: le document de réponse et ses compteurs). Si un commit groupé échoue
+    (ex: document déjà existant pour un create), les groupes sont recommités
+    un par un pour attribuer le résultat à chaque appelant.
+    """
+
+    def __init__(self, db, max_batch: int = Config.FIRESTORE_BATCH_SIZE,
+                 max_delay_ms: int = Config.FIRESTORE_BATCH_DELAY_MS):
+        """
+        Args:
+            db: Client Firestore
+            max_batch: Nombre maximum de groupes par commit
+            max_delay_ms: Délai maximal avant commit (millisecondes)
+        """
+        self.db = db
+        self._batcher = MicroBatcher(
+            self._commit_groups,
+            max_batch=max_batch,
+            max_delay_ms=max_delay_ms,
+            name="firestore-writer"
+        )
+
+    def submit(self, ops: List[WriteOp]) -> Future:
+        """
+        Soumet un groupe d'écritures
+
+        Args:
+            ops: Liste de (op, référence, données) avec op parmi create/set/update/delete/increment
+
+        Returns:
+            Future résolu à None une fois commité, ou levant l'erreur Firestore
+        """
+        return self._batcher.submit(ops)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Commite immédiatement les écritures en attente"""
+        return self._batcher.flush(timeout)
+
+    def close(self, timeout: Optional[float] = 30):
+        """Commite les écritures restantes et arrête le thread d'écriture"""
+        self._batcher.close(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de regroupement des écritures"""
+        return self._batcher.get_stats()
+
+    def _commit_groups(self, groups: List[List[WriteOp]]) -> List[Optional[Exception]]:
+        """
+        Commite les groupes en WriteBatch de 500 écritures maximum
+
+        Returns:
+            Liste de résultats (None ou exception) alignée sur les groupes
+        """
+        results: List[Optional[Exception]] = [None] * len(groups)
+
+        # Découper en commits respectant la limite de 500 écritures,
+        # un même document n'apparaissant qu'une fois par commit
+        chunks: List[List[int]] = [[]]
+        op_count = 0
+        paths = set()
+        for index, ops in enumerate(groups):
+            # Les incréments sont fusionnés par document: ils ne créent pas de conflit
+            group_paths = {ref.path for op, ref, _ in ops if op != 'increment'}
+            if chunks[-1] and (op_count + len(ops) > Config.FIRESTORE_BATCH_SIZE or paths & group_paths):
+                chunks.append([])
+                op_count = 0
+                paths = set()
+            chunks[-1].append(index)
+            op_count += len(ops)
+            paths |= group_paths
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            try:
+                batch = self.db.batch()
+                apply_ops(batch, [op for index in chunk for op in groups[index]])
+                batch.commit()
+            except Exception as e:
+                if len(chunk) == 1:
+                    results[chunk[0]] = e
+                    continue
+                logger.warning(f"Batched commit of {len(chunk)} groups failed ({e}), retrying individually")
+                for index in chunk:
+                    try:
+                        batch = self.db.batch()
+                        apply_ops(batch, groups[index])
+                        batch.commit()
+                    except Exception as single_error:
+                        results[index] = single_error
+
+        return results
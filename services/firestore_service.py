@@ -7,18 +7,117 @@ VERSION OPTIMISÉE avec cache, logging et messages centralisés
 import os
 import json
 import time
-from datetime import datetime
-from typing import Optional, List, Dict
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Set, Iterator
 
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
 
-from config.constants import ErrorMessages, SuccessMessages, Config
+from config.constants import ErrorMessages, SuccessMessages, Config, WriteStatus
+from services.firestore_batcher import FirestoreWriteBatcher, apply_ops
+from services.stats_counters import ShardedCounters, build_stats, counters_drift
+from utils.dedupe_index import DedupeIndex
 from utils.logger import setup_logger
+from utils.pagination import decode_cursor, parse_datetime
+from utils.write_spool import WriteSpool
 
 logger = setup_logger(__name__)
 
 
+def init_firebase_app(credentials_path: Optional[str] = None, credentials_json: Optional[str] = None):
+    """
+    Initialise l'application Firebase si ce n'est pas déjà fait
+    
+    Args:
+        credentials_path: Chemin vers le fichier credentials JSON
+        credentials_json: JSON credentials en string (pour variables d'environnement)
+        
+    Returns:
+        Application Firebase par défaut
+    """
+    if not firebase_admin._apps:
+        try:
+            if credentials_json:
+                # Depuis variable d'environnement (production)
+                cred_dict = json.loads(credentials_json)
+                cred = credentials.Certificate(cred_dict)
+            elif credentials_path and os.path.exists(credentials_path):
+                # Depuis fichier local (développement)
+                cred = credentials.Certificate(credentials_path)
+            else:
+                # Essayer les credentials par défaut de l'environnement
+                cred = credentials.ApplicationDefault()
+            
+            firebase_admin.initialize_app(cred)
+            logger.info(SuccessMessages.SERVICE_INITIALIZED.format(service="Firestore"))
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_INIT_FAILED.format(error=str(e)))
+            raise ValueError(ErrorMessages.FIRESTORE_INIT_FAILED.format(error=str(e)))
+    return firebase_admin.get_app()
+
+
+def create_dedupe_index() -> Optional[DedupeIndex]:
+    """
+    Crée l'index de déduplication local selon la configuration
+    
+    Returns:
+        Instance de DedupeIndex ou None si désactivé
+    """
+    if os.getenv('DEDUPE_INDEX_ENABLED', str(Config.DEDUPE_INDEX_ENABLED)).lower() != 'true':
+        return None
+    return DedupeIndex(
+        bloom_capacity=int(os.getenv('DEDUPE_BLOOM_CAPACITY', Config.DEDUPE_BLOOM_CAPACITY)),
+        bloom_error_rate=float(os.getenv('DEDUPE_BLOOM_ERROR_RATE', Config.DEDUPE_BLOOM_ERROR_RATE)),
+        lru_size=int(os.getenv('DEDUPE_LRU_SIZE', Config.DEDUPE_LRU_SIZE))
+    )
+
+
+def build_responses_query(collection, query_class, limit: int, cursor: Optional[str] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          sent_mail: Optional[bool] = None, sent_sms: Optional[bool] = None):
+    """
+    Construit une requête paginée par clé sur (created_at, id) décroissants
+    Les filtres sont évalués côté serveur (voir firestore.indexes.json)
+    
+    Args:
+        collection: Collection Firestore (sync ou async)
+        query_class: Classe Query du client (pour la constante DESCENDING)
+        limit: Taille de la page
+        cursor: Curseur opaque renvoyé par la page précédente
+        start: Date minimale (incluse) de created_at
+        end: Date maximale (exclue) de created_at
+        sent_mail: Filtre d'égalité sur sent_mail
+        sent_sms: Filtre d'égalité sur sent_sms
+        
+    Returns:
+        Requête Firestore prête à être streamée
+        
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    query = collection
+    if sent_mail is not None:
+        query = query.where('sent_mail', '==', sent_mail)
+    if sent_sms is not None:
+        query = query.where('sent_sms', '==', sent_sms)
+    if start is not None:
+        query = query.where('created_at', '>=', start)
+    if end is not None:
+        query = query.where('created_at', '<', end)
+    
+    query = query.order_by('created_at', direction=query_class.DESCENDING)
+    query = query.order_by('__name__', direction=query_class.DESCENDING)
+    
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = query.start_after({'created_at': created_at, '__name__': doc_id})
+    
+    return query.limit(limit)
+
+
 class FirestoreService:
     def __init__(self, credentials_path: Optional[str] = None, credentials_json: Optional[str] = None):
         """
@@ -33,27 +132,67 @@ class FirestoreService:
         self._stats_cache_time = 0
         
         # Initialiser Firebase si pas déjà fait
-        if not firebase_admin._apps:
-            try:
-                if credentials_json:
-                    # Depuis variable d'environnement (production)
-                    cred_dict = json.loads(credentials_json)
-                    cred = credentials.Certificate(cred_dict)
-                elif credentials_path and os.path.exists(credentials_path):
-                    # Depuis fichier local (développement)
-                    cred = credentials.Certificate(credentials_path)
-                else:
-                    # Essayer les credentials par défaut de l'environnement
-                    cred = credentials.ApplicationDefault()
-                
-                firebase_admin.initialize_app(cred)
-                logger.info(SuccessMessages.SERVICE_INITIALIZED.format(service="Firestore"))
-            except Exception as e:
-                logger.error(ErrorMessages.FIRESTORE_INIT_FAILED.format(error=str(e)))
-                raise ValueError(ErrorMessages.FIRESTORE_INIT_FAILED.format(error=str(e)))
+        init_firebase_app(credentials_path, credentials_json)
         
         self.db = firestore.client()
         self.collection = self.db.collection(self.collection_name)
+        
+        # Index de déduplication local (Bloom + LRU)
+        self._dedupe = create_dedupe_index()
+        
+        # Compteurs de statistiques incrémentés avec chaque écriture
+        self._counters = ShardedCounters(self.db)
+        
+        # Writer groupé: coalesce les écritures unitaires en WriteBatch
+        self._writer: Optional[FirestoreWriteBatcher] = None
+        if os.getenv('FIRESTORE_BATCH_WRITES', str(Config.FIRESTORE_BATCH_WRITES)).lower() == 'true':
+            self._writer = FirestoreWriteBatcher(
+                self.db,
+                max_batch=int(os.getenv('FIRESTORE_BATCH_MAX_DOCS', Config.FIRESTORE_BATCH_SIZE)),
+                max_delay_ms=int(os.getenv('FIRESTORE_BATCH_DELAY_MS', Config.FIRESTORE_BATCH_DELAY_MS))
+            )
+        
+        # Spool local: les écritures refusées par Firestore sont conservées sur disque
+        # et rejouées en arrière-plan (une panne dégrade la latence, pas la cohérence)
+        self._spool: Optional[WriteSpool] = None
+        self._replay_stop = threading.Event()
+        if os.getenv('SPOOL_ENABLED', str(Config.SPOOL_ENABLED)).lower() == 'true':
+            self._spool = WriteSpool(os.getenv('SPOOL_PATH', Config.SPOOL_PATH))
+            threading.Thread(target=self._replay_loop, name="firestore-spool-replayer", daemon=True).start()
+    
+    def warm_dedupe_index(self, days: Optional[int] = None) -> int:
+        """
+        Préchauffe l'index local en streamant les IDs des N derniers jours
+        
+        Args:
+            days: Fenêtre de préchauffage (défaut: DEDUPE_WARMUP_DAYS)
+            
+        Returns:
+            Nombre d'IDs chargés
+        """
+        if self._dedupe is None:
+            return 0
+        
+        days = days if days is not None else int(os.getenv('DEDUPE_WARMUP_DAYS', Config.DEDUPE_WARMUP_DAYS))
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        try:
+            docs = self.collection.where('created_at', '>=', cutoff).select([]).stream()
+            loaded = self._dedupe.warm(doc.id for doc in docs)
+            self._dedupe.mark_ready()
+            logger.info(f"Dedupe index warmed with {loaded} response ids ({days} days)")
+            return loaded
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            return 0
+    
+    def get_dedupe_stats(self) -> Optional[Dict]:
+        """
+        Retourne les compteurs de l'index de déduplication local
+        
+        Returns:
+            Dictionnaire de statistiques ou None si désactivé
+        """
+        return self._dedupe.get_stats() if self._dedupe is not None else None
     
     def already_sent(self, response_id: str) -> bool:
         """
@@ -64,16 +203,122 @@ class FirestoreService:
             
         Returns:
             True si déjà envoyé, False sinon
+            
+        Raises:
+            Exception: Firestore indisponible (état inconnu, à réessayer)
         """
+        if self._spool is not None and response_id in self._spool:
+            return True
+        
+        if self._dedupe is not None:
+            known = self._dedupe.check(response_id)
+            if known is not None:
+                return known
+        
         try:
             doc = self.collection.document(response_id).get()
+            self._remember(response_id, doc.exists)
             return doc.exists
         except Exception as e:
+            # État inconnu: ne pas répondre "non envoyé" (risque de double envoi)
             logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
-            return False
+            raise
+    
+    def _remember(self, response_id: str, exists: bool):
+        """Met à jour l'index local après une réponse de Firestore"""
+        if self._dedupe is None:
+            return
+        if exists:
+            self._dedupe.add(response_id)
+        else:
+            self._dedupe.record_absent(response_id)
+    
+    def already_sent_many(self, response_ids: List[str]) -> Set[str]:
+        """
+        Vérifie en une seule lecture multi-documents quelles réponses ont déjà été traitées
+        
+        Args:
+            response_ids: Identifiants des réponses à vérifier
+            
+        Returns:
+            Ensemble des identifiants déjà présents dans Firestore
+            
+        Raises:
+            Exception: Firestore indisponible (état inconnu, à réessayer)
+        """
+        existing = set()
+        unique_ids = []
+        for response_id in dict.fromkeys(response_ids):
+            if self._spool is not None and response_id in self._spool:
+                existing.add(response_id)
+                continue
+            known = self._dedupe.check(response_id) if self._dedupe is not None else None
+            if known is True:
+                existing.add(response_id)
+            elif known is None:
+                unique_ids.append(response_id)
+        
+        try:
+            for i in range(0, len(unique_ids), Config.FIRESTORE_BATCH_SIZE):
+                refs = [self.collection.document(rid) for rid in unique_ids[i:i + Config.FIRESTORE_BATCH_SIZE]]
+                for doc in self.db.get_all(refs):
+                    self._remember(doc.id, doc.exists)
+                    if doc.exists:
+                        existing.add(doc.id)
+            return existing
+        except Exception as e:
+            # État inconnu: ne pas répondre "non envoyé" (risque de double envoi)
+            logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
+            raise
+    
+    def submit_response(self, response_id: str, email: str, phone: str,
+                        sent_mail: bool = True, sent_sms: bool = True) -> Future:
+        """
+        Soumet la création d'une réponse au writer groupé sans attendre le commit
+        
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+            
+        Returns:
+            Future résolu avec WriteStatus une fois l'écriture durable
+        """
+        doc_data = {
+            "responseId": response_id,
+            "email": email,
+            "phone": phone,
+            "sent_mail": sent_mail,
+            "sent_sms": sent_sms,
+            "status": "completed",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "created_at": firestore.SERVER_TIMESTAMP
+        }
+        counter_ops = self._counters.increment(total=1, sent_mail=sent_mail, sent_sms=sent_sms)
+        return self._submit_create(response_id, doc_data, SuccessMessages.RESPONSE_RECORDED, counter_ops)
+    
+    def create_response(self, response_id: str, email: str, phone: str,
+                        sent_mail: bool = True, sent_sms: bool = True) -> str:
+        """
+        Crée une réponse uniquement si elle n'existe pas (create-if-absent atomique)
+        Une seule requête réseau: Firestore rejette la création si le document existe
+        
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+            
+        Returns:
+            WriteStatus.CREATED, WriteStatus.DUPLICATE ou WriteStatus.FAILED
+        """
+        return self.submit_response(response_id, email, phone, sent_mail, sent_sms).result()
     
     def add_response(self, response_id: str, email: str, phone: str, 
-                    sent_mail: bool = True, sent_sms: bool = True) -> bool:
+                    sent_mail: bool = True, sent_sms: bool = True, wait: bool = True) -> bool:
         """
         Ajoute une nouvelle réponse traitée dans Firestore
         
@@ -83,35 +328,355 @@ class FirestoreService:
             phone: Numéro de téléphone du répondant
             sent_mail: Statut d'envoi du mail
             sent_sms: Statut d'envoi du SMS
+            wait: Attendre le commit (False: écriture différée, retourne True)
             
         Returns:
             True si ajouté avec succès, False si déjà existant
         """
-        if self.already_sent(response_id):
-            return False
+        future = self.submit_response(response_id, email, phone, sent_mail, sent_sms)
+        if not wait:
+            return True
+        return future.result() == WriteStatus.CREATED
+    
+    def claim_response(self, response_id: str, email: str, phone: str) -> str:
+        """
+        Réserve une réponse avant l'envoi des messages (étape 1 du claim-then-finalize)
+        Seul le premier appelant obtient CREATED: deux réplicas ne peuvent pas
+        envoyer pour la même soumission
         
-        try:
-            doc_data = {
-                "responseId": response_id,
-                "email": email,
-                "phone": phone,
-                "sent_mail": sent_mail,
-                "sent_sms": sent_sms,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "created_at": firestore.SERVER_TIMESTAMP
-            }
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
             
-            self.collection.document(response_id).set(doc_data)
-            logger.info(SuccessMessages.RESPONSE_RECORDED.format(response_id=response_id))
+        Returns:
+            WriteStatus.CREATED si réservée, WriteStatus.DUPLICATE si déjà réservée/traitée,
+            WriteStatus.FAILED en cas d'erreur Firestore
+        """
+        doc_data = {
+            "responseId": response_id,
+            "email": email,
+            "phone": phone,
+            "sent_mail": False,
+            "sent_sms": False,
+            "status": "pending",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "created_at": firestore.SERVER_TIMESTAMP
+        }
+        counter_ops = self._counters.increment(total=1)
+        return self._submit_create(response_id, doc_data, SuccessMessages.RESPONSE_CLAIMED, counter_ops).result()
+    
+    def finalize_response(self, response_id: str, sent_mail: bool, sent_sms: bool) -> bool:
+        """
+        Complète une réponse réservée avec le résultat des envois (étape 2 du claim-then-finalize)
+        
+        Args:
+            response_id: Identifiant de la réponse réservée
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
             
-            # Invalider le cache des stats
+        Returns:
+            True si mise à jour avec succès
+        """
+        fields = {
+            "sent_mail": sent_mail,
+            "sent_sms": sent_sms,
+            "status": "completed",
+            "completed_at": firestore.SERVER_TIMESTAMP
+        }
+        
+        # Réservation encore dans le spool: compléter le document en attente
+        spooled = self._spool.get(response_id) if self._spool is not None else None
+        if spooled is not None:
+            self._spool.put(response_id, {"op": spooled['op'], "data": {**spooled['data'], **self._spoolable(fields)}})
+            logger.info(SuccessMessages.RESPONSE_FINALIZED.format(response_id=response_id) + " (spooled)")
+            return True
+        
+        try:
+            self._submit_write([('update', self.collection.document(response_id), fields)]
+                               + self._counters.increment(sent_mail=sent_mail, sent_sms=sent_sms)).result()
+            logger.info(SuccessMessages.RESPONSE_FINALIZED.format(response_id=response_id))
             self._invalidate_stats_cache()
             return True
-            
         except Exception as e:
             logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(e)))
+            if self._spool is not None and not isinstance(e, NotFound):
+                self._spool_write(response_id, "update", fields)
+                return True
             return False
     
+    def _submit_create(self, response_id: str, doc_data: Dict, success_message: str,
+                       counter_ops: Optional[List] = None) -> Future:
+        """
+        Soumet la création d'un document avec la précondition "n'existe pas"
+        
+        Args:
+            response_id: Identifiant du document
+            doc_data: Données du document
+            success_message: Message journalisé en cas de création
+            counter_ops: Incréments de compteurs commités avec la création
+            
+        Returns:
+            Future résolu avec le statut WriteStatus de l'écriture
+        """
+        status_future: Future = Future()
+        
+        # Doublon récent connu localement (ou en attente dans le spool): pas d'appel réseau
+        if (self._spool is not None and response_id in self._spool) or \
+                (self._dedupe is not None and self._dedupe.seen_recently(response_id)):
+            logger.info(f"Response already exists: {response_id}")
+            status_future.set_result(WriteStatus.DUPLICATE)
+            return status_future
+        
+        def on_done(write_future: Future):
+            error = write_future.exception()
+            if error is None:
+                logger.info(success_message.format(response_id=response_id))
+                self._invalidate_stats_cache()
+                self._remember(response_id, True)
+                status_future.set_result(WriteStatus.CREATED)
+            elif isinstance(error, AlreadyExists):
+                logger.info(f"Response already exists: {response_id}")
+                self._remember(response_id, True)
+                status_future.set_result(WriteStatus.DUPLICATE)
+            else:
+                logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(error)))
+                if self._spool is None:
+                    status_future.set_result(WriteStatus.FAILED)
+                    return
+                try:
+                    self._spool_write(response_id, "create", doc_data)
+                    status_future.set_result(WriteStatus.CREATED)
+                except Exception as spool_error:
+                    logger.error(f"Write spool failed: {spool_error}")
+                    status_future.set_result(WriteStatus.FAILED)
+        
+        ops = [('create', self.collection.document(response_id), doc_data)] + (counter_ops or [])
+        self._submit_write(ops).add_done_callback(on_done)
+        return status_future
+    
+    def _submit_write(self, ops: List) -> Future:
+        """
+        Envoie un groupe d'écritures au writer groupé, ou le commite immédiatement
+        si le regroupement est désactivé
+        
+        Args:
+            ops: Liste de (op, référence, données)
+            
+        Returns:
+            Future résolu à None une fois commité
+        """
+        if self._writer is not None:
+            return self._writer.submit(ops)
+        
+        future: Future = Future()
+        try:
+            batch = self.db.batch()
+            apply_ops(batch, ops)
+            batch.commit()
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Commite immédiatement les écritures groupées en attente
+        
+        Args:
+            timeout: Temps maximum d'attente (secondes)
+            
+        Returns:
+            True si tout a été commité
+        """
+        return self._writer.flush(timeout) if self._writer is not None else True
+    
+    def close(self):
+        """Commite les écritures en attente et arrête le writer groupé (arrêt de l'application)"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            logger.info("Firestore write batcher flushed and closed")
+        if self._spool is not None:
+            self._replay_stop.set()
+            self._spool.close()
+            if len(self._spool):
+                logger.warning(f"{len(self._spool)} spooled writes kept on disk for replay")
+    
+    @staticmethod
+    def _spoolable(data: Dict) -> Dict:
+        """Remplace les horodatages serveur par l'heure locale (sérialisable en JSON)"""
+        now = datetime.utcnow().isoformat() + "+00:00"
+        return {key: now if value is firestore.SERVER_TIMESTAMP else value for key, value in data.items()}
+    
+    def _spool_write(self, response_id: str, op: str, data: Dict):
+        """
+        Conserve une écriture refusée par Firestore dans le spool local
+        
+        Args:
+            response_id: Identifiant de la réponse
+            op: "create" (document complet) ou "update" (champs modifiés)
+            data: Données de l'écriture
+        """
+        self._spool.put(response_id, {"op": op, "data": self._spoolable(data)})
+        logger.warning(f"Firestore unavailable, {op} of {response_id} spooled for replay")
+    
+    def _replay_ops(self, response_id: str, write: Dict) -> List:
+        """Construit les écritures Firestore (document + compteurs) d'une entrée du spool"""
+        data = dict(write['data'])
+        for field in ('created_at', 'completed_at'):
+            if isinstance(data.get(field), str):
+                data[field] = parse_datetime(data[field])
+        ref = self.collection.document(response_id)
+        if write['op'] == 'create':
+            return [('create', ref, data)] + self._counters.increment(
+                total=1, sent_mail=data.get('sent_mail', False), sent_sms=data.get('sent_sms', False)
+            )
+        return [('update', ref, data)] + self._counters.increment(
+            sent_mail=data.get('sent_mail', False), sent_sms=data.get('sent_sms', False)
+        )
+    
+    def replay_spool(self) -> int:
+        """
+        Rejoue les écritures du spool vers Firestore par lots
+        S'arrête au premier échec (Firestore toujours indisponible)
+        
+        Returns:
+            Nombre d'écritures rejouées
+        """
+        if self._spool is None:
+            return 0
+        
+        replayed = 0
+        while True:
+            pending = self._spool.pending(Config.FIRESTORE_BATCH_SIZE)
+            if not pending:
+                return replayed
+            
+            futures = [(key, write, self._submit_write(self._replay_ops(key, write))) for key, write in pending]
+            done, error = {}, None
+            for key, write, future in futures:
+                try:
+                    future.result()
+                    done[key] = write
+                    if write['op'] == 'create':
+                        self._remember(key, True)
+                except (AlreadyExists, NotFound) as e:
+                    # Déjà appliquée (création) ou document absent (mise à jour): rien à rejouer
+                    logger.warning(f"Spooled {write['op']} of {key} dropped: {e}")
+                    done[key] = write
+                except Exception as e:
+                    error = e
+            
+            self._spool.mark_done(done.keys(), done)
+            replayed += len(done)
+            if done:
+                self._invalidate_stats_cache()
+                logger.info(f"Replayed {len(done)} spooled writes to Firestore ({len(self._spool)} remaining)")
+            if error is not None:
+                logger.warning(f"Spool replay paused, Firestore still failing: {error}")
+                return replayed
+    
+    def _replay_loop(self):
+        """Thread de rejeu: tente de vider le spool à intervalle régulier"""
+        interval = float(os.getenv('SPOOL_REPLAY_INTERVAL', Config.SPOOL_REPLAY_INTERVAL))
+        while not self._replay_stop.wait(interval):
+            if len(self._spool):
+                try:
+                    self.replay_spool()
+                except Exception as e:
+                    logger.error(f"Spool replay failed: {e}")
+    
+    def get_spool_stats(self) -> Optional[Dict]:
+        """
+        Retourne l'état du spool local
+        
+        Returns:
+            Dictionnaire de statistiques ou None si désactivé
+        """
+        return self._spool.get_stats() if self._spool is not None else None
+    
+    def get_writer_stats(self) -> Optional[Dict]:
+        """
+        Retourne les statistiques du writer groupé
+        
+        Returns:
+            Dictionnaire de statistiques ou None si désactivé
+        """
+        return self._writer.get_stats() if self._writer is not None else None
+    
+    def add_responses(self, records: List[Dict]) -> int:
+        """
+        Enregistre plusieurs réponses par WriteBatch (500 documents max par commit)
+        Les documents sont créés (jamais écrasés); si un lot échoue parce qu'un
+        document existe déjà, ses réponses sont recréées une par une
+        
+        Args:
+            records: Liste de dictionnaires avec response_id, email, phone, sent_mail, sent_sms
+            
+        Returns:
+            Nombre de réponses enregistrées (créées ou déjà présentes)
+        """
+        written = 0
+        # Une écriture du lot est réservée à l'incrément des compteurs
+        chunk_size = Config.FIRESTORE_BATCH_SIZE - 1
+        try:
+            for i in range(0, len(records), chunk_size):
+                chunk = records[i:i + chunk_size]
+                ops = []
+                for record in chunk:
+                    doc_data = {
+                        "responseId": record['response_id'],
+                        "email": record['email'],
+                        "phone": record['phone'],
+                        "sent_mail": record.get('sent_mail', True),
+                        "sent_sms": record.get('sent_sms', True),
+                        "status": "completed",
+                        "timestamp": datetime.utcnow().isoformat() + "Z",
+                        "created_at": firestore.SERVER_TIMESTAMP
+                    }
+                    ops.append(('create', self.collection.document(record['response_id']), doc_data))
+                ops += self._counters.increment(
+                    total=len(chunk),
+                    sent_mail=sum(bool(op[2]['sent_mail']) for op in ops),
+                    sent_sms=sum(bool(op[2]['sent_sms']) for op in ops)
+                )
+                try:
+                    batch = self.db.batch()
+                    apply_ops(batch, ops)
+                    batch.commit()
+                    written += len(chunk)
+                    for record in chunk:
+                        self._remember(record['response_id'], True)
+                except AlreadyExists:
+                    # Lot atomique rejeté: isoler les doublons document par document
+                    for record in chunk:
+                        status = self.create_response(
+                            record['response_id'], record['email'], record['phone'],
+                            record.get('sent_mail', True), record.get('sent_sms', True)
+                        )
+                        if status == WriteStatus.FAILED:
+                            raise RuntimeError(f"Failed to create response {record['response_id']}")
+                        written += 1
+                except Exception as e:
+                    if self._spool is None:
+                        raise
+                    # Firestore indisponible: conserver le lot dans le spool
+                    logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(e)))
+                    for record, (_, _, doc_data) in zip(chunk, ops):
+                        if record['response_id'] not in self._spool:
+                            self._spool_write(record['response_id'], "create", doc_data)
+                    written += len(chunk)
+            
+            logger.info(SuccessMessages.DATA_SAVED + f": {written} responses (batch)")
+            return written
+        except Exception as e:
+            logger.error(ErrorMessages.FIRESTORE_WRITE_FAILED.format(error=str(e)))
+            return written
+        finally:
+            if written:
+                self._invalidate_stats_cache()
+    
     def get_response(self, response_id: str) -> Optional[Dict]:
         """
         Récupère une réponse spécifique par son ID
@@ -150,14 +715,49 @@ class FirestoreService:
             logger.error(ErrorMessages.FIRESTORE_QUERY_FAILED.format(error=str(e)))
             return []
     
+    def iter_responses(self, limit: int = Config.RESPONSES_PAGE_SIZE, cursor: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       sent_mail: Optional[bool] = None, sent_sms: Optional[bool] = None) -> Iterator[Dict]:
+        """
+        Streame une page de réponses (plus récentes d'abord) sans la charger en mémoire
+        
+        Args:
+            limit: Taille de la page
+            cursor: Curseur opaque de la page précédente
+            start: Date minimale (incluse)
+            end: Date maximale (exclue)
+            sent_mail: Filtre sur l'envoi email
+            sent_sms: Filtre sur l'envoi SMS
+            
+        Yields:
+            Données de chaque document (responseId = id du document)
+            
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        query = build_responses_query(self.collection, firestore.Query, limit, cursor,
+                                      start, end, sent_mail, sent_sms)
+        for doc in query.stream():
+            data = doc.to_dict()
+            data['responseId'] = doc.id
+            yield data
+    
     def get_stats(self) -> Dict:
         """
-        Génère des statistiques sur les envois avec caching
-        Cache pendant 5 minutes pour éviter les requêtes coûteuses
+        Génère des statistiques sur les envois
+        Lit les compteurs maintenus à l'écriture (un seul get_all, toujours à jour);
+        tant qu'aucun compteur n'existe, utilise les agrégations count() en cache
         
         Returns:
             Dictionnaire avec les statistiques
         """
+        try:
+            counts = self.read_counters()
+            if counts is not None:
+                return build_stats(counts)
+        except Exception as e:
+            logger.error(f"Failed to read stats counters (using count()): {str(e)}")
+        
         # Vérifier le cache
         current_time = time.time()
         if self._stats_cache and (current_time - self._stats_cache_time) < Config.STATS_CACHE_TTL:
@@ -165,37 +765,14 @@ class FirestoreService:
             return self._stats_cache
         
         try:
-            # Utiliser aggregation_query si disponible (Firestore v10+)
-            # Sinon, fallback sur count query
-            from firebase_admin import firestore as admin_firestore
-            
-            # Compter tous les documents (optimisé)
-            total_query = self.collection.count()
-            total_result = total_query.get()
-            total = total_result[0][0].value if total_result else 0
-            
-            # Compter les emails envoyés
-            mail_query = self.collection.where('sent_mail', '==', True).count()
-            mail_result = mail_query.get()
-            mails_sent = mail_result[0][0].value if mail_result else 0
-            
-            # Compter les SMS envoyés
-            sms_query = self.collection.where('sent_sms', '==', True).count()
-            sms_result = sms_query.get()
-            sms_sent = sms_result[0][0].value if sms_result else 0
-            
-            stats = {
-                "total_responses": total,
-                "mails_sent": mails_sent,
-                "sms_sent": sms_sent,
-                "success_rate": 100 if total == 0 else round((mails_sent + sms_sent) / (total * 2) * 100, 2)
-            }
+            counts = self._count_totals()
+            stats = build_stats(counts)
             
             # Mettre en cache
             self._stats_cache = stats
             self._stats_cache_time = current_time
             
-            logger.info(f"Stats calculated: {total} responses, {mails_sent} emails, {sms_sent} SMS")
+            logger.info(f"Stats calculated: {counts['total']} responses, {counts['sent_mail']} emails, {counts['sent_sms']} SMS")
             return stats
             
         except Exception as e:
@@ -203,6 +780,55 @@ class FirestoreService:
             # Fallback sur l'ancienne méthode si count() n'est pas disponible
             return self._get_stats_fallback()
     
+    def read_counters(self) -> Optional[Dict[str, int]]:
+        """
+        Lit et additionne les shards de compteurs
+        
+        Returns:
+            Totaux total / sent_mail / sent_sms, ou None si aucun compteur n'existe
+        """
+        return ShardedCounters.sum_shards(self.db.get_all(self._counters.refs))
+    
+    def _count_totals(self) -> Dict[str, int]:
+        """
+        Compte les réponses par agrégations count() (trois requêtes)
+        
+        Returns:
+            Totaux total / sent_mail / sent_sms
+        """
+        total_result = self.collection.count().get()
+        mail_result = self.collection.where('sent_mail', '==', True).count().get()
+        sms_result = self.collection.where('sent_sms', '==', True).count().get()
+        return {
+            "total": total_result[0][0].value if total_result else 0,
+            "sent_mail": mail_result[0][0].value if mail_result else 0,
+            "sent_sms": sms_result[0][0].value if sms_result else 0
+        }
+    
+    def reconcile_counters(self) -> Optional[Dict[str, int]]:
+        """
+        Corrige la dérive des compteurs par rapport aux agrégations count()
+        Initialise aussi les compteurs d'une base existante
+        
+        Returns:
+            Correction appliquée par champ, ou None si reportée (écritures concurrentes)
+        """
+        before = self.read_counters()
+        actual = self._count_totals()
+        after = self.read_counters()
+        
+        drift = counters_drift(before, actual, after)
+        if drift is None:
+            logger.info("Stats counters changed during reconciliation, retrying later")
+            return None
+        
+        if any(drift.values()):
+            logger.warning(f"Stats counters drift corrected: {drift}")
+            self._submit_write(self._counters.increment(**drift)).result()
+        else:
+            logger.info("Stats counters are in sync")
+        return drift
+    
     def _get_stats_fallback(self) -> Dict:
         """
         Méthode fallback pour get_stats (moins efficace mais compatible)
@@ -265,7 +891,16 @@ class FirestoreService:
             True si supprimé avec succès
         """
         try:
-            self.collection.document(response_id).delete()
+            ref = self.collection.document(response_id)
+            doc = ref.get()
+            if not doc.exists:
+                return True
+            data = doc.to_dict() or {}
+            self._submit_write([('delete', ref, None)] + self._counters.increment(
+                total=-1, sent_mail=-int(bool(data.get('sent_mail'))), sent_sms=-int(bool(data.get('sent_sms')))
+            )).result()
+            if self._dedupe is not None:
+                self._dedupe.discard(response_id)
             self._invalidate_stats_cache()
             logger.info(f"Response deleted: {response_id}")
             return True
@@ -282,12 +917,29 @@ class FirestoreService:
             True si réussi
         """
         try:
-            docs = self.collection.stream()
+            docs = self.collection.select([]).stream()
             deleted_count = 0
+            batch = self.db.batch()
+            pending = 0
             for doc in docs:
-                doc.reference.delete()
-                deleted_count += 1
+                batch.delete(doc.reference)
+                pending += 1
+                if pending == Config.FIRESTORE_BATCH_SIZE:
+                    batch.commit()
+                    deleted_count += pending
+                    batch = self.db.batch()
+                    pending = 0
+            if pending:
+                batch.commit()
+                deleted_count += pending
+            
+            # Remettre les compteurs à zéro
+            batch = self.db.batch()
+            for ref in self._counters.refs:
+                batch.delete(ref)
+            batch.commit()
             
+            self._dedupe = create_dedupe_index()
             self._invalidate_stats_cache()
             logger.warning(f"Cleared all Firestore data: {deleted_count} documents deleted")
             return True
@@ -0,0 +1,687 @@
+"""
+Moteur de stockage local en journal append-only (déploiements edge sans Firestore)
+- Chaque écriture ajoute une ligne JSON au segment actif (écriture séquentielle)
+- Index en mémoire responseId -> (segment, offset, longueur): already_sent en O(1)
+- Lectures des documents via mmap
+- Compaction en arrière-plan: fusion des segments scellés en un seul
+- Redémarrage: l'index est reconstruit en relisant les segments
+Un seul processus peut ouvrir le répertoire (verrou flock): un second worker
+uvicorn échoue à l'ouverture avec un message explicite (utiliser sqlite pour plusieurs workers)
+"""
+import os
+import json
+import mmap
+import bisect
+import threading
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Set, Iterator, NamedTuple, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from config.constants import ErrorMessages, SuccessMessages, Config, WriteStatus
+from utils.logger import setup_logger
+from utils.pagination import decode_cursor, sortable_timestamp
+
+logger = setup_logger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+COMPACT_SUFFIX = ".compact"
+
+
+class _Entry(NamedTuple):
+    """Position de la dernière version d'un document"""
+    segment: int
+    offset: int
+    length: int
+    created_at: str
+    sent_mail: bool
+    sent_sms: bool
+
+
+class LogStoreService:
+    def __init__(self, data_dir: str = Config.LOG_STORE_DIR,
+                 segment_max_bytes: int = Config.LOG_STORE_SEGMENT_MAX_BYTES,
+                 compact_min_segments: int = Config.LOG_STORE_COMPACT_MIN_SEGMENTS,
+                 fsync: bool = Config.LOG_STORE_FSYNC):
+        """
+        Ouvre le répertoire de stockage et reconstruit l'index
+
+        Args:
+            data_dir: Répertoire des segments
+            segment_max_bytes: Taille au-delà de laquelle le segment actif est scellé
+            compact_min_segments: Nombre de segments scellés déclenchant une compaction
+            fsync: Forcer l'écriture disque à chaque commit
+        """
+        self.data_dir = data_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_min_segments = max(1, compact_min_segments)
+        self.fsync = fsync
+
+        self._lock = threading.RLock()
+        self._index: Dict[str, _Entry] = {}
+        self._order: List[Tuple[str, str]] = []  # (created_at, responseId) trié
+        self._counts = {"total": 0, "sent_mail": 0, "sent_sms": 0}
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._compacting = False
+        self._compactions = 0
+        self._lock_fd: Optional[int] = None
+
+        try:
+            os.makedirs(data_dir, exist_ok=True)
+            self._acquire_dir_lock()
+            self._recover()
+            self._open_active()
+            logger.info(SuccessMessages.SERVICE_INITIALIZED.format(
+                service=f"Log store ({data_dir}, {len(self._index)} records)"
+            ))
+        except OSError as e:
+            logger.error(ErrorMessages.LOCAL_DB_INIT_FAILED.format(error=str(e)))
+            raise ValueError(ErrorMessages.LOCAL_DB_INIT_FAILED.format(error=str(e)))
+
+    # ------------------------------------------------------------------
+    # Segments et index
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, segment: int, suffix: str = SEGMENT_SUFFIX) -> str:
+        return os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{segment:06d}{suffix}")
+
+    def _list_segments(self) -> List[int]:
+        """Numéros des segments présents, triés"""
+        segments = []
+        for name in os.listdir(self.data_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(segments)
+
+    def _acquire_dir_lock(self):
+        """
+        Empêche deux processus d'ouvrir le même répertoire
+        Le PID du détenteur est écrit dans le fichier LOCK pour le message d'erreur
+
+        Raises:
+            RuntimeError: Répertoire déjà ouvert par un autre processus (autre worker)
+        """
+        if fcntl is None:
+            return
+        fd = os.open(os.path.join(self.data_dir, "LOCK"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            holder = os.read(fd, 32).decode(errors="replace").strip() or "unknown"
+            os.close(fd)
+            error = ErrorMessages.LOG_STORE_LOCKED.format(path=self.data_dir, pid=holder)
+            logger.error(error)
+            raise RuntimeError(error)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+
+    def _recover(self):
+        """Reconstruit l'index en relisant les segments dans l'ordre"""
+        # Compaction interrompue avant renommage: fichier temporaire abandonné
+        for name in os.listdir(self.data_dir):
+            if name.endswith(COMPACT_SUFFIX):
+                os.remove(os.path.join(self.data_dir, name))
+
+        # Compaction interrompue après renommage: supprimer les segments remplacés
+        for segment in self._list_segments():
+            with open(self._segment_path(segment), 'rb') as f:
+                try:
+                    header = json.loads(f.readline() or b"{}")
+                except ValueError:
+                    continue
+            if isinstance(header, dict) and "_compacted_from" in header:
+                for old in self._list_segments():
+                    if header["_compacted_from"] <= old < segment:
+                        os.remove(self._segment_path(old))
+
+        segments = self._list_segments()
+        for segment in segments:
+            path = self._segment_path(segment)
+            offset = 0
+            with open(path, 'rb') as f:
+                for raw in f:
+                    line = raw.rstrip(b"\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        if not raw.endswith(b"\n") and segment == segments[-1]:
+                            # Écriture partielle (crash): tronquer la fin du segment actif
+                            logger.warning(f"Truncating partial record at {path}:{offset}")
+                            with open(path, 'r+b') as tail:
+                                tail.truncate(offset)
+                            break
+                        logger.warning(f"Skipping corrupt record at {path}:{offset}")
+                        offset += len(raw)
+                        continue
+                    self._apply(record, segment, offset, len(line))
+                    offset += len(raw)
+
+    def _open_active(self):
+        """Ouvre (ou crée) le segment actif en ajout"""
+        segments = self._list_segments()
+        if segments and os.path.getsize(self._segment_path(segments[-1])) < self.segment_max_bytes:
+            self._active = segments[-1]
+        else:
+            self._active = (segments[-1] + 1) if segments else 1
+        path = self._segment_path(self._active)
+        self._active_file = open(path, 'ab')
+        self._active_size = self._active_file.tell()
+
+    def _apply(self, record: Dict, segment: int, offset: int, length: int):
+        """Met à jour l'index, l'ordre et les compteurs avec une version de document"""
+        response_id = record.get('responseId')
+        if not response_id:
+            return
+
+        old = self._index.pop(response_id, None)
+        if old is not None:
+            self._counts["total"] -= 1
+            self._counts["sent_mail"] -= old.sent_mail
+            self._counts["sent_sms"] -= old.sent_sms
+            position = bisect.bisect_left(self._order, (old.created_at, response_id))
+            if position < len(self._order) and self._order[position] == (old.created_at, response_id):
+                del self._order[position]
+
+        if record.get('_deleted'):
+            return
+
+        entry = _Entry(segment, offset, length, record['created_at'],
+                       bool(record.get('sent_mail')), bool(record.get('sent_sms')))
+        self._index[response_id] = entry
+        self._counts["total"] += 1
+        self._counts["sent_mail"] += entry.sent_mail
+        self._counts["sent_sms"] += entry.sent_sms
+        bisect.insort(self._order, (entry.created_at, response_id))
+
+    def _append(self, records: List[Dict]):
+        """
+        Ajoute des enregistrements au segment actif (un seul write + fsync)
+
+        Args:
+            records: Versions de documents ou tombstones à écrire
+        """
+        lines = [json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode() for record in records]
+        self._active_file.write(b"".join(line + b"\n" for line in lines))
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+
+        offset = self._active_size
+        for record, line in zip(records, lines):
+            self._apply(record, self._active, offset, len(line))
+            offset += len(line) + 1
+        self._active_size = offset
+
+        if self._active_size >= self.segment_max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Scelle le segment actif et en ouvre un nouveau"""
+        self._active_file.close()
+        self._active += 1
+        self._active_file = open(self._segment_path(self._active), 'ab')
+        self._active_size = 0
+
+        sealed = [segment for segment in self._list_segments() if segment < self._active]
+        if len(sealed) >= self.compact_min_segments and not self._compacting:
+            threading.Thread(target=self.compact, name="log-store-compaction", daemon=True).start()
+
+    def _read(self, entry: _Entry) -> Dict:
+        """Lit une version de document via mmap"""
+        mapped = self._maps.get(entry.segment)
+        if mapped is None or entry.offset + entry.length > len(mapped):
+            # Segment actif: la projection est refaite quand le fichier a grandi
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(entry.segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[entry.segment] = mapped
+        return json.loads(mapped[entry.offset:entry.offset + entry.length])
+
+    @staticmethod
+    def _to_document(record: Dict) -> Dict:
+        """Convertit un enregistrement stocké en document (mêmes champs que Firestore)"""
+        document = dict(record)
+        for field in ('created_at', 'completed_at'):
+            if document.get(field):
+                document[field] = datetime.fromisoformat(document[field])
+        return document
+
+    @staticmethod
+    def _new_record(response_id: str, email: str, phone: str, sent_mail: bool, sent_sms: bool,
+                    status: str, now: datetime) -> Dict:
+        return {
+            "responseId": response_id,
+            "email": email,
+            "phone": phone,
+            "sent_mail": bool(sent_mail),
+            "sent_sms": bool(sent_sms),
+            "status": status,
+            "timestamp": now.strftime("%Y-%m-%dT%H:%M:%S.%f") + "Z",
+            "created_at": sortable_timestamp(now)
+        }
+
+    # ------------------------------------------------------------------
+    # Interface DatabaseService
+    # ------------------------------------------------------------------
+
+    def already_sent(self, response_id: str) -> bool:
+        """
+        Vérifie si une réponse a déjà été traitée (index en mémoire)
+
+        Args:
+            response_id: Identifiant unique de la réponse
+
+        Returns:
+            True si déjà envoyé, False sinon
+        """
+        return response_id in self._index
+
+    def already_sent_many(self, response_ids: List[str]) -> Set[str]:
+        """
+        Vérifie quelles réponses ont déjà été traitées
+
+        Args:
+            response_ids: Identifiants des réponses à vérifier
+
+        Returns:
+            Ensemble des identifiants déjà présents
+        """
+        return {response_id for response_id in response_ids if response_id in self._index}
+
+    def _create(self, response_id: str, email: str, phone: str, sent_mail: bool, sent_sms: bool,
+                status: str, success_message: str) -> str:
+        """
+        Ajoute une réponse si elle n'existe pas
+
+        Returns:
+            WriteStatus.CREATED, WriteStatus.DUPLICATE ou WriteStatus.FAILED
+        """
+        try:
+            with self._lock:
+                if response_id in self._index:
+                    logger.info(f"Response already exists: {response_id}")
+                    return WriteStatus.DUPLICATE
+                self._append([self._new_record(response_id, email, phone, sent_mail, sent_sms,
+                                               status, datetime.now(timezone.utc))])
+            logger.info(success_message.format(response_id=response_id))
+            return WriteStatus.CREATED
+        except OSError as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return WriteStatus.FAILED
+
+    def create_response(self, response_id: str, email: str, phone: str,
+                        sent_mail: bool = True, sent_sms: bool = True) -> str:
+        """
+        Crée une réponse uniquement si elle n'existe pas
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            WriteStatus.CREATED, WriteStatus.DUPLICATE ou WriteStatus.FAILED
+        """
+        return self._create(response_id, email, phone, sent_mail, sent_sms,
+                            "completed", SuccessMessages.RESPONSE_RECORDED)
+
+    def add_response(self, response_id: str, email: str, phone: str,
+                     sent_mail: bool = True, sent_sms: bool = True, wait: bool = True) -> bool:
+        """
+        Ajoute une nouvelle réponse traitée
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+            wait: Ignoré (écriture toujours synchrone)
+
+        Returns:
+            True si ajouté avec succès, False si déjà existant
+        """
+        return self.create_response(response_id, email, phone, sent_mail, sent_sms) == WriteStatus.CREATED
+
+    def claim_response(self, response_id: str, email: str, phone: str) -> str:
+        """
+        Réserve une réponse avant l'envoi des messages (étape 1 du claim-then-finalize)
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+
+        Returns:
+            Statut WriteStatus de la réservation
+        """
+        return self._create(response_id, email, phone, False, False,
+                            "pending", SuccessMessages.RESPONSE_CLAIMED)
+
+    def finalize_response(self, response_id: str, sent_mail: bool, sent_sms: bool) -> bool:
+        """
+        Complète une réponse réservée avec le résultat des envois (nouvelle version du document)
+
+        Args:
+            response_id: Identifiant de la réponse réservée
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            True si mise à jour avec succès
+        """
+        try:
+            with self._lock:
+                entry = self._index.get(response_id)
+                if entry is None:
+                    logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=f"{response_id} not found"))
+                    return False
+                record = self._read(entry)
+                record.update({
+                    "sent_mail": bool(sent_mail),
+                    "sent_sms": bool(sent_sms),
+                    "status": "completed",
+                    "completed_at": sortable_timestamp(datetime.now(timezone.utc))
+                })
+                self._append([record])
+            logger.info(SuccessMessages.RESPONSE_FINALIZED.format(response_id=response_id))
+            return True
+        except OSError as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    def add_responses(self, records: List[Dict]) -> int:
+        """
+        Enregistre plusieurs réponses en un seul ajout (un seul fsync)
+        Les réponses déjà présentes sont ignorées (jamais écrasées)
+
+        Args:
+            records: Liste de dictionnaires avec response_id, email, phone, sent_mail, sent_sms
+
+        Returns:
+            Nombre de réponses enregistrées (créées ou déjà présentes)
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            with self._lock:
+                new_records = {}
+                for record in records:
+                    response_id = record['response_id']
+                    if response_id in self._index or response_id in new_records:
+                        continue
+                    new_records[response_id] = self._new_record(
+                        response_id, record['email'], record['phone'],
+                        record.get('sent_mail', True), record.get('sent_sms', True), "completed", now
+                    )
+                if new_records:
+                    self._append(list(new_records.values()))
+            logger.info(SuccessMessages.DATA_SAVED + f": {len(records)} responses (batch)")
+            return len(records)
+        except OSError as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return 0
+
+    def get_response(self, response_id: str) -> Optional[Dict]:
+        """
+        Récupère une réponse spécifique par son ID
+
+        Args:
+            response_id: Identifiant unique de la réponse
+
+        Returns:
+            Les données de la réponse ou None si non trouvée
+        """
+        with self._lock:
+            entry = self._index.get(response_id)
+            return self._to_document(self._read(entry)) if entry else None
+
+    def get_all_responses(self, limit: int = 100) -> List[Dict]:
+        """
+        Récupère les réponses enregistrées (plus récentes d'abord)
+
+        Args:
+            limit: Nombre maximum de résultats à retourner
+
+        Returns:
+            Liste des réponses
+        """
+        return list(self.iter_responses(limit=limit))
+
+    def iter_responses(self, limit: int = Config.RESPONSES_PAGE_SIZE, cursor: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       sent_mail: Optional[bool] = None, sent_sms: Optional[bool] = None) -> Iterator[Dict]:
+        """
+        Retourne une page de réponses (plus récentes d'abord), pagination par clé
+
+        Args:
+            limit: Taille de la page
+            cursor: Curseur opaque de la page précédente
+            start: Date minimale (incluse)
+            end: Date maximale (exclue)
+            sent_mail: Filtre sur l'envoi email
+            sent_sms: Filtre sur l'envoi SMS
+
+        Yields:
+            Données de chaque réponse
+
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        upper = None
+        if cursor:
+            created_at, response_id = decode_cursor(cursor)
+            upper = (sortable_timestamp(created_at), response_id)
+        start_key = sortable_timestamp(start) if start is not None else None
+        end_key = sortable_timestamp(end) if end is not None else None
+
+        page = []
+        with self._lock:
+            position = len(self._order) if upper is None else bisect.bisect_left(self._order, upper)
+            if end_key is not None:
+                position = min(position, bisect.bisect_left(self._order, (end_key, "")))
+            while position > 0 and len(page) < limit:
+                position -= 1
+                created_at, response_id = self._order[position]
+                if start_key is not None and created_at < start_key:
+                    break
+                entry = self._index[response_id]
+                if sent_mail is not None and entry.sent_mail != sent_mail:
+                    continue
+                if sent_sms is not None and entry.sent_sms != sent_sms:
+                    continue
+                page.append(self._read(entry))
+
+        for record in page:
+            yield self._to_document(record)
+
+    def get_stats(self) -> Dict:
+        """
+        Génère des statistiques sur les envois (compteurs tenus en mémoire)
+
+        Returns:
+            Dictionnaire avec les statistiques
+        """
+        with self._lock:
+            total, mails_sent, sms_sent = self._counts["total"], self._counts["sent_mail"], self._counts["sent_sms"]
+        return {
+            "total_responses": total,
+            "mails_sent": mails_sent,
+            "sms_sent": sms_sent,
+            "success_rate": 100 if total == 0 else round((mails_sent + sms_sent) / (total * 2) * 100, 2)
+        }
+
+    def get_storage_stats(self) -> Dict:
+        """
+        Retourne l'état du stockage (segments, taille, compactions)
+
+        Returns:
+            Dictionnaire de statistiques
+        """
+        with self._lock:
+            segments = self._list_segments()
+            return {
+                "records": len(self._index),
+                "segments": len(segments),
+                "active_segment": self._active,
+                "bytes": sum(os.path.getsize(self._segment_path(segment)) for segment in segments),
+                "compactions": self._compactions,
+                "compacting": self._compacting
+            }
+
+    def delete_response(self, response_id: str) -> bool:
+        """
+        Supprime une réponse (tombstone) - utile pour les tests
+
+        Args:
+            response_id: Identifiant de la réponse à supprimer
+
+        Returns:
+            True si supprimé avec succès
+        """
+        try:
+            with self._lock:
+                if response_id in self._index:
+                    self._append([{"responseId": response_id, "_deleted": True}])
+            logger.info(f"Response deleted: {response_id}")
+            return True
+        except OSError as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    def clear_all(self) -> bool:
+        """
+        Supprime toutes les réponses (ATTENTION: action irréversible!)
+        Utiliser uniquement pour les tests
+
+        Returns:
+            True si réussi
+        """
+        try:
+            with self._lock:
+                deleted_count = len(self._index)
+                self._active_file.close()
+                self._close_maps()
+                for segment in self._list_segments():
+                    os.remove(self._segment_path(segment))
+                self._index.clear()
+                self._order.clear()
+                self._counts = dict.fromkeys(self._counts, 0)
+                self._open_active()
+            logger.warning(f"Cleared all log store data: {deleted_count} records deleted")
+            return True
+        except OSError as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self) -> int:
+        """
+        Fusionne les segments scellés en un seul segment ne contenant que les
+        versions courantes des documents (tombstones et anciennes versions supprimées)
+
+        Le segment compacté remplace le plus récent des segments fusionnés et
+        commence par un en-tête {"_compacted_from": N}: si un crash survient
+        avant la suppression des anciens segments, le redémarrage la termine.
+
+        Returns:
+            Nombre de documents conservés
+        """
+        with self._lock:
+            if self._compacting:
+                return 0
+            sealed = [segment for segment in self._list_segments() if segment < self._active]
+            if not sealed:
+                return 0
+            self._compacting = True
+
+        target = sealed[-1]
+        tmp_path = self._segment_path(target, COMPACT_SUFFIX)
+        moves = []
+        try:
+            with open(tmp_path, 'wb') as out:
+                header = json.dumps({"_compacted_from": sealed[0]}).encode() + b"\n"
+                out.write(header)
+                position = len(header)
+                for segment in sealed:
+                    offset = 0
+                    with open(self._segment_path(segment), 'rb') as f:
+                        for raw in f:
+                            line = raw.rstrip(b"\n")
+                            with self._lock:
+                                entry = None
+                                try:
+                                    response_id = json.loads(line).get('responseId')
+                                    entry = self._index.get(response_id)
+                                except (ValueError, AttributeError):
+                                    pass
+                            if entry is not None and entry.segment == segment and entry.offset == offset:
+                                out.write(line + b"\n")
+                                moves.append((response_id, segment, offset, position))
+                                position += len(line) + 1
+                            offset += len(raw)
+                out.flush()
+                os.fsync(out.fileno())
+
+            with self._lock:
+                for segment in sealed:
+                    mapped = self._maps.pop(segment, None)
+                    if mapped is not None:
+                        mapped.close()
+                os.replace(tmp_path, self._segment_path(target))
+                self._fsync_dir()
+                for segment in sealed[:-1]:
+                    os.remove(self._segment_path(segment))
+
+                # Ne déplacer que les documents non modifiés pendant la compaction
+                for response_id, segment, offset, new_offset in moves:
+                    entry = self._index.get(response_id)
+                    if entry is not None and entry.segment == segment and entry.offset == offset:
+                        self._index[response_id] = entry._replace(segment=target, offset=new_offset)
+                self._compactions += 1
+
+            logger.info(f"Log store compacted {len(sealed)} segments into {target}: {len(moves)} live records")
+            return len(moves)
+        except OSError as e:
+            logger.error(f"Log store compaction failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return 0
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _fsync_dir(self):
+        """Rend durable le renommage d'un segment"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(self.data_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _close_maps(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+    def close(self):
+        """Ferme le segment actif et libère le verrou du répertoire (arrêt de l'application)"""
+        with self._lock:
+            self._active_file.close()
+            self._close_maps()
+            if self._lock_fd is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                os.close(self._lock_fd)
+                self._lock_fd = None
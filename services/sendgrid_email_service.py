@@ -4,15 +4,44 @@ Alternative à SMTP qui fonctionne sur tous les hébergeurs
 VERSION OPTIMISÉE avec logging et templates centralisés
 """
 import os
-from typing import Optional
+import re
+import html
+import json
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content, ReplyTo
+from sendgrid.helpers.mail import Mail, Email, To, Content, ReplyTo, Personalization, Substitution
 
-from config.constants import ErrorMessages, SuccessMessages, EmailTemplates
+from config.constants import Config, ErrorMessages, SuccessMessages
+from utils.batching import MicroBatcher
+from utils.circuit_breaker import CallRejected, is_rejection
+from utils.http_transport import http_transport
 from utils.logger import setup_logger
+from utils.templates import CONFIRMATION_TEMPLATE, confirmation_values, render_confirmation, templates
 
 logger = setup_logger(__name__)
 
+# Jetons remplacés par destinataire (substitutions) dans le template de confirmation
+# SendGrid applique une substitution aux deux parties: jetons distincts pour la
+# partie HTML (valeurs échappées) et la partie texte (valeurs brutes)
+CONFIRMATION_TOKENS = {
+    "display_name": "-display_name-",
+    "email": "-email-",
+    "timestamp": "-timestamp-"
+}
+CONFIRMATION_TEXT_TOKENS = {
+    "display_name": "-display_name_text-",
+    "email": "-email_text-",
+    "timestamp": "-timestamp_text-"
+}
+
+# Point d'entrée de l'API v3 (envoi async par le transport HTTP partagé)
+SENDGRID_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
+
+# Champ d'erreur SendGrid désignant une personalization (ex: "personalizations.3.to.0.email")
+_PERSONALIZATION_FIELD = re.compile(r'^personalizations\.(\d+)\.')
+
 
 class SendGridEmailService:
     """Service d'envoi d'e-mails via l'API SendGrid"""
@@ -21,20 +50,38 @@ class SendGridEmailService:
         """Initialise le service SendGrid avec les variables d'environnement"""
         self.api_key = os.getenv('SENDGRID_API_KEY')
         self.from_email = os.getenv('SENDGRID_FROM_EMAIL', os.getenv('SMTP_FROM_EMAIL', 'noreply@example.com'))
+        # Refus 4xx (destinataire, contenu) levés en CallRejected au lieu de False:
+        # activé par le service de bascule, qui ne doit pas basculer sur ces refus
+        self.raise_rejected = False
+        
+        self._batcher: Optional[MicroBatcher] = None
         
         if not self.api_key:
             logger.warning(ErrorMessages.SENDGRID_API_KEY_MISSING)
             self.client = None
         else:
             self.client = SendGridAPIClient(self.api_key)
+            # Confirmations en attente regroupées en une requête mail/send
+            if os.getenv('SENDGRID_BATCH_ENABLED', str(Config.SENDGRID_BATCH_ENABLED)).lower() == 'true':
+                self._batcher = MicroBatcher(
+                    self._send_confirmation_batch,
+                    max_batch=min(
+                        int(os.getenv('SENDGRID_MAX_PERSONALIZATIONS', Config.SENDGRID_MAX_PERSONALIZATIONS)),
+                        Config.SENDGRID_MAX_PERSONALIZATIONS
+                    ),
+                    max_delay_ms=int(os.getenv('SENDGRID_BATCH_DELAY_MS', Config.SENDGRID_BATCH_DELAY_MS)),
+                    name="sendgrid-batch"
+                )
             logger.info(SuccessMessages.SERVICE_INITIALIZED.format(service=f"SendGrid ({self.from_email})"))
+        self.enabled = self.client is not None
     
     def send_email(
         self, 
         to_email: str, 
         subject: str, 
         content: str, 
-        content_type: str = "html"
+        content_type: str = "html",
+        text_content: Optional[str] = None
     ) -> bool:
         """
         Envoie un e-mail via l'API SendGrid
@@ -44,6 +91,7 @@ class SendGridEmailService:
             subject: Sujet du mail
             content: Contenu du mail (HTML ou texte)
             content_type: Type de contenu ("html" ou "plain")
+            text_content: Alternative text/plain d'un contenu HTML (optionnel)
             
         Returns:
             True si envoyé avec succès, False sinon
@@ -53,38 +101,101 @@ class SendGridEmailService:
             return False
         
         try:
-            message = Mail(
-                from_email=Email(self.from_email, str(os.getenv('SENDGRID_EMAIL_NAME', 'No Reply'))),
-                to_emails=To(to_email),
-                subject=subject,
-                html_content=Content("text/html", content) if content_type == "html" else Content("text/plain", content)
-            )
-            
-            # Anti-spam: Reply-To valide
-            reply_to_email = os.getenv('SENDGRID_REPLY_TO_EMAIL', 'support@example.com')
-            reply_to_name = os.getenv('SENDGRID_EMAIL_NAME', 'Support')
-            message.reply_to = ReplyTo(reply_to_email, reply_to_name)
-            
-            response = self.client.send(message)
-            
-            if response.status_code in [200, 201, 202]:
-                logger.info(SuccessMessages.EMAIL_SENT.format(email=to_email, provider="SendGrid"))
-                return True
-            else:
-                logger.warning(ErrorMessages.SENDGRID_INVALID_RESPONSE.format(status_code=response.status_code))
+            response = self.client.send(self._build_message(to_email, subject, content, content_type, text_content))
+            status_code = response.status_code
+        except Exception as e:
+            # Le client lève HTTPError (status_code) pour les réponses 4xx/5xx
+            status_code = getattr(e, 'status_code', None)
+            if not is_rejection(status_code):
+                logger.error(ErrorMessages.SENDGRID_SEND_FAILED.format(error=str(e)))
                 return False
+        
+        if status_code in [200, 201, 202]:
+            logger.info(SuccessMessages.EMAIL_SENT.format(email=to_email, provider="SendGrid"))
+            return True
+        logger.warning(ErrorMessages.SENDGRID_INVALID_RESPONSE.format(status_code=status_code))
+        return self._outcome(self._rejection(status_code))
+    
+    async def send_email_async(
+        self, 
+        to_email: str, 
+        subject: str, 
+        content: str, 
+        content_type: str = "html",
+        text_content: Optional[str] = None
+    ) -> bool:
+        """
+        Envoie un e-mail via l'API SendGrid sans bloquer de thread
+        (connexions keep-alive du transport HTTP partagé)
+        
+        Args:
+            to_email: Adresse e-mail du destinataire
+            subject: Sujet du mail
+            content: Contenu du mail (HTML ou texte)
+            content_type: Type de contenu ("html" ou "plain")
+            text_content: Alternative text/plain d'un contenu HTML (optionnel)
+            
+        Returns:
+            True si envoyé avec succès, False sinon
+        """
+        if not self.client:
+            logger.error(ErrorMessages.EMAIL_SERVICE_FAILED)
+            return False
+        
+        try:
+            message = self._build_message(to_email, subject, content, content_type, text_content)
+            session = await http_transport.get_session()
+            async with session.post(
+                SENDGRID_SEND_URL,
+                json=message.get(),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            ) as response:
+                if response.status in [200, 201, 202]:
+                    logger.info(SuccessMessages.EMAIL_SENT.format(email=to_email, provider="SendGrid"))
+                    return True
+                logger.warning(ErrorMessages.SENDGRID_INVALID_RESPONSE.format(status_code=response.status))
+                logger.debug(await response.text())
+                status_code = response.status
                 
         except Exception as e:
             logger.error(ErrorMessages.SENDGRID_SEND_FAILED.format(error=str(e)))
             return False
+        return self._outcome(self._rejection(status_code))
     
-    def send_confirmation_email(self, to_email: str, name: Optional[str] = None) -> bool:
+    def _build_message(self, to_email: str, subject: str, content: str, content_type: str,
+                       text_content: Optional[str] = None) -> Mail:
+        """Construit le message SendGrid d'un destinataire (avec Reply-To)"""
+        if content_type == "html":
+            message = Mail(
+                from_email=Email(self.from_email, str(os.getenv('SENDGRID_EMAIL_NAME', 'No Reply'))),
+                to_emails=To(to_email),
+                subject=subject,
+                plain_text_content=Content("text/plain", text_content) if text_content else None,
+                html_content=Content("text/html", content)
+            )
+        else:
+            message = Mail(
+                from_email=Email(self.from_email, str(os.getenv('SENDGRID_EMAIL_NAME', 'No Reply'))),
+                to_emails=To(to_email),
+                subject=subject,
+                plain_text_content=Content("text/plain", content)
+            )
+        
+        # Anti-spam: Reply-To valide
+        reply_to_email = os.getenv('SENDGRID_REPLY_TO_EMAIL', 'support@example.com')
+        reply_to_name = os.getenv('SENDGRID_EMAIL_NAME', 'Support')
+        message.reply_to = ReplyTo(reply_to_email, reply_to_name)
+        return message
+    
+    def send_confirmation_email(self, to_email: str, name: Optional[str] = None,
+                                form_id: Optional[str] = None) -> bool:
         """
         Envoie un e-mail de confirmation de soumission du formulaire
         
         Args:
             to_email: Adresse e-mail du destinataire
             name: Nom du destinataire (optionnel)
+            form_id: Identifiant du formulaire (template spécifique optionnel)
             
         Returns:
             True si envoyé avec succès, False sinon
@@ -92,10 +203,214 @@ class SendGridEmailService:
         from utils.validators import extract_email_username, sanitize_name
         
         display_name = sanitize_name(name) if name else extract_email_username(to_email)
+        
+        if self._batcher is not None:
+            # Envoyé avec les autres confirmations en attente (une personalization chacune)
+            timestamp = datetime.now().strftime("%d/%m/%Y à %H:%M")
+            return self._outcome(self._batcher.submit((to_email, display_name, timestamp, form_id)).result())
+        
         subject = f"Confirmation - Formulaire recu de {display_name}"
-        html_content = EmailTemplates.get_confirmation_html(display_name, to_email)
+        html_content, text_content = render_confirmation(display_name, to_email, form_id)
         
-        return self.send_email(to_email, subject, html_content, "html")
+        return self.send_email(to_email, subject, html_content, "html", text_content)
+    
+    async def send_confirmation_email_async(self, to_email: str, name: Optional[str] = None,
+                                            form_id: Optional[str] = None) -> bool:
+        """
+        Envoie un e-mail de confirmation sans bloquer la boucle d'événements
+        En mode groupé, attend le résultat du lot; sinon requête HTTP async
+        
+        Args:
+            to_email: Adresse e-mail du destinataire
+            name: Nom du destinataire (optionnel)
+            form_id: Identifiant du formulaire (template spécifique optionnel)
+            
+        Returns:
+            True si envoyé avec succès, False sinon
+        """
+        from utils.validators import extract_email_username, sanitize_name
+        
+        display_name = sanitize_name(name) if name else extract_email_username(to_email)
+        
+        if self._batcher is not None:
+            timestamp = datetime.now().strftime("%d/%m/%Y à %H:%M")
+            return self._outcome(
+                await asyncio.wrap_future(self._batcher.submit((to_email, display_name, timestamp, form_id)))
+            )
+        
+        subject = f"Confirmation - Formulaire recu de {display_name}"
+        html_content, text_content = render_confirmation(display_name, to_email, form_id)
+        
+        return await self.send_email_async(to_email, subject, html_content, "html", text_content)
+    
+    def _build_confirmation_batch(self, recipients: List[Tuple[str, str, str, Optional[str]]]) -> Mail:
+        """
+        Construit une requête mail/send: le template commun et une personalization
+        (destinataire, sujet, substitutions) par confirmation
+        
+        Args:
+            recipients: Liste de (email, nom affiché, date, formulaire), même formulaire pour tout le lot
+            
+        Returns:
+            Message SendGrid prêt à envoyer
+        """
+        form_id = recipients[0][3]
+        html_values = confirmation_values(
+            CONFIRMATION_TOKENS["display_name"], CONFIRMATION_TOKENS["email"], CONFIRMATION_TOKENS["timestamp"]
+        )
+        text_values = confirmation_values(
+            CONFIRMATION_TEXT_TOKENS["display_name"], CONFIRMATION_TEXT_TOKENS["email"],
+            CONFIRMATION_TEXT_TOKENS["timestamp"]
+        )
+        message = Mail(
+            from_email=Email(self.from_email, str(os.getenv('SENDGRID_EMAIL_NAME', 'No Reply'))),
+            plain_text_content=Content(
+                "text/plain", templates.get_text(CONFIRMATION_TEMPLATE, form_id).render(text_values)
+            ),
+            html_content=Content("text/html", templates.get(CONFIRMATION_TEMPLATE, form_id).render(html_values))
+        )
+        for index, (to_email, display_name, timestamp, _) in enumerate(recipients):
+            personalization = Personalization()
+            personalization.add_to(To(to_email))
+            personalization.subject = f"Confirmation - Formulaire recu de {display_name}"
+            values = {"display_name": display_name, "email": to_email, "timestamp": timestamp}
+            for field, token in CONFIRMATION_TOKENS.items():
+                # Partie HTML: valeurs échappées comme dans le rendu non groupé
+                personalization.add_substitution(Substitution(token, html.escape(values[field])))
+            for field, token in CONFIRMATION_TEXT_TOKENS.items():
+                personalization.add_substitution(Substitution(token, values[field]))
+            # Index explicite: add_personalization insère en tête par défaut
+            message.add_personalization(personalization, index=index)
+        
+        # Anti-spam: Reply-To valide
+        reply_to_email = os.getenv('SENDGRID_REPLY_TO_EMAIL', 'support@example.com')
+        reply_to_name = os.getenv('SENDGRID_EMAIL_NAME', 'Support')
+        message.reply_to = ReplyTo(reply_to_email, reply_to_name)
+        return message
+    
+    def _send_confirmation_batch(self, recipients: List[Tuple[str, str, str, Optional[str]]]
+                                 ) -> List[Union[bool, CallRejected]]:
+        """
+        Envoie un lot de confirmations (handler du MicroBatcher)
+        Une requête par formulaire présent dans le lot (un template par requête)
+        
+        Args:
+            recipients: Liste de (email, nom affiché, date, formulaire)
+            
+        Returns:
+            Résultat d'envoi de chaque confirmation (CallRejected pour un refus 4xx),
+            dans l'ordre du lot
+        """
+        by_form: Dict[Optional[str], List[int]] = {}
+        for index, recipient in enumerate(recipients):
+            by_form.setdefault(recipient[3], []).append(index)
+        
+        results = [False] * len(recipients)
+        for indexes in by_form.values():
+            sent = self._send_confirmation_request([recipients[index] for index in indexes])
+            for index, result in zip(indexes, sent):
+                results[index] = result
+        return results
+    
+    def _send_confirmation_request(self, recipients: List[Tuple[str, str, str, Optional[str]]],
+                                   retry: bool = True) -> List[Union[bool, CallRejected]]:
+        """
+        Envoie des confirmations d'un même formulaire en une seule requête
+        Si SendGrid rejette la requête à cause de personalizations précises,
+        celles-ci sont marquées en échec et le reste du lot est renvoyé une fois
+        
+        Args:
+            recipients: Liste de (email, nom affiché, date, formulaire)
+            retry: Renvoyer les confirmations valides après un rejet partiel
+            
+        Returns:
+            Résultat d'envoi de chaque confirmation (CallRejected pour un refus 4xx),
+            dans l'ordre du lot
+        """
+        try:
+            response = self.client.send(self._build_confirmation_batch(recipients))
+            if response.status_code in [200, 201, 202]:
+                logger.info(f"Confirmation batch sent via SendGrid: {len(recipients)} recipients")
+                return [True] * len(recipients)
+            logger.warning(ErrorMessages.SENDGRID_INVALID_RESPONSE.format(status_code=response.status_code))
+            return [self._rejection(response.status_code)] * len(recipients)
+        
+        except Exception as e:
+            logger.error(ErrorMessages.SENDGRID_SEND_FAILED.format(error=str(e)))
+            status_code = getattr(e, 'status_code', None)
+            rejected = self._rejected_personalizations(e, len(recipients))
+            if not retry or not rejected or len(rejected) == len(recipients):
+                return [self._rejection(status_code)] * len(recipients)
+            
+            for index in sorted(rejected):
+                logger.warning(f"SendGrid rejected confirmation to {recipients[index][0]}")
+            accepted = [index for index in range(len(recipients)) if index not in rejected]
+            resent = self._send_confirmation_request([recipients[index] for index in accepted], retry=False)
+            results: List[Union[bool, CallRejected]] = [self._rejection(status_code)] * len(recipients)
+            for index, result in zip(accepted, resent):
+                results[index] = result
+            return results
+    
+    @staticmethod
+    def _rejection(status_code: Optional[int]) -> Union[bool, CallRejected]:
+        """Issue d'une réponse en échec: CallRejected pour un refus 4xx, sinon False"""
+        if is_rejection(status_code):
+            return CallRejected(f"SendGrid rejected the request (HTTP {status_code})")
+        return False
+    
+    def _outcome(self, result: Union[bool, CallRejected]) -> bool:
+        """Résultat d'envoi retourné à l'appelant (refus levé si raise_rejected)"""
+        if isinstance(result, CallRejected):
+            if self.raise_rejected:
+                # Instance propre à l'appelant (le lot partage la même issue)
+                raise CallRejected(str(result))
+            return False
+        return result
+    
+    @staticmethod
+    def _rejected_personalizations(error: Exception, count: int) -> Set[int]:
+        """
+        Extrait les index des personalizations mises en cause par une erreur 400
+        
+        Args:
+            error: Exception levée par le client SendGrid (HTTPError)
+            count: Nombre de personalizations de la requête
+            
+        Returns:
+            Index des personalizations rejetées (vide si l'erreur concerne tout le lot)
+        """
+        if getattr(error, 'status_code', None) != 400:
+            return set()
+        try:
+            body = error.body.decode('utf-8') if isinstance(error.body, bytes) else error.body
+            errors = json.loads(body).get('errors', [])
+        except (AttributeError, TypeError, ValueError):
+            return set()
+        
+        rejected = set()
+        for item in errors:
+            match = _PERSONALIZATION_FIELD.match(item.get('field') or '')
+            if match is None:
+                # Erreur globale (clé API, expéditeur...): tout le lot échoue
+                return set()
+            if int(match.group(1)) < count:
+                rejected.add(int(match.group(1)))
+        return rejected
+    
+    def get_batch_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Retourne les statistiques de regroupement des confirmations
+        
+        Returns:
+            Dictionnaire de statistiques ou None si désactivé
+        """
+        return self._batcher.get_stats() if self._batcher is not None else None
+    
+    def close(self):
+        """Envoie les confirmations en attente (arrêt de l'application)"""
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
     
     def test_connection(self) -> bool:
         """
@@ -3,17 +3,67 @@ Service d'envoi de SMS via Twilio
 Gère l'envoi automatique de messages SMS
 VERSION OPTIMISÉE avec logging et messages centralisés
 """
+import math
 import os
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+from twilio.base.exceptions import TwilioRestException
+from twilio.http import AsyncHttpClient
+from twilio.http.response import Response
 from twilio.rest import Client
-from typing import Optional
 
 from config.constants import ErrorMessages, SuccessMessages, SMSTemplates, Config
+from utils.http_transport import http_transport
 from utils.logger import setup_logger
+from utils.sms_dispatcher import SMSDispatcher, parse_senders
+from utils.sms_encoding import analyze, prepare_sms
 from utils.validators import normalize_phone
 
 logger = setup_logger(__name__)
 
 
+class SharedTwilioHttpClient(AsyncHttpClient):
+    """Client HTTP async du SDK Twilio adossé au transport partagé (pool keep-alive commun)"""
+    
+    def __init__(self):
+        super().__init__(logger, is_async=True)
+    
+    async def request(
+        self,
+        method: str,
+        uri: str,
+        params: Optional[Dict[str, object]] = None,
+        data: Optional[Dict[str, object]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        auth: Optional[Tuple[str, str]] = None,
+        timeout: Optional[float] = None,
+        allow_redirects: bool = False,
+    ) -> Response:
+        """
+        Exécute une requête de l'API Twilio sur la session partagée
+        
+        Returns:
+            Réponse au format du SDK Twilio
+        """
+        session = await http_transport.get_session()
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        async with session.request(
+            method.upper(),
+            uri,
+            params=params,
+            data=data,
+            headers=headers,
+            auth=aiohttp.BasicAuth(*auth) if auth else None,
+            allow_redirects=allow_redirects,
+            **kwargs
+        ) as response:
+            return Response(response.status, await response.text(), response.headers)
+
+
 class SMSService:
     def __init__(self, account_sid: Optional[str] = None, 
                  auth_token: Optional[str] = None,
@@ -25,51 +75,154 @@ class SMSService:
             account_sid: SID du compte Twilio (ou depuis variable d'environnement)
             auth_token: Token d'authentification Twilio
             phone_number: Numéro de téléphone Twilio expéditeur
+                          (sinon TWILIO_PHONE_NUMBERS, liste séparée par des virgules,
+                          ou TWILIO_PHONE_NUMBER)
         """
         self.account_sid = account_sid or os.getenv('TWILIO_ACCOUNT_SID')
         self.auth_token = auth_token or os.getenv('TWILIO_AUTH_TOKEN')
-        self.phone_number = phone_number or os.getenv('TWILIO_PHONE_NUMBER')
+        self.phone_numbers = [phone_number] if phone_number else parse_senders(
+            os.getenv('TWILIO_PHONE_NUMBERS'), os.getenv('TWILIO_PHONE_NUMBER')
+        )
+        self.phone_number = self.phone_numbers[0] if self.phone_numbers else None
         
         if not all([self.account_sid, self.auth_token, self.phone_number]):
             logger.error(ErrorMessages.TWILIO_CREDENTIALS_MISSING)
             raise ValueError(ErrorMessages.TWILIO_CREDENTIALS_MISSING)
         
+        # Débit limité par numéro: envois répartis et lissés sur le pool
+        self.dispatcher = SMSDispatcher(
+            self.phone_numbers,
+            rate=float(os.getenv('SMS_SENDER_RATE', Config.SMS_SENDER_RATE)),
+            burst=int(os.getenv('SMS_SENDER_BURST', Config.SMS_SENDER_BURST)),
+            max_wait=float(os.getenv('SMS_MAX_QUEUE_WAIT', Config.SMS_MAX_QUEUE_WAIT)),
+            throttle_pause=float(os.getenv('SMS_THROTTLE_PAUSE', Config.SMS_THROTTLE_PAUSE)),
+            drop_on_saturation=os.getenv(
+                'SMS_DROP_ON_SATURATION', str(Config.SMS_DROP_ON_SATURATION)
+            ).lower() == 'true'
+        )
+        
+        self.max_segments = int(os.getenv('SMS_MAX_SEGMENTS', Config.SMS_MAX_SEGMENTS))
+        self.gsm_transliterate = os.getenv('SMS_GSM_TRANSLITERATE', str(Config.SMS_GSM_TRANSLITERATE)).lower() == 'true'
+        
         self.client = Client(self.account_sid, self.auth_token)
-        logger.info(SuccessMessages.SERVICE_INITIALIZED.format(service=f"Twilio ({self.phone_number})"))
+        # Client async pour les envois depuis la boucle d'événements
+        self.async_client = Client(self.account_sid, self.auth_token, http_client=SharedTwilioHttpClient())
+        logger.info(SuccessMessages.SERVICE_INITIALIZED.format(
+            service=f"Twilio ({', '.join(self.phone_numbers)})"
+        ))
     
     def send_sms(self, to_phone: str, content: str) -> bool:
         """
         Envoie un SMS via Twilio
+        Si le débit des numéros est saturé au-delà de SMS_MAX_QUEUE_WAIT,
+        le SMS part en arrière-plan (file différée du dispatcher)
         
         Args:
             to_phone: Numéro de téléphone du destinataire (format international: +237...)
-            content: Contenu du SMS (max 160 caractères recommandés)
+            content: Contenu du SMS (tronqué à SMS_MAX_SEGMENTS segments)
             
         Returns:
-            True si envoyé avec succès, False sinon
+            True si envoyé (ou mis en file) avec succès, False sinon
         """
         try:
             # Normaliser le numéro
             to_phone = normalize_phone(to_phone)
+            body = prepare_sms(content, self.max_segments, self.gsm_transliterate)
+            segments = analyze(body).segments
             
-            message = self.client.messages.create(
-                body=content,
-                from_=self.phone_number,
-                to=to_phone
-            )
+            sent = self._deliver(to_phone, body, segments)
+            if sent is None:
+                return self.dispatcher.defer(partial(self._send_deferred, to_phone, body, segments))
+            return sent
             
-            # Vérifier que le message a été envoyé ou est en cours d'envoi
-            if message.sid and message.status in ['queued', 'sent', 'delivered']:
-                logger.info(SuccessMessages.SMS_SENT.format(phone=to_phone))
-                return True
-            else:
-                logger.warning(f"SMS status unexpected: {message.status}")
-                return False
+        except Exception as e:
+            logger.error(ErrorMessages.TWILIO_SEND_FAILED.format(error=str(e)))
+            return False
+    
+    async def send_sms_async(self, to_phone: str, content: str) -> bool:
+        """
+        Envoie un SMS via Twilio sans bloquer de thread
+        (connexions keep-alive du transport HTTP partagé)
+        
+        Args:
+            to_phone: Numéro de téléphone du destinataire (format international: +237...)
+            content: Contenu du SMS (tronqué à SMS_MAX_SEGMENTS segments)
+            
+        Returns:
+            True si envoyé (ou mis en file) avec succès, False sinon
+        """
+        try:
+            to_phone = normalize_phone(to_phone)
+            body = prepare_sms(content, self.max_segments, self.gsm_transliterate)
+            segments = analyze(body).segments
+            
+            for attempt in range(2):
+                sender = await self.dispatcher.acquire_async(segments)
+                if sender is None:
+                    # File saturée: envoi en arrière-plan au débit autorisé
+                    return self.dispatcher.defer(partial(self._send_deferred, to_phone, body, segments))
+                try:
+                    message = await self.async_client.messages.create_async(body=body, from_=sender, to=to_phone)
+                except TwilioRestException as e:
+                    if e.status == 429 and attempt == 0:
+                        self.dispatcher.throttled(sender)
+                        continue
+                    raise
+                return self._check_message(message, to_phone)
+            return False
             
         except Exception as e:
             logger.error(ErrorMessages.TWILIO_SEND_FAILED.format(error=str(e)))
             return False
     
+    def _deliver(self, to_phone: str, body: str, segments: int,
+                 max_wait: Optional[float] = None) -> Optional[bool]:
+        """
+        Attend le créneau d'un numéro expéditeur puis envoie le SMS préparé
+        (un nouvel essai sur le pool après un 429)
+        
+        Args:
+            to_phone: Numéro normalisé du destinataire
+            body: Texte préparé (prepare_sms)
+            segments: Segments facturés du texte
+            max_wait: Attente acceptée (secondes, défaut: SMS_MAX_QUEUE_WAIT)
+            
+        Returns:
+            True/False selon l'envoi, None si la file est saturée
+        """
+        for attempt in range(2):
+            # Créneau libre d'un numéro expéditeur (attente si le débit est atteint)
+            sender = self.dispatcher.acquire(segments, max_wait)
+            if sender is None:
+                return None
+            try:
+                message = self.client.messages.create(body=body, from_=sender, to=to_phone)
+            except TwilioRestException as e:
+                if e.status == 429 and attempt == 0:
+                    # Numéro limité par Twilio: pause et nouvel essai sur le pool
+                    self.dispatcher.throttled(sender)
+                    continue
+                raise
+            return self._check_message(message, to_phone)
+        return False
+    
+    def _send_deferred(self, to_phone: str, body: str, segments: int) -> bool:
+        """Envoi d'un SMS de la file différée (attente du créneau sans limite)"""
+        try:
+            return bool(self._deliver(to_phone, body, segments, math.inf))
+        except Exception as e:
+            logger.error(ErrorMessages.TWILIO_SEND_FAILED.format(error=str(e)))
+            return False
+    
+    @staticmethod
+    def _check_message(message, to_phone: str) -> bool:
+        """Vérifie que le message a été envoyé ou est en cours d'envoi"""
+        if message.sid and message.status in ['queued', 'sent', 'delivered']:
+            logger.info(SuccessMessages.SMS_SENT.format(phone=to_phone))
+            return True
+        logger.warning(f"SMS status unexpected: {message.status}")
+        return False
+    
     def send_confirmation_sms(self, to_phone: str, user_name: Optional[str] = None) -> bool:
         """
         Envoie un SMS de confirmation automatique
@@ -81,18 +234,44 @@ class SMSService:
         Returns:
             True si envoyé avec succès, False sinon
         """
+        return self.send_sms(to_phone, self._confirmation_content(user_name))
+    
+    async def send_confirmation_sms_async(self, to_phone: str, user_name: Optional[str] = None) -> bool:
+        """
+        Envoie un SMS de confirmation sans bloquer la boucle d'événements
+        
+        Args:
+            to_phone: Numéro de téléphone du destinataire
+            user_name: Nom du destinataire (optionnel)
+            
+        Returns:
+            True si envoyé avec succès, False sinon
+        """
+        return await self.send_sms_async(to_phone, self._confirmation_content(user_name))
+    
+    @staticmethod
+    def _confirmation_content(user_name: Optional[str]) -> str:
+        """Génère le texte du SMS de confirmation"""
         from utils.validators import sanitize_name
         
         # Nettoyer le nom si fourni
         clean_name = sanitize_name(user_name) if user_name else None
         
-        # Générer le message
-        content = SMSTemplates.get_confirmation_message(clean_name)
-        
-        # Tronquer si nécessaire
-        content = SMSTemplates.truncate_message(content, Config.SMS_MAX_LENGTH)
+        # Générer le message (tronqué par segments à l'envoi)
+        return SMSTemplates.get_confirmation_message(clean_name)
+    
+    def get_dispatch_stats(self) -> Dict:
+        """
+        Retourne le débit et l'attente par numéro expéditeur
         
-        return self.send_sms(to_phone, content)
+        Returns:
+            Dictionnaire de statistiques du pool d'expéditeurs
+        """
+        return self.dispatcher.get_stats()
+    
+    def close(self):
+        """Attend l'envoi des SMS différés (arrêt de l'application)"""
+        self.dispatcher.close(float(os.getenv('SMS_DEFERRED_DRAIN_TIMEOUT', Config.SMS_DEFERRED_DRAIN_TIMEOUT)))
     
     def test_connection(self) -> bool:
         """
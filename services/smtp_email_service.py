@@ -5,12 +5,19 @@ VERSION OPTIMISÉE avec logging et templates centralisés
 """
 import os
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
 
-from config.constants import ErrorMessages, SuccessMessages, EmailTemplates
+from config.constants import Config, ErrorMessages, SuccessMessages
+from utils.batching import MicroBatcher
+from utils.circuit_breaker import CallRejected
 from utils.logger import setup_logger
+from utils.mime_builder import MimeBuilder, RawMessage
+from utils.smtp_pool import SMTPConnectionPool, deliver, deliver_raw
+from utils.templates import CONFIRMATION_TEMPLATE, confirmation_values, render_confirmation, templates
 
 logger = setup_logger(__name__)
 
@@ -26,22 +33,78 @@ class SMTPEmailService:
         self.smtp_password = os.getenv('SMTP_PASSWORD')
         self.from_email = os.getenv('SMTP_FROM_EMAIL', self.smtp_user)
         self.from_name = os.getenv('SMTP_FROM_NAME', 'Auto-Responder')
+        # Refus définitifs (5xx) d'un destinataire ou d'un message levés en
+        # CallRejected au lieu de False (activé par le service de bascule)
+        self.raise_rejected = False
+        
+        self._pool: Optional[SMTPConnectionPool] = None
+        self._drainer: Optional[MicroBatcher] = None
+        self._drain_executor: Optional[ThreadPoolExecutor] = None
+        self._mime_builder: Optional[MimeBuilder] = None
         
         if not self.smtp_user or not self.smtp_password:
             logger.warning("SMTP credentials missing, email service disabled")
             self.enabled = False
         else:
             self.enabled = True
+            # Sessions authentifiées réutilisées (pas de TLS + login par e-mail)
+            self._pool = SMTPConnectionPool(
+                self._connect,
+                size=int(os.getenv('SMTP_POOL_SIZE', Config.SMTP_POOL_SIZE)),
+                idle_timeout=float(os.getenv('SMTP_POOL_IDLE_TIMEOUT', Config.SMTP_POOL_IDLE_TIMEOUT)),
+                keepalive_interval=float(os.getenv('SMTP_KEEPALIVE_INTERVAL', Config.SMTP_KEEPALIVE_INTERVAL)),
+                max_messages=int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', Config.SMTP_MAX_MESSAGES_PER_CONNECTION))
+            )
+            # Rafales: messages en attente envoyés par groupes, un groupe par session
+            if os.getenv('SMTP_DRAIN_ENABLED', str(Config.SMTP_DRAIN_ENABLED)).lower() == 'true':
+                self._drainer = MicroBatcher(
+                    self._send_group,
+                    max_batch=int(os.getenv('SMTP_DRAIN_MAX_BATCH', Config.SMTP_DRAIN_MAX_BATCH)),
+                    max_delay_ms=int(os.getenv('SMTP_DRAIN_DELAY_MS', Config.SMTP_DRAIN_DELAY_MS)),
+                    name="smtp-drain"
+                )
+                self._drain_executor = ThreadPoolExecutor(
+                    max_workers=self._pool.size, thread_name_prefix="smtp-session"
+                )
+            # Confirmations assemblées à partir de parties pré-encodées (sans arbre MIME)
+            if os.getenv('SMTP_PREENCODED_MIME', str(Config.SMTP_PREENCODED_MIME)).lower() == 'true':
+                self._mime_builder = MimeBuilder(self.from_email, self.from_name)
             logger.info(SuccessMessages.SERVICE_INITIALIZED.format(
                 service=f"SMTP ({self.smtp_server}:{self.smtp_port}, From: {self.from_email})"
             ))
     
+    def _connect(self, timeout: float = 30) -> smtplib.SMTP:
+        """
+        Ouvre une session SMTP authentifiée selon le port
+        
+        Args:
+            timeout: Délai de connexion et de réponse (secondes)
+            
+        Returns:
+            Session SMTP prête à envoyer
+        """
+        if self.smtp_port == 465:
+            # SSL (port 465)
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=timeout)
+        else:
+            # TLS (port 587 ou autre)
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=timeout)
+        try:
+            if self.smtp_port != 465:
+                server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
     def send_email(
         self, 
         to_email: str, 
         subject: str, 
         content: str, 
-        content_type: str = "html"
+        content_type: str = "html",
+        text_content: Optional[str] = None
     ) -> bool:
         """
         Envoie un e-mail via SMTP
@@ -51,6 +114,7 @@ class SMTPEmailService:
             subject: Sujet du mail
             content: Contenu du mail (HTML ou texte)
             content_type: Type de contenu ("html" ou "plain")
+            text_content: Alternative text/plain d'un contenu HTML (optionnel)
             
         Returns:
             True si envoyé avec succès, False sinon
@@ -66,24 +130,40 @@ class SMTPEmailService:
             message['To'] = to_email
             message['Subject'] = subject
             
-            # Ajouter le contenu
+            # Ajouter le contenu (alternative texte d'abord: le client affiche la dernière partie supportée)
             if content_type == "html":
+                if text_content:
+                    message.attach(MIMEText(text_content, 'plain', 'utf-8'))
                 message.attach(MIMEText(content, 'html', 'utf-8'))
             else:
                 message.attach(MIMEText(content, 'plain', 'utf-8'))
             
-            # Connexion et envoi selon le port
-            if self.smtp_port == 465:
-                # SSL (port 465)
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=30) as server:
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.send_message(message)
+            return self._send(message, to_email)
+            
+        except CallRejected:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send email via SMTP: {str(e)}")
+            return False
+    
+    def _send(self, message: Union[Message, RawMessage], to_email: str) -> bool:
+        """
+        Envoie un message construit (MIME ou pré-encodé) sur le pool
+        
+        Args:
+            message: Message à envoyer
+            to_email: Adresse du destinataire (logs)
+            
+        Returns:
+            True si envoyé avec succès, False sinon
+        """
+        try:
+            if self._drainer is not None:
+                # Envoi groupé avec les autres messages en attente
+                self._drainer.submit(message).result()
             else:
-                # TLS (port 587 ou autre)
-                with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30) as server:
-                    server.starttls()
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.send_message(message)
+                # Envoi sur une session du pool (reconnexion si le serveur l'a fermée)
+                self._pool.run(lambda server: self._deliver(server, message))
             
             logger.info(SuccessMessages.EMAIL_SENT.format(email=to_email, provider="SMTP"))
             return True
@@ -92,6 +172,16 @@ class SMTPEmailService:
             logger.error(f"SMTP authentication failed: {str(e)}")
             return False
             
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+            if not self._is_permanent_refusal(e):
+                logger.error(f"SMTP error: {str(e)}")
+                return False
+            # Destinataire ou message refusé définitivement: le serveur fonctionne
+            logger.warning(f"SMTP server rejected email to {to_email}: {str(e)}")
+            if self.raise_rejected:
+                raise CallRejected(f"SMTP server rejected email: {str(e)}") from e
+            return False
+            
         except smtplib.SMTPException as e:
             logger.error(f"SMTP error: {str(e)}")
             return False
@@ -100,13 +190,99 @@ class SMTPEmailService:
             logger.error(f"Failed to send email via SMTP: {str(e)}")
             return False
     
-    def send_confirmation_email(self, to_email: str, name: Optional[str] = None) -> bool:
+    @staticmethod
+    def _is_permanent_refusal(error: smtplib.SMTPException) -> bool:
+        """Refus 5xx de tous les destinataires, ou du contenu du message"""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return bool(error.recipients) and all(code >= 500 for code, _ in error.recipients.values())
+        return getattr(error, 'smtp_code', 0) >= 500
+    
+    def _deliver(self, server: smtplib.SMTP, message: Union[Message, RawMessage]):
+        """Envoie un message (PIPELINING si annoncé) et le comptabilise sur la session"""
+        try:
+            if isinstance(message, RawMessage):
+                deliver_raw(server, *message)
+            else:
+                deliver(server, message)
+        finally:
+            self._pool.count_message(server)
+    
+    def _send_group(self, messages: List[Union[Message, RawMessage]]) -> List[Union[bool, Exception]]:
+        """
+        Envoie un lot de messages en attente (handler du MicroBatcher)
+        Le lot est réparti sur les sessions du pool; chaque part est envoyée
+        à la suite sur une même session
+        
+        Args:
+            messages: Messages à envoyer
+            
+        Returns:
+            True ou l'exception SMTP, pour chaque message
+        """
+        per_session = -(-len(messages) // self._pool.size)
+        groups = [messages[i:i + per_session] for i in range(0, len(messages), per_session)]
+        results: List[Union[bool, Exception]] = []
+        for group_results in self._drain_executor.map(self._drain_session, groups):
+            results.extend(group_results)
+        return results
+    
+    def _drain_session(self, messages: List[Union[Message, RawMessage]]) -> List[Union[bool, Exception]]:
+        """
+        Envoie des messages à la suite sur une session, en changeant de session
+        à la limite de messages par connexion ou si le serveur coupe la connexion
+        (le message interrompu est rejoué une fois sur une nouvelle session)
+        
+        Args:
+            messages: Messages à envoyer
+            
+        Returns:
+            True ou l'exception SMTP, pour chaque message
+        """
+        results: List[Union[bool, Exception]] = []
+        reconnect = False
+        while len(results) < len(messages):
+            try:
+                with self._pool.session(fresh=reconnect) as server:
+                    while len(results) < len(messages) and self._pool.remaining(server) > 0:
+                        try:
+                            self._deliver(server, messages[len(results)])
+                            results.append(True)
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                                smtplib.SMTPDataError) as e:
+                            # Message refusé: la session (RSET) reste utilisable
+                            results.append(e)
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except Exception as e:
+                            if isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException):
+                                # Connexion rompue: traitée au niveau de la session
+                                raise
+                            # Erreur propre au message (adresse non ASCII, extension non
+                            # supportée...): échec de ce seul message, transaction annulée
+                            results.append(e)
+                            server.rset()
+                        reconnect = False
+            except smtplib.SMTPServerDisconnected as e:
+                if reconnect:
+                    results.append(e)
+                    reconnect = False
+                else:
+                    logger.warning(f"SMTP session disconnected ({e}), reconnecting")
+                    reconnect = True
+            except Exception as e:
+                # Connexion impossible ou rompue: échec des messages restants du groupe
+                results.extend([e] * (len(messages) - len(results)))
+        return results
+    
+    def send_confirmation_email(self, to_email: str, name: Optional[str] = None,
+                                form_id: Optional[str] = None) -> bool:
         """
         Envoie un e-mail de confirmation de soumission du formulaire
         
         Args:
             to_email: Adresse e-mail du destinataire
             name: Nom du destinataire (optionnel)
+            form_id: Identifiant du formulaire (template spécifique optionnel)
             
         Returns:
             True si envoyé avec succès, False sinon
@@ -115,9 +291,23 @@ class SMTPEmailService:
         
         display_name = sanitize_name(name) if name else extract_email_username(to_email)
         subject = f"Confirmation - Formulaire recu de {display_name}"
-        html_content = EmailTemplates.get_confirmation_html(display_name, to_email)
         
-        return self.send_email(to_email, subject, html_content, "html")
+        if self.enabled and self._mime_builder is not None and to_email.isascii():
+            # Parties statiques déjà encodées: seuls les en-têtes et les valeurs sont encodés
+            try:
+                message = self._mime_builder.build(
+                    to_email, subject,
+                    templates.get(CONFIRMATION_TEMPLATE, form_id),
+                    templates.get_text(CONFIRMATION_TEMPLATE, form_id),
+                    confirmation_values(display_name, to_email)
+                )
+            except Exception as e:
+                logger.error(f"Failed to build email for {to_email}: {str(e)}")
+                return False
+            return self._send(message, to_email)
+        
+        html_content, text_content = render_confirmation(display_name, to_email, form_id)
+        return self.send_email(to_email, subject, html_content, "html", text_content)
     
     def test_connection(self) -> bool:
         """
@@ -130,13 +320,8 @@ class SMTPEmailService:
             return False
         
         try:
-            if self.smtp_port == 465:
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=10) as server:
-                    server.login(self.smtp_user, self.smtp_password)
-            else:
-                with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10) as server:
-                    server.starttls()
-                    server.login(self.smtp_user, self.smtp_password)
+            # Nouvelle session (hors pool): vérifie aussi l'authentification
+            self._connect(timeout=10).quit()
             
             logger.info(f"SMTP connection test successful: {self.smtp_server}:{self.smtp_port}")
             return True
@@ -144,3 +329,28 @@ class SMTPEmailService:
         except Exception as e:
             logger.error(f"SMTP connection test failed: {str(e)}")
             return False
+    
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Retourne les statistiques du pool de sessions SMTP
+        
+        Returns:
+            Dictionnaire de statistiques ou None si le service est désactivé
+        """
+        if self._pool is None:
+            return None
+        stats = self._pool.get_stats()
+        if self._drainer is not None:
+            stats["drain"] = self._drainer.get_stats()
+        if self._mime_builder is not None:
+            stats["mime"] = self._mime_builder.get_stats()
+        return stats
+    
+    def close(self):
+        """Envoie les messages en attente puis ferme les sessions SMTP du pool (arrêt de l'application)"""
+        if self._drainer is not None:
+            self._drainer.close()
+            self._drain_executor.shutdown(wait=True)
+            self._drainer = None
+        if self._pool is not None:
+            self._pool.close()
@@ -0,0 +1,482 @@
+"""
+Service de base de données locale SQLite (mode WAL)
+Remplace le stockage JSON de DatabaseService pour les déploiements
+auto-hébergés ou hors ligne:
+- index unique sur responseId (create-if-absent atomique)
+- statistiques par agrégats indexés
+- une connexion par thread, lecteurs concurrents grâce au WAL
+"""
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Set, Iterator
+
+from config.constants import ErrorMessages, SuccessMessages, Config, WriteStatus
+from utils.logger import setup_logger
+from utils.pagination import decode_cursor, sortable_timestamp
+
+logger = setup_logger(__name__)
+
+# Limite de paramètres par requête IN (...)
+MAX_QUERY_PARAMS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    responseId   TEXT    NOT NULL,
+    email        TEXT,
+    phone        TEXT,
+    sent_mail    INTEGER NOT NULL DEFAULT 0,
+    sent_sms     INTEGER NOT NULL DEFAULT 0,
+    status       TEXT    NOT NULL DEFAULT 'completed',
+    timestamp    TEXT    NOT NULL,
+    created_at   TEXT    NOT NULL,
+    completed_at TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_responses_response_id ON responses (responseId);
+CREATE INDEX IF NOT EXISTS idx_responses_created_at ON responses (created_at, responseId);
+CREATE INDEX IF NOT EXISTS idx_responses_sent_mail ON responses (sent_mail, created_at);
+CREATE INDEX IF NOT EXISTS idx_responses_sent_sms ON responses (sent_sms, created_at);
+"""
+
+INSERT_SQL = (
+    "INSERT INTO responses (responseId, email, phone, sent_mail, sent_sms, status, timestamp, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _now() -> str:
+    return sortable_timestamp(datetime.now(timezone.utc))
+
+
+class SQLiteService:
+    def __init__(self, db_path: str = Config.SQLITE_PATH, legacy_json_path: str = "data/responses.json"):
+        """
+        Ouvre (ou crée) la base SQLite
+
+        Args:
+            db_path: Chemin du fichier SQLite
+            legacy_json_path: Ancienne base JSON importée si la base SQLite est vide
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if legacy_json_path and os.path.exists(legacy_json_path):
+                self._import_legacy_json(legacy_json_path)
+            logger.info(SuccessMessages.SERVICE_INITIALIZED.format(service=f"SQLite ({db_path})"))
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_INIT_FAILED.format(error=str(e)))
+            raise ValueError(ErrorMessages.LOCAL_DB_INIT_FAILED.format(error=str(e)))
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ouvre une nouvelle connexion configurée"""
+        conn = sqlite3.connect(self.db_path, timeout=Config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée au premier appel)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _import_legacy_json(self, path: str):
+        """Importe l'ancienne base JSON (DatabaseService) si la table est vide"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM responses LIMIT 1").fetchone():
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                entries = json.load(f)
+            except json.JSONDecodeError:
+                return
+        now = _now()
+        with conn:
+            conn.executemany(
+                INSERT_SQL.replace("INSERT", "INSERT OR IGNORE", 1),
+                [
+                    (entry['responseId'], entry.get('email'), entry.get('phone'),
+                     int(bool(entry.get('sent_mail'))), int(bool(entry.get('sent_sms'))), 'completed',
+                     entry.get('timestamp') or now, now)
+                    for entry in entries if entry.get('responseId')
+                ]
+            )
+        logger.info(f"Imported {len(entries)} responses from legacy JSON database {path}")
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        """Convertit une ligne en document (mêmes champs que Firestore)"""
+        data = dict(row)
+        data['sent_mail'] = bool(data['sent_mail'])
+        data['sent_sms'] = bool(data['sent_sms'])
+        for field in ('created_at', 'completed_at'):
+            if data.get(field):
+                data[field] = datetime.fromisoformat(data[field])
+        if data.get('completed_at') is None:
+            data.pop('completed_at', None)
+        return data
+
+    def already_sent(self, response_id: str) -> bool:
+        """
+        Vérifie si une réponse a déjà été traitée
+
+        Args:
+            response_id: Identifiant unique de la réponse
+
+        Returns:
+            True si déjà envoyé, False sinon
+
+        Raises:
+            sqlite3.Error: Base illisible (état inconnu, à réessayer)
+        """
+        try:
+            row = self._conn().execute(
+                "SELECT 1 FROM responses WHERE responseId = ?", (response_id,)
+            ).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_QUERY_FAILED.format(error=str(e)))
+            raise
+
+    def already_sent_many(self, response_ids: List[str]) -> Set[str]:
+        """
+        Vérifie quelles réponses ont déjà été traitées
+
+        Args:
+            response_ids: Identifiants des réponses à vérifier
+
+        Returns:
+            Ensemble des identifiants déjà présents
+
+        Raises:
+            sqlite3.Error: Base illisible (état inconnu, à réessayer)
+        """
+        existing = set()
+        unique_ids = list(dict.fromkeys(response_ids))
+        try:
+            conn = self._conn()
+            for i in range(0, len(unique_ids), MAX_QUERY_PARAMS):
+                chunk = unique_ids[i:i + MAX_QUERY_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT responseId FROM responses WHERE responseId IN ({placeholders})", chunk
+                )
+                existing.update(row[0] for row in rows)
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_QUERY_FAILED.format(error=str(e)))
+            raise
+        return existing
+
+    def _insert(self, response_id: str, email: str, phone: str, sent_mail: bool, sent_sms: bool,
+                status: str, success_message: str) -> str:
+        """
+        Insère une réponse (l'index unique rejette les doublons)
+
+        Returns:
+            WriteStatus.CREATED, WriteStatus.DUPLICATE ou WriteStatus.FAILED
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute(INSERT_SQL, (
+                    response_id, email, phone, int(sent_mail), int(sent_sms), status,
+                    now.strftime("%Y-%m-%dT%H:%M:%S.%f") + "Z", sortable_timestamp(now)
+                ))
+            logger.info(success_message.format(response_id=response_id))
+            return WriteStatus.CREATED
+        except sqlite3.IntegrityError:
+            logger.info(f"Response already exists: {response_id}")
+            return WriteStatus.DUPLICATE
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return WriteStatus.FAILED
+
+    def create_response(self, response_id: str, email: str, phone: str,
+                        sent_mail: bool = True, sent_sms: bool = True) -> str:
+        """
+        Crée une réponse uniquement si elle n'existe pas
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            WriteStatus.CREATED, WriteStatus.DUPLICATE ou WriteStatus.FAILED
+        """
+        return self._insert(response_id, email, phone, sent_mail, sent_sms,
+                            "completed", SuccessMessages.RESPONSE_RECORDED)
+
+    def add_response(self, response_id: str, email: str, phone: str,
+                     sent_mail: bool = True, sent_sms: bool = True, wait: bool = True) -> bool:
+        """
+        Ajoute une nouvelle réponse traitée dans la base
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+            wait: Ignoré (écriture toujours synchrone)
+
+        Returns:
+            True si ajouté avec succès, False si déjà existant
+        """
+        return self.create_response(response_id, email, phone, sent_mail, sent_sms) == WriteStatus.CREATED
+
+    def claim_response(self, response_id: str, email: str, phone: str) -> str:
+        """
+        Réserve une réponse avant l'envoi des messages (étape 1 du claim-then-finalize)
+
+        Args:
+            response_id: Identifiant unique de la réponse
+            email: Adresse e-mail du répondant
+            phone: Numéro de téléphone du répondant
+
+        Returns:
+            Statut WriteStatus de la réservation
+        """
+        return self._insert(response_id, email, phone, False, False,
+                            "pending", SuccessMessages.RESPONSE_CLAIMED)
+
+    def finalize_response(self, response_id: str, sent_mail: bool, sent_sms: bool) -> bool:
+        """
+        Complète une réponse réservée avec le résultat des envois (étape 2 du claim-then-finalize)
+
+        Args:
+            response_id: Identifiant de la réponse réservée
+            sent_mail: Statut d'envoi du mail
+            sent_sms: Statut d'envoi du SMS
+
+        Returns:
+            True si mise à jour avec succès
+        """
+        try:
+            conn = self._conn()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE responses SET sent_mail = ?, sent_sms = ?, status = 'completed', completed_at = ? "
+                    "WHERE responseId = ?",
+                    (int(sent_mail), int(sent_sms), _now(), response_id)
+                )
+            if cursor.rowcount == 0:
+                logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=f"{response_id} not found"))
+                return False
+            logger.info(SuccessMessages.RESPONSE_FINALIZED.format(response_id=response_id))
+            return True
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    def add_responses(self, records: List[Dict]) -> int:
+        """
+        Enregistre plusieurs réponses dans une seule transaction
+        Les réponses déjà présentes sont ignorées (jamais écrasées)
+
+        Args:
+            records: Liste de dictionnaires avec response_id, email, phone, sent_mail, sent_sms
+
+        Returns:
+            Nombre de réponses enregistrées (créées ou déjà présentes)
+        """
+        now = datetime.now(timezone.utc)
+        timestamp = now.strftime("%Y-%m-%dT%H:%M:%S.%f") + "Z"
+        created_at = sortable_timestamp(now)
+        try:
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    INSERT_SQL.replace("INSERT", "INSERT OR IGNORE", 1),
+                    [
+                        (record['response_id'], record['email'], record['phone'],
+                         int(record.get('sent_mail', True)), int(record.get('sent_sms', True)),
+                         "completed", timestamp, created_at)
+                        for record in records
+                    ]
+                )
+            logger.info(SuccessMessages.DATA_SAVED + f": {len(records)} responses (batch)")
+            return len(records)
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return 0
+
+    def get_response(self, response_id: str) -> Optional[Dict]:
+        """
+        Récupère une réponse spécifique par son ID
+
+        Args:
+            response_id: Identifiant unique de la réponse
+
+        Returns:
+            Les données de la réponse ou None si non trouvée
+        """
+        try:
+            row = self._conn().execute(
+                "SELECT * FROM responses WHERE responseId = ?", (response_id,)
+            ).fetchone()
+            return self._row_to_dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_QUERY_FAILED.format(error=str(e)))
+            return None
+
+    def get_all_responses(self, limit: int = 100) -> List[Dict]:
+        """
+        Récupère les réponses enregistrées (plus récentes d'abord)
+
+        Args:
+            limit: Nombre maximum de résultats à retourner
+
+        Returns:
+            Liste des réponses
+        """
+        return list(self.iter_responses(limit=limit))
+
+    def iter_responses(self, limit: int = Config.RESPONSES_PAGE_SIZE, cursor: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       sent_mail: Optional[bool] = None, sent_sms: Optional[bool] = None) -> Iterator[Dict]:
+        """
+        Streame une page de réponses (plus récentes d'abord), pagination par clé
+
+        Args:
+            limit: Taille de la page
+            cursor: Curseur opaque de la page précédente
+            start: Date minimale (incluse)
+            end: Date maximale (exclue)
+            sent_mail: Filtre sur l'envoi email
+            sent_sms: Filtre sur l'envoi SMS
+
+        Yields:
+            Données de chaque réponse
+
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        clauses, params = [], []
+        if sent_mail is not None:
+            clauses.append("sent_mail = ?")
+            params.append(int(sent_mail))
+        if sent_sms is not None:
+            clauses.append("sent_sms = ?")
+            params.append(int(sent_sms))
+        if start is not None:
+            clauses.append("created_at >= ?")
+            params.append(sortable_timestamp(start))
+        if end is not None:
+            clauses.append("created_at < ?")
+            params.append(sortable_timestamp(end))
+        if cursor:
+            created_at, response_id = decode_cursor(cursor)
+            clauses.append("(created_at, responseId) < (?, ?)")
+            params.extend([sortable_timestamp(created_at), response_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Connexion dédiée: le générateur peut être repris depuis d'autres threads
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM responses {where} ORDER BY created_at DESC, responseId DESC LIMIT ?",
+                params + [limit]
+            )
+            for row in rows:
+                yield self._row_to_dict(row)
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        """
+        Génère des statistiques sur les envois (agrégats servis par les index)
+
+        Returns:
+            Dictionnaire avec les statistiques
+        """
+        try:
+            total, mails_sent, sms_sent = self._conn().execute(
+                "SELECT (SELECT COUNT(*) FROM responses), "
+                "(SELECT COUNT(*) FROM responses WHERE sent_mail = 1), "
+                "(SELECT COUNT(*) FROM responses WHERE sent_sms = 1)"
+            ).fetchone()
+            return {
+                "total_responses": total,
+                "mails_sent": mails_sent,
+                "sms_sent": sms_sent,
+                "success_rate": 100 if total == 0 else round((mails_sent + sms_sent) / (total * 2) * 100, 2)
+            }
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_QUERY_FAILED.format(error=str(e)))
+            return {
+                "total_responses": 0,
+                "mails_sent": 0,
+                "sms_sent": 0,
+                "success_rate": 0,
+                "error": str(e)
+            }
+
+    def delete_response(self, response_id: str) -> bool:
+        """
+        Supprime une réponse (utile pour les tests)
+
+        Args:
+            response_id: Identifiant de la réponse à supprimer
+
+        Returns:
+            True si supprimé avec succès
+        """
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM responses WHERE responseId = ?", (response_id,))
+            logger.info(f"Response deleted: {response_id}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    def clear_all(self) -> bool:
+        """
+        Supprime toutes les réponses (ATTENTION: action irréversible!)
+        Utiliser uniquement pour les tests
+
+        Returns:
+            True si réussi
+        """
+        try:
+            conn = self._conn()
+            with conn:
+                deleted_count = conn.execute("DELETE FROM responses").rowcount
+            logger.warning(f"Cleared all SQLite data: {deleted_count} rows deleted")
+            return True
+        except sqlite3.Error as e:
+            logger.error(ErrorMessages.LOCAL_DB_WRITE_FAILED.format(error=str(e)))
+            return False
+
+    def close(self):
+        """Ferme les connexions ouvertes (arrêt de l'application)"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,107 @@
+"""
+Compteurs de statistiques maintenus à l'écriture
+Les compteurs sont répartis sur N documents (stats_counters/shard_i) pour
+limiter la contention; chaque incrément est commité dans le même WriteBatch
+que l'écriture de la réponse, et les statistiques se lisent en un seul get_all
+"""
+import random
+from typing import Dict, Iterable, List, Optional
+
+from config.constants import Config
+
+# Champs comptés (mêmes noms que les champs des documents de réponse)
+COUNTER_FIELDS = ('total', 'sent_mail', 'sent_sms')
+
+
+class ShardedCounters:
+    """Compteurs distribués sur plusieurs documents Firestore (client sync ou async)"""
+
+    def __init__(self, db, collection_name: str = Config.STATS_COUNTERS_COLLECTION,
+                 shards: int = Config.STATS_COUNTER_SHARDS):
+        """
+        Args:
+            db: Client Firestore (sync ou async)
+            collection_name: Collection des documents compteurs
+            shards: Nombre de documents compteurs
+        """
+        self.collection = db.collection(collection_name)
+        self.refs = [self.collection.document(f"shard_{i}") for i in range(max(1, shards))]
+
+    def increment(self, **deltas: int) -> List[tuple]:
+        """
+        Construit l'écriture d'incrément sur un shard choisi au hasard
+
+        Args:
+            **deltas: Variation par champ (total, sent_mail, sent_sms), négative possible
+
+        Returns:
+            Liste de 0 ou 1 écriture ('increment', référence, deltas)
+        """
+        deltas = {field: int(delta) for field, delta in deltas.items() if int(delta)}
+        if not deltas:
+            return []
+        return [('increment', random.choice(self.refs), deltas)]
+
+    @staticmethod
+    def sum_shards(snapshots: Iterable) -> Optional[Dict[str, int]]:
+        """
+        Additionne les valeurs des shards lus
+
+        Args:
+            snapshots: Snapshots des documents compteurs
+
+        Returns:
+            Totaux par champ, ou None si aucun compteur n'a encore été écrit
+        """
+        totals = dict.fromkeys(COUNTER_FIELDS, 0)
+        found = False
+        for snapshot in snapshots:
+            if not snapshot.exists:
+                continue
+            found = True
+            data = snapshot.to_dict() or {}
+            for field in COUNTER_FIELDS:
+                totals[field] += int(data.get(field, 0))
+        return totals if found else None
+
+
+def build_stats(counts: Dict[str, int]) -> Dict:
+    """
+    Met en forme les statistiques exposées par /api/status
+
+    Args:
+        counts: Totaux total / sent_mail / sent_sms
+
+    Returns:
+        Dictionnaire de statistiques
+    """
+    total, mails_sent, sms_sent = counts['total'], counts['sent_mail'], counts['sent_sms']
+    return {
+        "total_responses": total,
+        "mails_sent": mails_sent,
+        "sms_sent": sms_sent,
+        "success_rate": 100 if total == 0 else round((mails_sent + sms_sent) / (total * 2) * 100, 2)
+    }
+
+
+def counters_drift(before: Optional[Dict[str, int]], actual: Dict[str, int],
+                   after: Optional[Dict[str, int]]) -> Optional[Dict[str, int]]:
+    """
+    Calcule la correction à appliquer aux compteurs
+
+    Les compteurs sont lus avant et après les agrégations count(): s'ils ont
+    bougé entre-temps, une écriture concurrente rend la comparaison ambiguë et
+    la réconciliation est reportée.
+
+    Args:
+        before: Compteurs lus avant count()
+        actual: Résultats de count()
+        after: Compteurs lus après count()
+
+    Returns:
+        Écart par champ (actual - compteurs), ou None si la réconciliation est reportée
+    """
+    if before != after:
+        return None
+    current = after or dict.fromkeys(COUNTER_FIELDS, 0)
+    return {field: actual[field] - current[field] for field in COUNTER_FIELDS}
@@ -0,0 +1,131 @@
+"""
+Tests du disjoncteur et de la bascule e-mail (refus 4xx vs pannes)
+Usage: python -m pytest test_circuit_breaker.py
+"""
+import asyncio
+
+import pytest
+
+from services.failover_email_service import FailoverEmailService
+from utils import circuit_breaker
+from utils.circuit_breaker import CallRejected, CircuitBreaker, is_rejection
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge monotone contrôlée par le test"""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker(**kwargs):
+    options = dict(window=4, min_calls=4, failure_rate=0.5, slow_call_ms=1000, slow_call_rate=0.5, open_seconds=30)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def test_opens_on_failure_rate(clock):
+    breaker = make_breaker()
+    for success in (True, False, True):
+        assert breaker.allow()
+        breaker.record(success, 0.01)
+    assert breaker.state == CircuitBreaker.CLOSED  # moins de min_calls appels
+    breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.get_stats()["rejected"] == 1 and breaker.get_stats()["opened"] == 1
+
+
+def test_opens_on_slow_call_rate(clock):
+    breaker = make_breaker()
+    for latency in (0.1, 2.0, 0.1, 2.0):
+        breaker.record(True, latency)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.get_stats()["window_calls"] == 0
+
+
+@pytest.mark.parametrize("success, latency", [(False, 0.01), (True, 5.0)])
+def test_failed_or_slow_probe_reopens(clock, success, latency):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(success, latency)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.get_stats()["opened"] == 2 and breaker.get_stats()["retry_in_seconds"] == 30
+
+
+@pytest.mark.parametrize("status_code, rejected", [
+    (400, True), (404, True), (422, True), (408, False), (429, False), (500, False), (503, False), (None, False)
+])
+def test_is_rejection(status_code, rejected):
+    assert is_rejection(status_code) is rejected
+
+
+class FakeProvider:
+    """Provider e-mail qui échoue, refuse ou réussit selon outcome"""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.raise_rejected = False
+        self.calls = 0
+
+    def send_email(self, *args, **kwargs):
+        self.calls += 1
+        if self.outcome == "rejected":
+            raise CallRejected("400 Bad Request")
+        return self.outcome == "ok"
+
+
+def test_rejection_neither_fails_over_nor_trips(monkeypatch):
+    monkeypatch.setenv("BREAKER_MIN_CALLS", "2")
+    primary, backup = FakeProvider("rejected"), FakeProvider("ok")
+    service = FailoverEmailService([("primary", primary), ("backup", backup)], hedge_after_ms=0)
+    assert primary.raise_rejected
+    for _ in range(5):
+        assert service.send_email("a@b.co", "Sujet", "<p>x</p>") is False
+    assert backup.calls == 0
+    stats = service.get_failover_stats()
+    assert stats["rejected"] == 5
+    assert stats["breakers"]["primary"]["state"] == CircuitBreaker.CLOSED
+
+
+def test_failure_fails_over_and_trips(monkeypatch):
+    monkeypatch.setenv("BREAKER_MIN_CALLS", "2")
+    primary, backup = FakeProvider("error"), FakeProvider("ok")
+    service = FailoverEmailService([("primary", primary), ("backup", backup)], hedge_after_ms=0)
+    for _ in range(5):
+        assert service.send_email("a@b.co", "Sujet", "<p>x</p>") is True
+    assert backup.calls == 5 and primary.calls < 5
+    assert service.get_failover_stats()["breakers"]["primary"]["state"] == CircuitBreaker.OPEN
+
+
+def test_async_rejection_is_not_resent():
+    primary, backup = FakeProvider("rejected"), FakeProvider("ok")
+    service = FailoverEmailService([("primary", primary), ("backup", backup)], hedge_after_ms=0)
+    assert asyncio.run(service.send_email_async("a@b.co", "Sujet", "<p>x</p>")) is False
+    assert backup.calls == 0
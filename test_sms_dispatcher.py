@@ -0,0 +1,85 @@
+"""
+Tests du dispatcher SMS (seau à jetons par expéditeur, file différée)
+Usage: python -m pytest test_sms_dispatcher.py
+"""
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from utils.sms_dispatcher import SMSDispatcher, TokenBucket
+
+
+def test_bucket_spaces_messages_by_cost():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.reserve(100.0, cost=2) == 0
+    assert bucket.reserve(100.0, cost=2) == 2.0
+    assert bucket.reserve(100.0, cost=1) == 4.0
+
+
+def test_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=10, burst=3)
+    waits = [bucket.reserve(50.0) for _ in range(5)]
+    assert waits[:3] == [0, 0, 0]
+    assert math.isclose(waits[3], 0.1) and math.isclose(waits[4], 0.2)
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.reserve(1.0, cost=5) == 0 for _ in range(100))
+
+
+def test_reserve_rejects_beyond_max_wait():
+    dispatcher = SMSDispatcher(["+15550001"], rate=1, burst=1, max_wait=5)
+    slots = [dispatcher.reserve(2) for _ in range(10)]
+    assert [slot is not None for slot in slots] == [True] * 3 + [False] * 7
+    assert dispatcher.reserve(2, max_wait=math.inf) is not None
+
+
+def test_saturated_burst_is_deferred_not_lost():
+    dispatcher = SMSDispatcher(["+15550001", "+15550002"], rate=100, burst=1, max_wait=0.05)
+    sent = []
+    lock = Lock()
+
+    def deliver(index, max_wait=None):
+        sender = dispatcher.acquire(2, max_wait)
+        if sender is None:
+            return None
+        with lock:
+            sent.append((index, sender, time.monotonic()))
+        return True
+
+    def send(index):
+        result = deliver(index)
+        if result is None:
+            result = dispatcher.defer(lambda: deliver(index, math.inf))
+        return result
+
+    # Rafale simultanée: bien plus de messages que le seau n'en admet en 50 ms
+    with ThreadPoolExecutor(40) as executor:
+        accepted = list(executor.map(send, range(40)))
+
+    assert all(accepted)
+    assert dispatcher.close(timeout=10) == 0
+    assert sorted(index for index, _, _ in sent) == list(range(40))
+    stats = dispatcher.get_stats()
+    assert stats["deferred"] > 0 and stats["rejected"] == 0 and stats["deferred_failed"] == 0
+    # Débit respecté: 2 segments à 100/s = 20 ms par expéditeur
+    for sender in dispatcher.senders:
+        times = sorted(at for _, s, at in sent if s == sender)
+        assert all(b - a >= 0.015 for a, b in zip(times, times[1:]))
+
+
+def test_drop_on_saturation_is_opt_in():
+    dispatcher = SMSDispatcher(["+15550001"], rate=1, burst=1, max_wait=0, drop_on_saturation=True)
+    assert dispatcher.acquire() == "+15550001"
+    assert dispatcher.acquire() is None
+    assert dispatcher.defer(lambda: True) is False
+    assert dispatcher.get_stats()["rejected"] == 1
+
+
+def test_throttled_sender_is_skipped():
+    dispatcher = SMSDispatcher(["a", "b"], rate=1, burst=1, max_wait=0, throttle_pause=60)
+    dispatcher.throttled("a")
+    assert dispatcher.acquire() == "b"
+    assert dispatcher.acquire() is None
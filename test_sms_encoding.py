@@ -0,0 +1,104 @@
+"""
+Tests de l'encodage et de la segmentation des SMS (GSM-7 / UCS-2)
+Usage: python -m pytest test_sms_encoding.py
+"""
+import pytest
+
+from utils.sms_encoding import GSM7, UCS2, TRUNCATION_MARK, analyze, fit, prepare_sms, sms_stats, transliterate
+
+
+@pytest.mark.parametrize("length, segments", [(0, 0), (1, 1), (160, 1), (161, 2), (306, 2), (307, 3)])
+def test_gsm7_segment_limits(length, segments):
+    info = analyze("a" * length)
+    assert info.encoding == GSM7 and info.units == length and info.segments == segments
+
+
+@pytest.mark.parametrize("length, segments", [(70, 1), (71, 2), (134, 2), (135, 3)])
+def test_ucs2_segment_limits(length, segments):
+    info = analyze("ê" * length)
+    assert info.encoding == UCS2 and info.units == length and info.segments == segments
+
+
+def test_gsm7_escape_counts_two_septets():
+    assert analyze("€" * 80) == (GSM7, 160, 1)
+    assert analyze("{" * 80 + "a") == (GSM7, 161, 2)
+
+
+def test_gsm7_escape_never_split_between_segments():
+    # 306 septets: 2 segments si l'échappement pouvait être coupé, 3 en réalité
+    info = analyze("a" * 152 + "€" + "a" * 152)
+    assert info.units == 306 and info.segments == 3
+
+
+def test_single_non_gsm_char_switches_to_ucs2():
+    info = analyze("a" * 100 + "ç")
+    assert info.encoding == UCS2 and info.segments == 2
+
+
+def test_surrogate_pair_counts_two_units():
+    assert analyze("😀" * 35) == (UCS2, 70, 1)
+    assert analyze("😀" * 35 + "a") == (UCS2, 71, 2)
+
+
+def test_surrogate_pair_never_split_between_segments():
+    info = analyze("ê" * 66 + "😀" + "ê" * 66)
+    assert info.units == 134 and info.segments == 3
+
+
+def test_fit_keeps_message_that_fits():
+    assert fit("a" * 160, 1) == "a" * 160
+    assert fit("ê" * 134, 2) == "ê" * 134
+
+
+@pytest.mark.parametrize("text, max_segments, expected_length", [
+    ("a" * 500, 1, 160),
+    ("a" * 500, 2, 306),
+    ("ê" * 500, 1, 70),
+    ("ê" * 500, 3, 201),
+])
+def test_fit_truncates_at_max_segments(text, max_segments, expected_length):
+    fitted = fit(text, max_segments)
+    assert fitted.endswith(TRUNCATION_MARK)
+    assert len(fitted) == expected_length
+    assert analyze(fitted).segments == max_segments
+
+
+def test_fit_does_not_split_escape_or_surrogate():
+    fitted = fit("€" * 200, 1)
+    assert fitted == "€" * 78 + TRUNCATION_MARK
+    fitted = fit("😀" * 100, 1)
+    assert fitted == "😀" * 33 + TRUNCATION_MARK
+    assert analyze(fitted) == (UCS2, 69, 1)
+
+
+def test_fit_at_segment_boundary_with_escape():
+    # Le "€" tomberait à cheval sur la fin du 2e segment: coupé avant
+    fitted = fit("a" * 305 + "€" + "a" * 50, 2)
+    assert analyze(fitted).segments == 2
+    assert fitted == "a" * 303 + TRUNCATION_MARK
+
+
+def test_fit_strips_trailing_space_before_mark():
+    assert fit("a" * 156 + " " + "b" * 10, 1) == "a" * 156 + TRUNCATION_MARK
+
+
+def test_transliterate_french_text():
+    assert transliterate("Reçu à l’école — œuvre «ok»") == 'Recu à l\'école - oeuvre "ok"'
+
+
+def test_transliterate_drops_symbols_and_keeps_gsm7():
+    assert transliterate("Merci 🎉 !") == "Merci !"
+    assert transliterate("ā ł") == "a ?"
+    text = "Déjà payé: 10€ {ok}"
+    assert transliterate(text) == text
+    assert analyze(transliterate("Reçu ✅ ça marche")).encoding == GSM7
+
+
+def test_prepare_sms_transliterates_then_truncates():
+    before = sms_stats.get_stats()
+    prepared = prepare_sms("ç" * 200, 1, gsm_transliterate=True)
+    assert prepared == "c" * 157 + TRUNCATION_MARK
+    after = sms_stats.get_stats()
+    assert after["messages"] == before["messages"] + 1
+    assert after["transliterated"] == before["transliterated"] + 1
+    assert after["truncated"] == before["truncated"] + 1
@@ -0,0 +1,168 @@
+"""
+Micro-batching générique pour coalescer des appels unitaires
+Les éléments soumis sont regroupés toutes les N ms ou tous les M éléments,
+puis traités en un seul appel; chaque appelant reçoit un Future individuel
+"""
+import time
+from concurrent.futures import Future
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class MicroBatcher:
+    """
+    Regroupe des éléments soumis depuis plusieurs threads et les traite par lots
+    dans un thread dédié
+
+    Le handler reçoit la liste des éléments et retourne une liste de même
+    longueur: chaque résultat est transmis au Future correspondant, ou levé
+    s'il s'agit d'une exception.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], List[Any]],
+        max_batch: int,
+        max_delay_ms: int,
+        name: str = "batcher"
+    ):
+        """
+        Args:
+            handler: Fonction de traitement d'un lot
+            max_batch: Taille maximale d'un lot
+            max_delay_ms: Délai maximal d'attente avant traitement (millisecondes)
+            name: Nom du thread (logs)
+        """
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0, max_delay_ms) / 1000
+        self.name = name
+
+        self._items: List[Tuple[Any, Future]] = []
+        self._cond = Condition()
+        self._closing = False
+        self._in_flight = 0
+
+        self._batches = 0
+        self._items_total = 0
+        self._largest_batch = 0
+
+        self._thread = Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Ajoute un élément au prochain lot
+
+        Args:
+            item: Élément à traiter
+
+        Returns:
+            Future résolu avec le résultat de l'élément
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError(f"{self.name} is closed")
+            self._items.append((item, future))
+            if len(self._items) == 1 or len(self._items) >= self.max_batch:
+                self._cond.notify_all()
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Force le traitement des éléments en attente et attend la fin
+
+        Args:
+            timeout: Temps maximum d'attente (secondes)
+
+        Returns:
+            True si tout a été traité dans le délai
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._items or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def close(self, timeout: Optional[float] = 30):
+        """
+        Traite les éléments restants puis arrête le thread
+
+        Args:
+            timeout: Temps maximum d'attente (secondes)
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques de regroupement
+
+        Returns:
+            Dictionnaire avec nombre de lots, éléments et taille moyenne
+        """
+        with self._cond:
+            return {
+                "pending": len(self._items),
+                "batches": self._batches,
+                "items": self._items_total,
+                "largest_batch": self._largest_batch,
+                "avg_batch": round(self._items_total / self._batches, 2) if self._batches else 0
+            }
+
+    def _run(self):
+        """Boucle du thread: attend un lot complet ou l'expiration du délai"""
+        while True:
+            with self._cond:
+                while not self._items and not self._closing:
+                    self._cond.wait()
+                if not self._items and self._closing:
+                    self._cond.notify_all()
+                    return
+
+                # Attendre que le lot se remplisse (ou l'expiration du délai)
+                deadline = time.monotonic() + self.max_delay
+                while len(self._items) < self.max_batch and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._items[:self.max_batch]
+                del self._items[:self.max_batch]
+                self._in_flight = len(batch)
+
+            self._process(batch)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _process(self, batch: List[Tuple[Any, Future]]):
+        """Appelle le handler et distribue les résultats aux Futures"""
+        self._batches += 1
+        self._items_total += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+
+        try:
+            results = self.handler([item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
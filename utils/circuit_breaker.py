@@ -0,0 +1,191 @@
+"""
+Disjoncteur (circuit breaker) piloté par le taux d'erreur et la latence
+Un provider qui échoue ou répond trop lentement sur les derniers appels est
+écarté pendant un délai, puis testé par un appel d'essai avant d'être rétabli
+"""
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from config.constants import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class CallRejected(Exception):
+    """
+    Requête refusée par le service appelé à cause de son contenu
+    (HTTP 4xx, destinataire invalide): le service fonctionne, l'appel ne
+    compte pas comme un échec et ne doit pas être rejoué sur un autre service
+    """
+
+
+def is_rejection(status_code: Optional[int]) -> bool:
+    """
+    Statut HTTP d'un refus de la requête (4xx), hors limites de débit
+    et délais (429, 408) qui relèvent du service
+
+    Args:
+        status_code: Statut HTTP de la réponse (None: pas de réponse)
+
+    Returns:
+        True si la requête elle-même est en cause
+    """
+    return status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états
+
+    - closed: les appels passent; le circuit s'ouvre quand, sur les window
+      derniers appels (au moins min_calls), le taux d'échecs ou le taux
+      d'appels lents atteint son seuil
+    - open: les appels sont refusés pendant open_seconds
+    - half_open: un seul appel d'essai; succès rapide -> closed, sinon -> open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window: int = Config.BREAKER_WINDOW,
+        min_calls: int = Config.BREAKER_MIN_CALLS,
+        failure_rate: float = Config.BREAKER_FAILURE_RATE,
+        slow_call_ms: float = Config.BREAKER_SLOW_CALL_MS,
+        slow_call_rate: float = Config.BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = Config.BREAKER_OPEN_SECONDS
+    ):
+        """
+        Args:
+            name: Nom du circuit (logs, statistiques)
+            window: Nombre de derniers appels évalués
+            min_calls: Appels minimum dans la fenêtre avant d'évaluer les taux
+            failure_rate: Taux d'échecs déclenchant l'ouverture (0-1)
+            slow_call_ms: Latence au-delà de laquelle un appel est lent (millisecondes)
+            slow_call_rate: Taux d'appels lents déclenchant l'ouverture (0-1)
+            open_seconds: Durée d'ouverture avant l'appel d'essai (secondes)
+        """
+        self.name = name
+        self.window = max(1, window)
+        self.min_calls = max(1, min(min_calls, self.window))
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call_ms / 1000
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=self.window)  # (échec, lent)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = Lock()
+
+        self._successes = 0
+        self._failures = 0
+        self._slow_calls = 0
+        self._rejected = 0
+        self._opened = 0
+
+    @property
+    def state(self) -> str:
+        """État courant (open devient half_open une fois le délai écoulé)"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Réserve un appel si le circuit le permet
+
+        Returns:
+            True si l'appel peut être tenté (l'issue doit être enregistrée par record())
+        """
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, success: bool, latency: float):
+        """
+        Enregistre l'issue d'un appel
+
+        Args:
+            success: Appel réussi
+            latency: Durée de l'appel (secondes)
+        """
+        slow = latency >= self.slow_call
+        with self._lock:
+            if success:
+                self._successes += 1
+            else:
+                self._failures += 1
+            if slow:
+                self._slow_calls += 1
+
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if success and not slow:
+                    self._state = self.CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit {self.name} closed")
+                else:
+                    self._trip("probe failed" if not success else "probe slow")
+                return
+            if self._state == self.OPEN:
+                # Appel commencé avant l'ouverture
+                return
+
+            self._calls.append((not success, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._calls if failed) / len(self._calls)
+            slow_calls = sum(1 for _, is_slow in self._calls if is_slow) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._trip(f"failure rate {failures:.0%}")
+            elif slow_calls >= self.slow_call_rate:
+                self._trip(f"slow call rate {slow_calls:.0%}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état et les compteurs du circuit
+
+        Returns:
+            Dictionnaire avec état, taux sur la fenêtre et compteurs cumulés
+        """
+        state = self.state
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                "state": state,
+                "window_calls": calls,
+                "failure_rate": round(sum(1 for failed, _ in self._calls if failed) / calls, 3) if calls else 0,
+                "slow_call_rate": round(sum(1 for _, slow in self._calls if slow) / calls, 3) if calls else 0,
+                "successes": self._successes,
+                "failures": self._failures,
+                "slow_calls": self._slow_calls,
+                "rejected": self._rejected,
+                "opened": self._opened,
+                "retry_in_seconds": round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+                if state == self.OPEN else 0
+            }
+
+    def _trip(self, reason: str):
+        """Ouvre le circuit (verrou détenu)"""
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self._opened += 1
+        logger.warning(f"Circuit {self.name} opened ({reason}) for {self.open_seconds}s")
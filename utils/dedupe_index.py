@@ -0,0 +1,192 @@
+"""
+Index de déduplication en mémoire placé devant Firestore
+- Filtre de Bloom: répond "certainement nouveau" sans appel réseau
+- LRU des IDs récemment vus: répond "certainement doublon"
+Les cas incertains sont délégués à Firestore
+"""
+import math
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+
+class BloomFilter:
+    """Filtre de Bloom à taille fixe (double hachage blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Dimensionne le filtre pour une capacité et un taux de faux positifs donnés
+
+        Args:
+            capacity: Nombre d'éléments attendus
+            error_rate: Taux de faux positifs visé (ex: 0.001)
+        """
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class DedupeIndex:
+    """
+    Combinaison Bloom + LRU, thread-safe
+
+    Le filtre de Bloom n'est considéré comme fiable qu'une fois le préchauffage
+    terminé (mark_ready). L'écriture create-if-absent reste le garde-fou final
+    pour les IDs plus anciens que la fenêtre de préchauffage ou écrits par un
+    autre réplica.
+    """
+
+    def __init__(self, bloom_capacity: int, bloom_error_rate: float, lru_size: int):
+        """
+        Args:
+            bloom_capacity: Capacité du filtre de Bloom
+            bloom_error_rate: Taux de faux positifs du filtre
+            lru_size: Nombre d'IDs récents conservés
+        """
+        self._bloom = BloomFilter(bloom_capacity, bloom_error_rate)
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._lru_size = max(1, lru_size)
+        self._lock = Lock()
+        self._ready = False
+
+        self.stats = {
+            "bloom_negative": 0,   # "certainement nouveau", pas d'appel réseau
+            "lru_hits": 0,         # "certainement doublon", pas d'appel réseau
+            "fallbacks": 0,        # réponse incertaine, requête Firestore
+            "false_positives": 0,  # Bloom positif mais absent de Firestore
+        }
+
+    def check(self, response_id: str) -> Optional[bool]:
+        """
+        Consulte l'index local
+
+        Args:
+            response_id: Identifiant de la réponse
+
+        Returns:
+            True si doublon certain, False si nouveau certain, None si incertain
+        """
+        with self._lock:
+            if response_id in self._lru:
+                self._lru.move_to_end(response_id)
+                self.stats["lru_hits"] += 1
+                return True
+            if self._ready and response_id not in self._bloom:
+                self.stats["bloom_negative"] += 1
+                return False
+            self.stats["fallbacks"] += 1
+            return None
+
+    def add(self, response_id: str):
+        """
+        Enregistre un ID connu (existant dans Firestore)
+
+        Args:
+            response_id: Identifiant de la réponse
+        """
+        with self._lock:
+            self._bloom.add(response_id)
+            self._lru[response_id] = None
+            self._lru.move_to_end(response_id)
+            if len(self._lru) > self._lru_size:
+                self._lru.popitem(last=False)
+
+    def discard(self, response_id: str):
+        """
+        Retire un ID du LRU (le filtre de Bloom ne supporte pas la suppression)
+
+        Args:
+            response_id: Identifiant de la réponse supprimée
+        """
+        with self._lock:
+            self._lru.pop(response_id, None)
+
+    def seen_recently(self, response_id: str) -> bool:
+        """
+        Consulte uniquement le LRU (doublon récent certain)
+
+        Args:
+            response_id: Identifiant de la réponse
+
+        Returns:
+            True si l'ID est dans le LRU
+        """
+        with self._lock:
+            if response_id in self._lru:
+                self._lru.move_to_end(response_id)
+                self.stats["lru_hits"] += 1
+                return True
+            return False
+
+    def record_absent(self, response_id: str):
+        """
+        Enregistre qu'un ID est absent de Firestore
+        Comptabilise un faux positif si le filtre de Bloom le signalait présent
+
+        Args:
+            response_id: Identifiant de la réponse
+        """
+        with self._lock:
+            if self._ready and response_id in self._bloom:
+                self.stats["false_positives"] += 1
+
+    def warm(self, response_ids: Iterable[str]) -> int:
+        """
+        Charge des IDs existants dans le filtre de Bloom (sans passer par le LRU)
+
+        Args:
+            response_ids: IDs à charger (itérable en streaming)
+
+        Returns:
+            Nombre d'IDs chargés
+        """
+        loaded = 0
+        for response_id in response_ids:
+            with self._lock:
+                self._bloom.add(response_id)
+            loaded += 1
+        return loaded
+
+    def mark_ready(self):
+        """Active les réponses "certainement nouveau" du filtre de Bloom"""
+        with self._lock:
+            self._ready = True
+
+    def get_stats(self) -> Dict:
+        """
+        Retourne les compteurs hit/miss et l'empreinte mémoire
+
+        Returns:
+            Dictionnaire de statistiques
+        """
+        with self._lock:
+            return {
+                **self.stats,
+                "ready": self._ready,
+                "bloom_items": self._bloom.count,
+                "bloom_memory_bytes": self._bloom.memory_bytes,
+                "bloom_hash_count": self._bloom.hash_count,
+                "lru_items": len(self._lru),
+                "lru_capacity": self._lru_size
+            }
@@ -0,0 +1,233 @@
+"""
+File de dispatch durable pour le mode "accept-and-queue"
+Les soumissions sont journalisées sur disque (append + fsync) avant d'être
+traitées par un pool de workers asyncio en arrière-plan
+"""
+import os
+import json
+import time
+import asyncio
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config.constants import Config
+from utils.logger import setup_logger
+from utils.write_spool import claim_slot, release_slot
+
+logger = setup_logger(__name__)
+
+
+class DispatchQueue:
+    """
+    File d'attente en mémoire adossée à un journal JSON-lines
+
+    Chaque soumission est écrite dans le journal ("enqueue") avant d'être
+    acceptée, puis marquée "done" une fois traitée. Au redémarrage, les
+    entrées non terminées sont rejouées.
+
+    Chaque processus (worker uvicorn) verrouille son propre journal, comme
+    le spool d'écriture (path, path.1...): un worker ne rejoue ni ne compacte
+    les jobs d'un autre.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        workers: int = Config.DISPATCH_WORKERS,
+        journal_path: str = Config.DISPATCH_QUEUE_PATH
+    ):
+        """
+        Initialise la file de dispatch
+
+        Args:
+            handler: Coroutine appelée pour chaque job
+            workers: Nombre de workers en parallèle
+            journal_path: Chemin du journal sur disque
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.base_path = journal_path
+        self.journal_path = journal_path
+        self._lock_fd: Optional[int] = None
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._pending: Dict[str, Dict[str, Any]] = {}  # job_id -> entrée du journal
+        self._journal = None
+        self._journal_lock = Lock()
+        self._done_since_compaction = 0
+
+        self._processed = 0
+        self._failed = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    async def start(self):
+        """Rejoue le journal puis démarre les workers"""
+        self._queue = asyncio.Queue()
+        self.journal_path, self._lock_fd = claim_slot(self.base_path)
+
+        for entry in self._replay_journal():
+            self._pending[entry['id']] = entry
+            self._queue.put_nowait(entry)
+
+        self._compact_journal()
+
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+
+        logger.info(f"Dispatch queue started ({self.journal_path}): {self.workers} workers, "
+                    f"{len(self._pending)} pending jobs replayed")
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Attend la fin des jobs en cours puis arrête les workers
+        Les jobs non traités restent dans le journal et seront rejoués
+
+        Args:
+            timeout: Temps maximum d'attente pour vider la file (secondes)
+        """
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dispatch queue stopped with {len(self._pending)} pending jobs (will be replayed)")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            release_slot(self._lock_fd)
+            self._lock_fd = None
+
+    def enqueue(self, job_id: str, job: Dict[str, Any]) -> bool:
+        """
+        Journalise durablement un job et l'ajoute à la file
+
+        Args:
+            job_id: Identifiant unique du job (response_id)
+            job: Données du job (sérialisables en JSON)
+
+        Returns:
+            True si ajouté, False si le job est déjà en attente
+        """
+        if job_id in self._pending:
+            return False
+
+        entry = {"op": "enqueue", "id": job_id, "job": job, "enqueued_at": time.time()}
+        self._append_journal(entry)
+
+        self._pending[job_id] = entry
+        self._queue.put_nowait(entry)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état de la file (profondeur, retard des workers)
+
+        Returns:
+            Dictionnaire avec les statistiques de la file
+        """
+        now = time.time()
+        oldest = min((e['enqueued_at'] for e in self._pending.values()), default=None)
+        return {
+            "workers": self.workers,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending": len(self._pending),
+            "processed": self._processed,
+            "failed": self._failed,
+            "oldest_pending_age_seconds": round(now - oldest, 3) if oldest else 0,
+            "last_lag_seconds": round(self._last_lag, 3),
+            "max_lag_seconds": round(self._max_lag, 3)
+        }
+
+    async def _worker(self, index: int):
+        """Boucle d'un worker: dépile et traite les jobs avec retries"""
+        while True:
+            entry = await self._queue.get()
+            try:
+                lag = time.time() - entry['enqueued_at']
+                self._last_lag = lag
+                self._max_lag = max(self._max_lag, lag)
+
+                for attempt in range(1, Config.MAX_RETRIES + 1):
+                    try:
+                        await self.handler(entry['job'])
+                        self._processed += 1
+                        break
+                    except Exception as e:
+                        logger.error(f"Dispatch job {entry['id']} failed (attempt {attempt}/{Config.MAX_RETRIES}): {e}")
+                        if attempt == Config.MAX_RETRIES:
+                            self._failed += 1
+                        else:
+                            await asyncio.sleep(Config.RETRY_DELAY)
+
+                self._mark_done(entry['id'])
+            finally:
+                self._queue.task_done()
+
+    def _mark_done(self, job_id: str):
+        """Marque un job comme terminé dans le journal"""
+        self._pending.pop(job_id, None)
+        self._append_journal({"op": "done", "id": job_id}, sync=False)
+        self._done_since_compaction += 1
+
+        # Compacter le journal quand la file est vide
+        if not self._pending and self._done_since_compaction >= Config.DISPATCH_COMPACT_THRESHOLD:
+            self._compact_journal()
+
+    def _append_journal(self, entry: Dict[str, Any], sync: bool = True):
+        """Ajoute une entrée au journal (fsync pour les enqueue)"""
+        with self._journal_lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            if sync:
+                os.fsync(self._journal.fileno())
+
+    def _replay_journal(self):
+        """
+        Relit le journal et retourne les jobs non terminés
+
+        Returns:
+            Liste des entrées "enqueue" sans "done" correspondant
+        """
+        if not os.path.exists(self.journal_path):
+            return []
+
+        pending: Dict[str, Dict[str, Any]] = {}
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Ligne tronquée par un crash pendant l'écriture
+                    continue
+                if entry.get('op') == 'enqueue':
+                    pending[entry['id']] = entry
+                elif entry.get('op') == 'done':
+                    pending.pop(entry['id'], None)
+        return list(pending.values())
+
+    def _compact_journal(self):
+        """Réécrit le journal avec uniquement les jobs en attente"""
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in self._pending.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+            self._done_since_compaction = 0
+
@@ -0,0 +1,155 @@
+"""
+Vérification de santé des services en arrière-plan
+Chaque service initialisé est testé (test_connection) à son propre intervalle
+hors du chemin des requêtes; /api/status ne lit que le dernier résultat en mémoire
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class HealthProber:
+    """
+    Tâche asyncio qui teste périodiquement les services initialisés
+
+    Un service est testé dès qu'il apparaît (ou qu'il est remplacé), puis
+    toutes les intervals[nom] secondes. Un test qui dépasse timeout compte
+    comme un échec.
+    """
+
+    def __init__(
+        self,
+        targets: Callable[[], Dict[str, Any]],
+        run_blocking: Callable[..., Awaitable[Any]],
+        intervals: Dict[str, float],
+        timeout: float,
+        tick: float = 1.0
+    ):
+        """
+        Args:
+            targets: Fonction retournant les services initialisés ({nom: service})
+            run_blocking: Exécuteur des test_connection() bloquants (ServiceManager.run_blocking)
+            intervals: Intervalle entre deux tests, par nom de service (secondes)
+            timeout: Durée maximale d'un test (secondes)
+            tick: Période de vérification des tests à lancer (secondes)
+        """
+        self.targets = targets
+        self.run_blocking = run_blocking
+        self.intervals = intervals
+        self.timeout = timeout
+        self.tick = tick
+
+        # nom -> (service testé, résultat, instant du test (monotonic))
+        self._results: Dict[str, tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._probes = 0
+        self._failures = 0
+
+    def start(self):
+        """Lance la tâche de vérification dans la boucle courante"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Health prober started (intervals: {self.intervals}, timeout {self.timeout:g}s)")
+
+    async def stop(self):
+        """Arrête la tâche de vérification"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def healthy(self, name: str) -> bool:
+        """
+        Dernier résultat connu d'un service (lecture en mémoire)
+
+        Args:
+            name: Nom du service ("email", "sms")
+
+        Returns:
+            True si le dernier test du service courant a réussi
+        """
+        cached = self._results.get(name)
+        return cached is not None and cached[0] is self.targets().get(name) and cached[1]["healthy"]
+
+    def get_results(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Derniers résultats des tests
+
+        Returns:
+            {nom: {healthy, checked_at, age_seconds, latency_ms[, error]}}
+        """
+        now = time.monotonic()
+        return {
+            name: {**result, "age_seconds": round(now - checked, 1)}
+            for name, (_, result, checked) in self._results.items()
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du vérificateur et les derniers résultats
+
+        Returns:
+            Dictionnaire avec état de la tâche, compteurs et résultats par service
+        """
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "probes": self._probes,
+            "failures": self._failures,
+            "services": self.get_results()
+        }
+
+    async def probe(self, name: str, service: Any) -> Dict[str, Any]:
+        """
+        Teste un service et met en cache le résultat
+
+        Args:
+            name: Nom du service
+            service: Instance exposant test_connection()
+
+        Returns:
+            Résultat du test
+        """
+        start = time.monotonic()
+        result: Dict[str, Any] = {}
+        try:
+            healthy = await asyncio.wait_for(self.run_blocking(service.test_connection), self.timeout)
+            result["healthy"] = bool(healthy)
+        except asyncio.TimeoutError:
+            result.update(healthy=False, error=f"timeout after {self.timeout:g}s")
+        except Exception as e:
+            result.update(healthy=False, error=str(e))
+        result["latency_ms"] = round((time.monotonic() - start) * 1000, 1)
+        result["checked_at"] = datetime.utcnow().isoformat() + "Z"
+
+        self._probes += 1
+        previous = self._results.get(name)
+        if not result["healthy"]:
+            self._failures += 1
+            if previous is None or previous[1]["healthy"]:
+                logger.warning(f"Health probe failed: {name} ({result.get('error', 'test_connection returned False')})")
+        elif previous is not None and not previous[1]["healthy"]:
+            logger.info(f"Health probe recovered: {name}")
+        self._results[name] = (service, result, time.monotonic())
+        return result
+
+    async def _run(self):
+        """Boucle: teste les services nouveaux, remplacés ou dont l'intervalle est écoulé"""
+        while True:
+            now = time.monotonic()
+            due = []
+            for name, service in self.targets().items():
+                cached = self._results.get(name)
+                interval = self.intervals.get(name, 0)
+                if cached is None or cached[0] is not service or (interval > 0 and now - cached[2] >= interval):
+                    due.append(self.probe(name, service))
+            if due:
+                await asyncio.gather(*due)
+            await asyncio.sleep(self.tick)
@@ -0,0 +1,97 @@
+"""
+Transport HTTP asynchrone partagé par les services d'envoi (SendGrid, Twilio)
+Une seule session aiohttp: connexions keep-alive réutilisées, cache DNS,
+limites et délais configurables; aucun thread bloqué pendant les requêtes
+aiohttp est déjà une dépendance du SDK Twilio (client async)
+"""
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from config.constants import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SharedHTTPTransport:
+    """
+    Session aiohttp créée à la première requête dans la boucle d'événements
+
+    La configuration est lue dans l'environnement à la création de la session
+    (après le chargement du fichier .env). Une session est liée à sa boucle:
+    elle est recréée si la boucle change (tests, workers).
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limits: Dict[str, Any] = {}
+        self._sessions_created = 0
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Retourne la session partagée de la boucle courante
+
+        Returns:
+            Session aiohttp
+        """
+        loop = asyncio.get_running_loop()
+        # Pas d'await entre la vérification et la création: pas de course dans la boucle
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Crée la session avec les limites de l'environnement"""
+        self._limits = {
+            "max_connections": int(os.getenv('HTTP_MAX_CONNECTIONS', Config.HTTP_MAX_CONNECTIONS)),
+            "max_connections_per_host": int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', Config.HTTP_MAX_CONNECTIONS_PER_HOST)),
+            "keepalive_timeout": float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', Config.HTTP_KEEPALIVE_TIMEOUT)),
+            "dns_cache_ttl": int(os.getenv('HTTP_DNS_CACHE_TTL', Config.HTTP_DNS_CACHE_TTL)),
+            "timeout": float(os.getenv('HTTP_TIMEOUT', Config.HTTP_TIMEOUT)),
+            "connect_timeout": float(os.getenv('HTTP_CONNECT_TIMEOUT', Config.HTTP_CONNECT_TIMEOUT))
+        }
+        connector = aiohttp.TCPConnector(
+            limit=self._limits["max_connections"],
+            limit_per_host=self._limits["max_connections_per_host"],
+            keepalive_timeout=self._limits["keepalive_timeout"],
+            use_dns_cache=self._limits["dns_cache_ttl"] > 0,
+            ttl_dns_cache=self._limits["dns_cache_ttl"] or None
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self._limits["timeout"],
+            connect=self._limits["connect_timeout"]
+        )
+        self._sessions_created += 1
+        logger.info(
+            f"HTTP transport ready (max {self._limits['max_connections']} connections, "
+            f"DNS cache {self._limits['dns_cache_ttl']}s)"
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        """Ferme la session et ses connexions (arrêt de l'application)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne la configuration et l'état du transport
+
+        Returns:
+            Dictionnaire avec les limites et le nombre de sessions créées
+        """
+        return {
+            "active": self._session is not None and not self._session.closed,
+            "sessions_created": self._sessions_created,
+            **self._limits
+        }
+
+
+# Instance globale partagée par les services
+http_transport = SharedHTTPTransport()
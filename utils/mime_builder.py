@@ -0,0 +1,239 @@
+"""
+Messages MIME assemblés directement en bytes à partir de parties pré-encodées
+Les morceaux statiques d'un template sont encodés une fois (quoted-printable,
+CRLF); à chaque envoi, seuls les en-têtes du destinataire et les valeurs des
+emplacements sont encodés, sans arbre d'objets du paquet email
+"""
+import base64
+import binascii
+import os
+from email.utils import formataddr, formatdate, make_msgid
+from threading import Lock
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple
+
+from utils.logger import setup_logger
+from utils.templates import CompiledTemplate
+
+logger = setup_logger(__name__)
+
+# Saut de ligne "doux" quoted-printable: supprimé au décodage
+SOFT_BREAK = b"=\r\n"
+
+# Octets bruts par mot encodé RFC 2047 (39 octets -> 52 caractères base64: lignes sous 78 caractères)
+_ENCODED_WORD_BYTES = 39
+
+
+class RawMessage(NamedTuple):
+    """Message prêt pour sendmail(): enveloppe et contenu encodé (CRLF)"""
+    from_addr: str
+    to_addrs: List[str]
+    data: bytes
+
+
+def encode_qp(data: bytes) -> bytes:
+    """
+    Encode en quoted-printable avec des fins de ligne CRLF
+
+    Args:
+        data: Contenu UTF-8 (lignes séparées par \\n)
+
+    Returns:
+        Contenu encodé, lignes de 76 caractères au plus
+    """
+    return binascii.b2a_qp(data.replace(b"\r\n", b"\n")).replace(b"\n", b"\r\n")
+
+
+def encode_header(value: str) -> bytes:
+    """
+    Encode une valeur d'en-tête (RFC 2047 en base64 si elle n'est pas ASCII)
+    Les retours à la ligne sont remplacés par des espaces (pas d'injection d'en-tête)
+
+    Args:
+        value: Valeur de l'en-tête
+
+    Returns:
+        Valeur encodée, repliée sur plusieurs lignes si nécessaire
+    """
+    value = value.replace("\r", " ").replace("\n", " ")
+    if value.isascii():
+        return value.encode('ascii')
+
+    words: List[bytes] = []
+    current = b""
+    for char in value:
+        encoded = char.encode('utf-8')
+        # Un mot encodé ne coupe jamais un caractère multi-octets
+        if len(current) + len(encoded) > _ENCODED_WORD_BYTES:
+            words.append(current)
+            current = b""
+        current += encoded
+    words.append(current)
+    return b"\r\n ".join(b"=?utf-8?b?" + base64.b64encode(word) + b"?=" for word in words)
+
+
+class _EncodedPart:
+    """
+    Partie text/* d'un template: morceaux statiques déjà encodés en quoted-printable
+
+    Chaque valeur insérée est encadrée de sauts de ligne doux: les lignes
+    restent sous 76 caractères quelle que soit la longueur de la valeur.
+    """
+
+    def __init__(self, template: CompiledTemplate, subtype: str, boundary: bytes):
+        self.template = template
+        self.slots = template.slots
+        chunks = [encode_qp(chunk) for chunk in template.chunks]
+        # Saut doux après chaque morceau suivi d'une valeur (sauf fin de ligne réelle)
+        for index in range(len(chunks) - 1):
+            if chunks[index] and not chunks[index].endswith(b"\r\n"):
+                chunks[index] += SOFT_BREAK
+        chunks[0] = (
+            b"--" + boundary + b"\r\n"
+            b"Content-Type: text/" + subtype.encode('ascii') + b"; charset=\"utf-8\"\r\n"
+            b"Content-Transfer-Encoding: quoted-printable\r\n"
+            b"\r\n" + chunks[0]
+        )
+        chunks[-1] += b"\r\n"
+        self.chunks = chunks
+
+    def encode(self, values: Mapping[str, Any]) -> List[bytes]:
+        """Morceaux de la partie avec les valeurs encodées (à joindre)"""
+        encoded = {
+            slot: encode_qp(value.encode('utf-8')) + SOFT_BREAK
+            for slot, value in self.template.slot_values(values).items()
+        }
+        out: List[bytes] = [b""] * (2 * len(self.slots) + 1)
+        out[0::2] = self.chunks
+        out[1::2] = [encoded[slot] for slot in self.slots]
+        return out
+
+
+class MimeSkeleton:
+    """
+    Squelette multipart/alternative (text/plain puis text/html) d'un couple de templates
+
+    Tout ce qui ne dépend pas du destinataire est encodé à la construction:
+    en-têtes From/MIME-Version/Content-Type, en-têtes des parties, morceaux
+    statiques des templates et délimiteurs.
+    """
+
+    def __init__(self, html_template: CompiledTemplate, text_template: CompiledTemplate, from_header: bytes):
+        """
+        Args:
+            html_template: Template HTML compilé
+            text_template: Alternative texte compilée
+            from_header: Valeur encodée de l'en-tête From
+        """
+        self.html_template = html_template
+        self.text_template = text_template
+        # "=_" ne peut pas apparaître dans un contenu quoted-printable (toujours encodé en =3D)
+        boundary = b"=_" + binascii.hexlify(os.urandom(12))
+        self._headers = (
+            b"From: " + from_header + b"\r\n"
+            b"MIME-Version: 1.0\r\n"
+            b"Content-Type: multipart/alternative; boundary=\"" + boundary + b"\"\r\n"
+            b"\r\n"
+        )
+        self._parts = (
+            _EncodedPart(text_template, "plain", boundary),
+            _EncodedPart(html_template, "html", boundary)
+        )
+        self._closing = b"--" + boundary + b"--\r\n"
+
+    def build(self, to_email: str, subject: str, values: Mapping[str, Any], message_id_domain: str) -> bytes:
+        """
+        Assemble le message d'un destinataire
+
+        Args:
+            to_email: Adresse du destinataire (ASCII)
+            subject: Sujet du mail
+            values: Valeurs des emplacements des templates
+            message_id_domain: Domaine du Message-ID
+
+        Returns:
+            Message complet (en-têtes et corps, CRLF)
+        """
+        out = [
+            b"To: " + encode_header(to_email) + b"\r\n"
+            b"Subject: " + encode_header(subject) + b"\r\n"
+            b"Date: " + formatdate(localtime=True).encode('ascii') + b"\r\n"
+            b"Message-ID: " + make_msgid(domain=message_id_domain).encode('ascii') + b"\r\n",
+            self._headers
+        ]
+        for part in self._parts:
+            out.extend(part.encode(values))
+        out.append(self._closing)
+        return b"".join(out)
+
+
+class MimeBuilder:
+    """
+    Construit des messages à partir de squelettes mis en cache par template
+
+    Un squelette est recompilé quand le registre de templates retourne une
+    nouvelle version (rechargement à chaud).
+    """
+
+    def __init__(self, from_email: str, from_name: str = ""):
+        """
+        Args:
+            from_email: Adresse de l'expéditeur (enveloppe et en-tête From)
+            from_name: Nom affiché de l'expéditeur
+        """
+        self.from_email = from_email
+        self._from_header = formataddr((from_name, from_email), charset='utf-8').encode('ascii')
+        self._domain = from_email.rpartition('@')[2] or None
+        # (template HTML, template texte) -> squelette de la version courante
+        self._skeletons: Dict[Tuple[str, str], MimeSkeleton] = {}
+        self._lock = Lock()
+        self._built = 0
+        self._compiled = 0
+
+    def build(self, to_email: str, subject: str, html_template: CompiledTemplate,
+              text_template: CompiledTemplate, values: Mapping[str, Any]) -> RawMessage:
+        """
+        Assemble un message multipart/alternative pour un destinataire
+
+        Args:
+            to_email: Adresse du destinataire (ASCII)
+            subject: Sujet du mail
+            html_template: Template HTML compilé
+            text_template: Alternative texte compilée
+            values: Valeurs des emplacements
+
+        Returns:
+            Message prêt pour sendmail()
+        """
+        skeleton = self._skeleton(html_template, text_template)
+        data = skeleton.build(to_email, subject, values, self._domain)
+        with self._lock:
+            self._built += 1
+        return RawMessage(self.from_email, [to_email], data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du cache de squelettes
+
+        Returns:
+            Dictionnaire avec squelettes en cache, compilations et messages construits
+        """
+        return {
+            "skeletons": len(self._skeletons),
+            "compiled": self._compiled,
+            "built": self._built
+        }
+
+    def _skeleton(self, html_template: CompiledTemplate, text_template: CompiledTemplate) -> MimeSkeleton:
+        """Squelette du couple de templates (compilé à la première utilisation de chaque version)"""
+        key = (html_template.name, text_template.name)
+        skeleton = self._skeletons.get(key)
+        if skeleton is not None and skeleton.html_template is html_template \
+                and skeleton.text_template is text_template:
+            return skeleton
+
+        skeleton = MimeSkeleton(html_template, text_template, self._from_header)
+        with self._lock:
+            self._skeletons[key] = skeleton
+            self._compiled += 1
+        logger.debug(f"MIME skeleton compiled: {html_template.name}")
+        return skeleton
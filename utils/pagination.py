@@ -0,0 +1,95 @@
+"""
+Curseurs opaques pour la pagination par clé (keyset) sur created_at
+Le curseur encode la position du dernier document renvoyé:
+(created_at, id du document), en base64 url-safe
+"""
+import json
+import base64
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+
+def encode_cursor(created_at: datetime, doc_id: str) -> str:
+    """
+    Encode la position d'un document en curseur opaque
+
+    Args:
+        created_at: Horodatage serveur du document
+        doc_id: Identifiant du document
+
+    Returns:
+        Curseur base64 url-safe
+    """
+    payload = json.dumps({"t": created_at.isoformat(), "id": doc_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Décode un curseur opaque
+
+    Args:
+        cursor: Curseur renvoyé par une page précédente
+
+    Returns:
+        (created_at, id du document)
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['t']), str(payload['id'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def sortable_timestamp(value: datetime) -> str:
+    """
+    Formate un horodatage UTC à largeur fixe (microsecondes incluses):
+    l'ordre lexical des chaînes suit l'ordre chronologique
+
+    Args:
+        value: datetime (naïf = UTC)
+
+    Returns:
+        Chaîne ISO 8601 triable
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def serialize_document(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convertit les valeurs Firestore (horodatages) en types JSON
+
+    Args:
+        data: Données brutes du document
+
+    Returns:
+        Dictionnaire sérialisable en JSON
+    """
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in data.items()
+    }
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse une date ISO 8601 (accepte le suffixe Z)
+
+    Args:
+        value: Date au format ISO ou None
+
+    Returns:
+        datetime ou None
+
+    Raises:
+        ValueError: Si le format est invalide
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
@@ -4,10 +4,20 @@ Gère l'initialisation et le cycle de vie des services
 Support multi-providers: SendGrid/SMTP pour emails, Twilio/AWS SNS pour SMS
 """
 import os
-from typing import Optional, Union
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Union, Callable, Any, Dict
 from threading import Lock
 
+from config.constants import Config
 from utils.logger import setup_logger
+from utils.shared_cache import SharedCache
+from utils.health_prober import HealthProber
+from utils.http_transport import http_transport
+from utils.sms_encoding import sms_stats
+from utils.templates import templates
+from services.stats_counters import build_stats
 
 logger = setup_logger(__name__)
 
@@ -36,6 +46,25 @@ class ServiceManager:
         self._email_service: Optional[Union[SendGridEmailService, SMTPEmailService]] = None
         self._sms_service: Optional[Union[SMSService, AWSSNSService]] = None
         self._db_service = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
+        # Cache des statistiques de la base, partagé entre les workers de l'hôte
+        self._stats_cache = SharedCache(
+            path=os.getenv('STATS_CACHE_PATH', Config.STATS_CACHE_PATH),
+            ttl=float(os.getenv('STATS_CACHE_TTL', Config.STATS_CACHE_TTL)),
+            max_stale=float(os.getenv('STATS_CACHE_MAX_STALE', Config.STATS_CACHE_MAX_STALE))
+        )
+        
+        # Tests de santé en arrière-plan (démarrés avec l'application)
+        self._health_prober = HealthProber(
+            targets=self._initialized_services,
+            run_blocking=self.run_blocking,
+            intervals={
+                "email": float(os.getenv('HEALTH_PROBE_INTERVAL_EMAIL', Config.HEALTH_PROBE_INTERVAL_EMAIL)),
+                "sms": float(os.getenv('HEALTH_PROBE_INTERVAL_SMS', Config.HEALTH_PROBE_INTERVAL_SMS))
+            },
+            timeout=float(os.getenv('HEALTH_PROBE_TIMEOUT', Config.HEALTH_PROBE_TIMEOUT))
+        )
         
         # Lire les providers depuis .env
         self._email_provider = os.getenv('EMAIL_PROVIDER', 'sendgrid').lower()
@@ -65,19 +94,56 @@ class ServiceManager:
             with self._lock:
                 if self._email_service is None:
                     try:
-                        if self._email_provider == 'smtp':
-                            from services.smtp_email_service import SMTPEmailService
-                            self._email_service = SMTPEmailService()
-                            logger.info("Email service initialized: SMTP")
+                        if os.getenv('EMAIL_FAILOVER_ENABLED', str(Config.EMAIL_FAILOVER_ENABLED)).lower() == 'true':
+                            self._email_service = self._create_failover_email_service()
+                        elif self._email_provider == 'smtp':
+                            self._email_service = self._create_email_provider('smtp')
                         else:
-                            from services.sendgrid_email_service import SendGridEmailService
-                            self._email_service = SendGridEmailService()
-                            logger.info("Email service initialized: SendGrid")
+                            self._email_service = self._create_email_provider('sendgrid')
                     except Exception as e:
                         logger.error(f"Failed to initialize email service ({self._email_provider}): {e}")
                         raise
         return self._email_service
     
+    @staticmethod
+    def _create_email_provider(provider: str):
+        """Crée le service d'un provider e-mail ("sendgrid" ou "smtp")"""
+        if provider == 'smtp':
+            from services.smtp_email_service import SMTPEmailService
+            service = SMTPEmailService()
+            logger.info("Email service initialized: SMTP")
+        else:
+            from services.sendgrid_email_service import SendGridEmailService
+            service = SendGridEmailService()
+            logger.info("Email service initialized: SendGrid")
+        return service
+    
+    def _create_failover_email_service(self):
+        """
+        Crée le service composite: EMAIL_PROVIDER en premier, l'autre provider
+        en secours s'il est configuré (identifiants présents)
+        """
+        from services.failover_email_service import FailoverEmailService
+        
+        order = [self._email_provider] + [p for p in ('sendgrid', 'smtp') if p != self._email_provider]
+        services = []
+        for provider in order:
+            try:
+                services.append((provider, self._create_email_provider(provider)))
+            except Exception as e:
+                if provider == self._email_provider:
+                    raise
+                logger.warning(f"Backup email provider {provider} unavailable: {e}")
+        
+        # Providers sans identifiants écartés (le principal est gardé si aucun n'est configuré)
+        providers = [(name, service) for name, service in services if getattr(service, 'enabled', True)]
+        if not providers:
+            providers = services[:1]
+        for name, service in services:
+            if (name, service) not in providers and hasattr(service, 'close'):
+                service.close()
+        return FailoverEmailService(providers, run_blocking=self.run_blocking)
+    
     @property
     def sms_service(self):
         """
@@ -123,32 +189,158 @@ class ServiceManager:
                         raise
         return self._db_service
     
-    def health_check(self) -> dict:
+    @property
+    def executor(self) -> ThreadPoolExecutor:
         """
-        Vérifie la santé de tous les services initialisés
+        Retourne le pool de threads borné pour les appels bloquants (initialisation paresseuse)
         
         Returns:
-            Dictionnaire avec le statut de chaque service
+            Instance de ThreadPoolExecutor (taille: SEND_EXECUTOR_WORKERS)
         """
-        health_status = {
-            "email": False,
-            "sms": False,
-            "database": False
-        }
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = int(os.getenv('SEND_EXECUTOR_WORKERS', Config.SEND_EXECUTOR_WORKERS))
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="send")
+                    logger.info(f"Blocking call executor initialized ({workers} threads)")
+        return self._executor
+    
+    async def run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Exécute un appel bloquant dans le pool de threads sans geler la boucle d'événements
         
-        # Vérifier email (si initialisé)
-        if self._email_service is not None:
+        Args:
+            func: Fonction bloquante à exécuter
+            *args, **kwargs: Arguments de la fonction
+            
+        Returns:
+            Résultat de la fonction
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    async def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Appelle une méthode de service, qu'elle soit native async ou bloquante
+        Les coroutines sont attendues directement, les appels bloquants passent par le pool
+        
+        Args:
+            func: Méthode à appeler
+            *args, **kwargs: Arguments de la méthode
+            
+        Returns:
+            Résultat de la méthode
+        """
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        return await self.run_blocking(func, *args, **kwargs)
+    
+    async def call_service(self, service_name: str, method: str, *args, **kwargs) -> Any:
+        """
+        Appelle une méthode d'envoi du service email ou SMS
+        La variante "<method>_async" est attendue directement si le service
+        la propose; sinon la méthode bloquante passe par le pool de threads
+        
+        Args:
+            service_name: "email" ou "sms"
+            method: Nom de la méthode synchrone (ex: send_confirmation_email)
+            *args, **kwargs: Arguments de la méthode
+            
+        Returns:
+            Résultat de la méthode
+        """
+        service = getattr(self, f"_{service_name}_service")
+        if service is None:
+            # Première utilisation: initialisation du SDK hors de la boucle
+            service = await self.run_blocking(getattr, self, f"{service_name}_service")
+        func = getattr(service, f"{method}_async", None) or getattr(service, method)
+        return await self.call(func, *args, **kwargs)
+    
+    async def warm_dedupe_index(self) -> int:
+        """
+        Préchauffe l'index de déduplication local du service de base de données
+        
+        Returns:
+            Nombre d'IDs chargés (0 si non supporté)
+        """
+        try:
+            db_service = self.db_service
+            if hasattr(db_service, 'warm_dedupe_index'):
+                return await self.call(db_service.warm_dedupe_index)
+        except Exception as e:
+            logger.error(f"Dedupe index warm-up failed: {e}")
+        return 0
+    
+    async def reconcile_stats_counters(self) -> Optional[Dict]:
+        """
+        Corrige la dérive des compteurs de statistiques du service de base de données
+        
+        Returns:
+            Correction appliquée, ou None si non supporté / reportée / en erreur
+        """
+        try:
+            db_service = self.db_service
+            if hasattr(db_service, 'reconcile_counters'):
+                return await self.call(db_service.reconcile_counters)
+        except Exception as e:
+            logger.error(f"Stats counters reconciliation failed: {e}")
+        return None
+    
+    def shutdown(self):
+        """
+        Libère les ressources partagées (écritures en attente, pool de threads)
+        """
+        if self._db_service is not None and hasattr(self._db_service, 'close'):
+            try:
+                self._db_service.close()
+            except Exception as e:
+                logger.error(f"Failed to close database service: {e}")
+        
+        if self._email_service is not None and hasattr(self._email_service, 'close'):
             try:
-                health_status["email"] = self._email_service.test_connection()
+                self._email_service.close()
             except Exception as e:
-                logger.warning(f"Email service health check failed: {e}")
+                logger.error(f"Failed to close email service: {e}")
         
-        # Vérifier SMS (si initialisé)
-        if self._sms_service is not None:
+        if self._sms_service is not None and hasattr(self._sms_service, 'close'):
             try:
-                health_status["sms"] = self._sms_service.test_connection()
+                self._sms_service.close()
             except Exception as e:
-                logger.warning(f"SMS service health check failed: {e}")
+                logger.error(f"Failed to close SMS service: {e}")
+        
+        self._stats_cache.close()
+        
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    def _initialized_services(self) -> Dict[str, Any]:
+        """Services déjà initialisés, à tester par le vérificateur de santé"""
+        services = {"email": self._email_service, "sms": self._sms_service}
+        return {name: service for name, service in services.items() if service is not None}
+    
+    def start_health_prober(self):
+        """Démarre les tests de santé en arrière-plan (boucle de l'application)"""
+        self._health_prober.start()
+    
+    async def stop_health_prober(self):
+        """Arrête les tests de santé en arrière-plan"""
+        await self._health_prober.stop()
+    
+    def health_check(self) -> dict:
+        """
+        Retourne la santé des services initialisés (derniers tests en arrière-plan)
+        Lecture en mémoire uniquement: aucun appel aux providers
+        
+        Returns:
+            Dictionnaire avec le statut de chaque service
+        """
+        health_status = {
+            "email": self._health_prober.healthy("email"),
+            "sms": self._health_prober.healthy("sms"),
+            "database": False
+        }
         
         # Base de données toujours disponible (Firestore)
         health_status["database"] = True
@@ -165,9 +357,36 @@ class ServiceManager:
             self._db_service = None
             logger.info("All services reset")
     
-    def get_stats(self) -> dict:
+    async def _compute_database_stats(self) -> dict:
+        """
+        Calcule les statistiques de la base (rafraîchissement du cache partagé)
+        Un résultat en erreur lève une exception pour ne pas être mis en cache
+        """
+        database_stats = await self.call(self._db_service.get_stats)
+        if database_stats.get("error"):
+            raise RuntimeError(database_stats["error"])
+        return database_stats
+    
+    async def _read_counter_stats(self) -> Optional[dict]:
+        """
+        Statistiques de la base lues dans les compteurs shardés (sans cache)
+        
+        Returns:
+            Statistiques, ou None si le backend n'a pas de compteurs (ou illisibles)
+        """
+        if not hasattr(self._db_service, 'read_counters'):
+            return None
+        try:
+            counts = await self.call(self._db_service.read_counters)
+        except Exception as e:
+            logger.error(f"Failed to read stats counters (using cached count()): {e}")
+            return None
+        return build_stats(counts) if counts is not None else None
+    
+    async def get_stats(self) -> dict:
         """
         Récupère les statistiques de tous les services
+        Les statistiques de la base sont calculées hors de la boucle d'événements
         
         Returns:
             Dictionnaire avec les statistiques
@@ -184,13 +403,65 @@ class ServiceManager:
             }
         }
         
-        # Stats de la base de données
+        # Stats de la base: compteurs maintenus à l'écriture lus directement (toujours
+        # à jour); sinon agrégations coûteuses derrière le cache partagé entre workers
         if self._db_service is not None:
             try:
-                stats["database"] = self.db_service.get_stats()
+                stats["database"] = await self._read_counter_stats()
+                if stats["database"] is None:
+                    stats["database"] = await self._stats_cache.get(self._compute_database_stats)
             except Exception as e:
                 logger.error(f"Failed to get database stats: {e}")
                 stats["database"] = {"error": str(e)}
+            stats["stats_cache"] = self._stats_cache.get_stats()
+            
+            # Compteurs de l'index de déduplication local
+            if hasattr(self._db_service, 'get_dedupe_stats'):
+                stats["dedupe"] = self._db_service.get_dedupe_stats()
+            
+            # Regroupement des écritures
+            if hasattr(self._db_service, 'get_writer_stats'):
+                stats["writer"] = self._db_service.get_writer_stats()
+            
+            # État du stockage local (segments, compactions)
+            if hasattr(self._db_service, 'get_storage_stats'):
+                stats["storage"] = self._db_service.get_storage_stats()
+            
+            # Écritures Firestore en attente de rejeu (panne)
+            if hasattr(self._db_service, 'get_spool_stats'):
+                stats["spool"] = self._db_service.get_spool_stats()
+        
+        # Réutilisation des sessions SMTP
+        if self._email_service is not None and hasattr(self._email_service, 'get_pool_stats'):
+            stats["smtp_pool"] = self._email_service.get_pool_stats()
+        
+        # Transport HTTP async partagé (SendGrid, Twilio)
+        stats["http_transport"] = http_transport.get_stats()
+        
+        # Templates d'e-mails compilés
+        stats["templates"] = templates.get_stats()
+        
+        # Encodage et segments facturés des SMS envoyés
+        stats["sms_segments"] = sms_stats.get_stats()
+        
+        # Débit et attente par expéditeur SMS
+        if self._sms_service is not None and hasattr(self._sms_service, 'get_dispatch_stats'):
+            stats["sms_dispatch"] = self._sms_service.get_dispatch_stats()
+        
+        # Publications SNS parallèles
+        if self._sms_service is not None and hasattr(self._sms_service, 'get_publish_stats'):
+            stats["sms_publish"] = self._sms_service.get_publish_stats()
+        
+        # Regroupement des confirmations SendGrid
+        if self._email_service is not None and hasattr(self._email_service, 'get_batch_stats'):
+            stats["email_batch"] = self._email_service.get_batch_stats()
+        
+        # Derniers tests de santé (date, latence, erreur)
+        stats["health"] = self._health_prober.get_stats()
+        
+        # Disjoncteurs et bascules entre providers e-mail
+        if self._email_service is not None and hasattr(self._email_service, 'get_failover_stats'):
+            stats["email_failover"] = self._email_service.get_failover_stats()
         
         return stats
 
@@ -0,0 +1,264 @@
+"""
+Cache partagé entre les workers uvicorn d'un même hôte (stale-while-revalidate)
+- La valeur est stockée en JSON dans un fichier mappé en mémoire (mmap),
+  protégé par flock pour les lectures/écritures concurrentes
+- Une valeur périmée est servie immédiatement pendant qu'une seule tâche de
+  fond la recalcule: le verrou de rafraîchissement est un flock non bloquant,
+  un seul processus par hôte paie donc le coût du calcul
+- Sans valeur utilisable (démarrage à froid), le calcul est aussi unique:
+  les autres appelants attendent sa publication
+Sans fcntl (Windows), le cache reste local au processus
+"""
+import os
+import json
+import mmap
+import time
+import struct
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# En-tête du fichier: horodatage de mise à jour (float64), taille du JSON (uint32)
+HEADER = struct.Struct('<dI')
+
+# Attente entre deux tentatives sur le verrou de calcul détenu par un autre worker (secondes)
+LOCK_POLL_INTERVAL = 0.05
+
+
+class SharedCache:
+    """
+    Valeur unique mise en cache avec fraîcheur (ttl) et tolérance de péremption (max_stale)
+    
+    - âge < ttl: valeur servie telle quelle
+    - ttl <= âge < ttl + max_stale: valeur servie, rafraîchissement en arrière-plan
+    - au-delà, ou aucune valeur: calcul synchrone, un seul par hôte
+    """
+    
+    def __init__(self, path: str, ttl: float, max_stale: float, size: int = 64 * 1024):
+        """
+        Args:
+            path: Fichier de partage (le verrou de rafraîchissement est path + ".lock")
+            ttl: Durée de fraîcheur (secondes)
+            max_stale: Durée supplémentaire pendant laquelle la valeur périmée est servie
+            size: Taille du fichier mappé (octets)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.size = size
+        
+        self._fd: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._shared = fcntl is not None
+        self._local: Optional[Tuple[float, Any]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._miss_task: Optional[asyncio.Future] = None
+        
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_skipped": 0,
+            "refresh_errors": 0
+        }
+    
+    def _open(self) -> bool:
+        """Ouvre et mappe le fichier partagé (paresseux); False si indisponible"""
+        if not self._shared:
+            return False
+        if self._mmap is not None:
+            return True
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < self.size:
+                    os.ftruncate(fd, self.size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._mmap = mmap.mmap(fd, self.size)
+            self._fd = fd
+            return True
+        except OSError as e:
+            logger.warning(f"Shared cache {self.path} unavailable, using process-local cache: {e}")
+            self._shared = False
+            return False
+    
+    def read(self) -> Optional[Tuple[float, Any]]:
+        """
+        Lit la valeur partagée
+        
+        Returns:
+            (horodatage de mise à jour, valeur) ou None si vide
+        """
+        if not self._open():
+            return self._local
+        
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+        try:
+            updated_at, length = HEADER.unpack_from(self._mmap, 0)
+            if not length:
+                return None
+            payload = self._mmap[HEADER.size:HEADER.size + length]
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        try:
+            return updated_at, json.loads(payload)
+        except ValueError:
+            return None
+    
+    def write(self, value: Any):
+        """
+        Publie une nouvelle valeur pour tous les processus
+        
+        Args:
+            value: Valeur sérialisable en JSON
+        """
+        now = time.time()
+        self._local = (now, value)
+        if not self._open():
+            return
+        
+        payload = json.dumps(value, default=str).encode()
+        if HEADER.size + len(payload) > self.size:
+            logger.warning(f"Shared cache value too large ({len(payload)} bytes), kept process-local")
+            return
+        
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._mmap[HEADER.size:HEADER.size + len(payload)] = payload
+            HEADER.pack_into(self._mmap, 0, now, len(payload))
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    async def get(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Retourne la valeur en cache, en la recalculant si nécessaire
+        
+        Args:
+            compute: Coroutine de calcul de la valeur (doit lever en cas d'échec)
+            
+        Returns:
+            Valeur en cache ou fraîchement calculée
+        """
+        entry = self.read()
+        if entry is not None:
+            updated_at, value = entry
+            age = time.time() - updated_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return value
+            if age < self.ttl + self.max_stale:
+                self.stats["stale_hits"] += 1
+                self._schedule_refresh(compute)
+                return value
+        
+        self.stats["misses"] += 1
+        if self._miss_task is None or self._miss_task.done():
+            self._miss_task = asyncio.ensure_future(self._compute_once(compute))
+        else:
+            # Calcul déjà en cours dans ce processus
+            self.stats["coalesced"] += 1
+        # shield: l'annulation d'un appelant n'interrompt pas le calcul des autres
+        return await asyncio.shield(self._miss_task)
+    
+    async def _compute_once(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Calcul synchrone sous le verrou de rafraîchissement: si un autre worker
+        calcule déjà, attend qu'il libère le verrou et sert la valeur publiée
+        """
+        lock_fd = self._acquire_refresh_lock()
+        waited = lock_fd is None
+        while lock_fd is None:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            lock_fd = self._acquire_refresh_lock()
+        try:
+            if waited:
+                entry = self.read()
+                if entry is not None and time.time() - entry[0] < self.ttl:
+                    self.stats["coalesced"] += 1
+                    return entry[1]
+            value = await compute()
+            self.write(value)
+            return value
+        finally:
+            self._release_refresh_lock(lock_fd)
+    
+    def _acquire_refresh_lock(self) -> Optional[int]:
+        """Prend le verrou de rafraîchissement inter-processus sans attendre"""
+        if not self._open():
+            return -1
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError:
+            os.close(fd)
+            return None
+    
+    def _release_refresh_lock(self, fd: int):
+        """Libère le verrou de rafraîchissement"""
+        if fd >= 0:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+    
+    def _schedule_refresh(self, compute: Callable[[], Awaitable[Any]]):
+        """Lance le rafraîchissement en arrière-plan si aucun autre n'est en cours"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        lock_fd = self._acquire_refresh_lock()
+        if lock_fd is None:
+            # Un autre worker rafraîchit déjà la valeur
+            self.stats["refresh_skipped"] += 1
+            return
+        self._refresh_task = asyncio.create_task(self._refresh(compute, lock_fd))
+    
+    async def _refresh(self, compute: Callable[[], Awaitable[Any]], lock_fd: int):
+        """Recalcule et publie la valeur, verrou de rafraîchissement détenu"""
+        try:
+            # Un autre worker a pu publier entre la lecture et la prise du verrou
+            entry = self.read()
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                return
+            self.write(await compute())
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            self.stats["refresh_errors"] += 1
+            logger.error(f"Shared cache refresh failed: {e}")
+        finally:
+            self._release_refresh_lock(lock_fd)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs du cache et l'âge de la valeur
+        
+        Returns:
+            Dictionnaire de statistiques
+        """
+        entry = self.read()
+        return {
+            **self.stats,
+            "shared": self._shared,
+            "age_seconds": round(time.time() - entry[0], 1) if entry else None
+        }
+    
+    def close(self):
+        """Libère le mapping mémoire"""
+        if self._mmap is not None:
+            self._mmap.close()
+            os.close(self._fd)
+            self._mmap = None
+            self._fd = None
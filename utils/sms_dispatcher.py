@@ -0,0 +1,328 @@
+"""
+Répartition des SMS sur un pool d'expéditeurs au débit autorisé
+Les opérateurs limitent le nombre de segments par seconde de chaque numéro
+(ou Sender ID): chaque expéditeur a un seau à jetons (un jeton par segment),
+et un message en surplus attend son créneau au lieu d'être refusé (429).
+Au-delà de l'attente autorisée, le message part en arrière-plan au débit
+autorisé plutôt que d'être perdu
+"""
+import asyncio
+import queue
+import time
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.constants import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Seau à jetons (rate jetons/s, au plus burst d'avance), en réservation:
+    chaque appel prend le prochain créneau libre et retourne l'attente
+    correspondante (algorithme GCRA, sans thread de remplissage)
+
+    Un envoi de cost jetons part dès le créneau libre et repousse les
+    suivants de cost intervalles: le débit moyen reste rate jetons/s, même
+    pour un coût supérieur à burst
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Jetons (segments) par seconde (0: sans limite)
+            burst: Jetons envoyables immédiatement après une période calme
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self._tat = 0.0  # instant théorique de la prochaine émission (monotonic)
+
+    def next_available(self, now: float) -> float:
+        """Attente avant le prochain créneau libre (secondes)"""
+        return max(0.0, max(self._tat, now) - self.tolerance - now)
+
+    def reserve(self, now: float, cost: int = 1) -> float:
+        """
+        Réserve le prochain créneau
+
+        Args:
+            now: Instant courant (monotonic)
+            cost: Jetons consommés (segments du message)
+
+        Returns:
+            Attente avant l'envoi (secondes)
+        """
+        tat = max(self._tat, now)
+        wait = max(0.0, tat - self.tolerance - now)
+        self._tat = tat + max(1, cost) * self.interval
+        return wait
+
+    def pause(self, now: float, seconds: float):
+        """Repousse les prochains créneaux (expéditeur limité par l'opérateur)"""
+        self._tat = max(self._tat, now + seconds + self.tolerance)
+
+
+class SMSDispatcher:
+    """
+    Pool d'expéditeurs avec un seau à jetons chacun
+
+    Chaque message est attribué à l'expéditeur libre le plus tôt et consomme
+    un jeton par segment facturé; l'appelant attend son créneau (time.sleep
+    ou asyncio.sleep). Un message dont l'attente dépasserait max_wait ne
+    bloque pas la requête: il est confié à la file différée (defer), envoyée
+    en arrière-plan au débit autorisé, ou refusé si drop_on_saturation.
+    """
+
+    def __init__(
+        self,
+        senders: List[str],
+        rate: float = Config.SMS_SENDER_RATE,
+        burst: int = Config.SMS_SENDER_BURST,
+        max_wait: float = Config.SMS_MAX_QUEUE_WAIT,
+        throttle_pause: float = Config.SMS_THROTTLE_PAUSE,
+        drop_on_saturation: bool = Config.SMS_DROP_ON_SATURATION
+    ):
+        """
+        Args:
+            senders: Numéros ou Sender IDs expéditeurs
+            rate: Segments par seconde et par expéditeur (0: sans limite)
+            burst: Segments envoyables immédiatement par expéditeur
+            max_wait: Attente maximale d'un message dans la file (secondes)
+            throttle_pause: Pause d'un expéditeur refusé par l'opérateur (secondes)
+            drop_on_saturation: Refuser les messages au-delà de max_wait
+                                au lieu de les différer
+        """
+        if not senders:
+            raise ValueError("At least one SMS sender is required")
+        self.senders = list(dict.fromkeys(senders))
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.throttle_pause = throttle_pause
+        self.drop_on_saturation = drop_on_saturation
+
+        self._buckets = {sender: TokenBucket(rate, burst) for sender in self.senders}
+        self._lock = Lock()
+        self._stats = {
+            sender: {"dispatched": 0, "segments": 0, "wait_total": 0.0, "wait_max": 0.0, "throttled": 0}
+            for sender in self.senders
+        }
+        self._queued = 0
+        self._queued_max = 0
+        self._rejected = 0
+
+        # File différée: un thread par expéditeur, démarrés au premier message
+        self._deferred: "queue.Queue[Optional[Callable[[], Any]]]" = queue.Queue()
+        self._deferred_threads: List[Thread] = []
+        self._deferred_total = 0
+        self._deferred_failed = 0
+
+    def reserve(self, segments: int = 1, max_wait: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        Attribue le prochain créneau libre parmi les expéditeurs
+
+        Args:
+            segments: Segments facturés du message (jetons consommés)
+            max_wait: Attente acceptée (secondes, défaut: self.max_wait)
+
+        Returns:
+            (expéditeur, attente en secondes), ou None si l'attente dépasse max_wait
+        """
+        limit = self.max_wait if max_wait is None else max_wait
+        with self._lock:
+            now = time.monotonic()
+            sender = min(self.senders, key=lambda s: self._buckets[s].next_available(now))
+            if self._buckets[sender].next_available(now) > limit:
+                return None
+            wait = self._buckets[sender].reserve(now, segments)
+            stats = self._stats[sender]
+            stats["dispatched"] += 1
+            stats["segments"] += segments
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            if wait > 0:
+                self._queued += 1
+                self._queued_max = max(self._queued_max, self._queued)
+            return sender, wait
+
+    def acquire(self, segments: int = 1, max_wait: Optional[float] = None) -> Optional[str]:
+        """
+        Attend le créneau d'envoi (appel bloquant)
+
+        Args:
+            segments: Segments facturés du message
+            max_wait: Attente acceptée (secondes, défaut: self.max_wait)
+
+        Returns:
+            Expéditeur à utiliser, ou None si la file est saturée
+        """
+        slot = self.reserve(segments, max_wait)
+        if slot is None:
+            return None
+        sender, wait = slot
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self.dequeue()
+        return sender
+
+    async def acquire_async(self, segments: int = 1) -> Optional[str]:
+        """
+        Attend le créneau d'envoi sans bloquer la boucle d'événements
+
+        Args:
+            segments: Segments facturés du message
+
+        Returns:
+            Expéditeur à utiliser, ou None si la file est saturée
+        """
+        slot = self.reserve(segments)
+        if slot is None:
+            return None
+        sender, wait = slot
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.dequeue()
+        return sender
+
+    def defer(self, send: Callable[[], Any]) -> bool:
+        """
+        Confie un message saturé à la file différée: un thread d'arrière-plan
+        l'envoie dès que le débit le permet (send attend son créneau sans
+        limite, ex: acquire(segments, max_wait=math.inf))
+
+        Args:
+            send: Envoi complet du message (appel bloquant)
+
+        Returns:
+            True si le message est mis en file, False s'il est refusé
+            (drop_on_saturation)
+        """
+        if self.drop_on_saturation:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"SMS queue saturated (wait > {self.max_wait:g}s on {len(self.senders)} senders), "
+                           f"message dropped")
+            return False
+
+        with self._lock:
+            self._deferred_total += 1
+            if not self._deferred_threads:
+                for index, _ in enumerate(self.senders):
+                    thread = Thread(target=self._deferred_worker, name=f"sms-deferred-{index}", daemon=True)
+                    thread.start()
+                    self._deferred_threads.append(thread)
+        self._deferred.put(send)
+        logger.info(f"SMS queue saturated (wait > {self.max_wait:g}s), message deferred "
+                    f"({self._deferred.qsize()} pending)")
+        return True
+
+    def _deferred_worker(self):
+        """Envoie les messages différés, un à la fois par thread"""
+        while True:
+            send = self._deferred.get()
+            try:
+                if send is None:
+                    return
+                if send() is False:
+                    with self._lock:
+                        self._deferred_failed += 1
+            except Exception as e:
+                with self._lock:
+                    self._deferred_failed += 1
+                logger.error(f"Deferred SMS failed: {str(e)}")
+            finally:
+                self._deferred.task_done()
+
+    def close(self, timeout: float = Config.SMS_DEFERRED_DRAIN_TIMEOUT) -> int:
+        """
+        Attend l'envoi des messages différés puis arrête les threads
+        (arrêt de l'application)
+
+        Args:
+            timeout: Attente maximale (secondes)
+
+        Returns:
+            Nombre de messages différés non envoyés
+        """
+        deadline = time.monotonic() + timeout
+        while self._deferred.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        pending = self._deferred.unfinished_tasks
+        if pending:
+            logger.error(f"SMS dispatcher closed with {pending} deferred messages not sent")
+        for _ in self._deferred_threads:
+            self._deferred.put(None)
+        self._deferred_threads = []
+        return pending
+
+    def throttled(self, sender: str):
+        """
+        Signale un refus pour dépassement de débit (HTTP 429, Throttling):
+        l'expéditeur est mis en pause, les messages suivants vont aux autres
+
+        Args:
+            sender: Expéditeur refusé
+        """
+        with self._lock:
+            self._buckets[sender].pause(time.monotonic(), self.throttle_pause)
+            self._stats[sender]["throttled"] += 1
+        logger.warning(f"SMS sender {sender} throttled, paused {self.throttle_pause:g}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne le débit et l'attente par expéditeur
+
+        Returns:
+            Dictionnaire avec file d'attente, refus et statistiques par expéditeur
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "rate_per_sender": self.rate,
+                "burst": self.burst,
+                "queued": self._queued,
+                "queued_max": self._queued_max,
+                "rejected": self._rejected,
+                "deferred": self._deferred_total,
+                "deferred_pending": self._deferred.unfinished_tasks,
+                "deferred_failed": self._deferred_failed,
+                "senders": {
+                    sender: {
+                        "dispatched": stats["dispatched"],
+                        "segments": stats["segments"],
+                        "avg_wait_ms": round(stats["wait_total"] / stats["dispatched"] * 1000, 1) if stats["dispatched"] else 0,
+                        "max_wait_ms": round(stats["wait_max"] * 1000, 1),
+                        "throttled": stats["throttled"],
+                        "next_slot_ms": round(self._buckets[sender].next_available(now) * 1000, 1)
+                    }
+                    for sender, stats in self._stats.items()
+                }
+            }
+
+    def dequeue(self):
+        """Un message en attente part (après reserve avec une attente non nulle)"""
+        with self._lock:
+            self._queued -= 1
+
+
+def parse_senders(value: Optional[str], fallback: Optional[str] = None) -> List[str]:
+    """
+    Liste d'expéditeurs d'une variable d'environnement (séparés par des virgules)
+
+    Args:
+        value: Valeur de la variable (ex: "+15550001,+15550002")
+        fallback: Expéditeur unique si la liste est vide
+
+    Returns:
+        Liste des expéditeurs
+    """
+    senders = [sender.strip() for sender in (value or "").split(",") if sender.strip()]
+    if not senders and fallback:
+        senders = [fallback]
+    return senders
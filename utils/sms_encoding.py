@@ -0,0 +1,218 @@
+"""
+Encodage et segmentation des SMS (GSM 03.38 / UCS-2)
+Un seul caractère hors de l'alphabet GSM-7 (ç, ê, emoji...) fait passer tout
+le message en UCS-2: 70 caractères par SMS au lieu de 160. Ce module calcule
+l'encodage réel et le nombre de segments facturés, translittère en GSM-7 si
+configuré et tronque le message sur une limite de segments
+"""
+import re
+import unicodedata
+from threading import Lock
+from typing import Any, Dict, NamedTuple
+
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+
+# Alphabet GSM 03.38 (1 septet par caractère)
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Table d'extension (caractère d'échappement + caractère: 2 septets)
+GSM7_EXTENDED = frozenset("^{}\\[]~|€\f")
+
+# Capacité d'un segment (unités: septets GSM-7, unités UTF-16 en UCS-2)
+# Un message de plusieurs segments perd de la place pour l'en-tête de concaténation (UDH)
+SEGMENT_CAPACITY = {
+    GSM7: (160, 153),
+    UCS2: (70, 67)
+}
+
+TRUNCATION_MARK = "..."
+
+_SPACES = re.compile(r" {2,}")
+
+# Équivalents GSM-7 des caractères courants en français (le reste: décomposition Unicode)
+_TRANSLITERATIONS = str.maketrans({
+    "ç": "c", "â": "a", "ê": "e", "î": "i", "ô": "o", "û": "u", "ë": "e", "ï": "i", "ÿ": "y",
+    "á": "a", "í": "i", "ó": "o", "ú": "u", "À": "A", "Â": "A", "È": "E", "Ê": "E", "Ë": "E",
+    "Î": "I", "Ï": "I", "Ô": "O", "Û": "U", "Ù": "U", "Œ": "OE", "œ": "oe",
+    "‘": "'", "’": "'", "“": '"', "”": '"', "«": '"', "»": '"',
+    "–": "-", "—": "-", "…": "...", "\u00a0": " ", "\u202f": " ", "•": "-"
+})
+
+
+class SmsInfo(NamedTuple):
+    """Encodage d'un message et segments facturés"""
+    encoding: str
+    units: int  # septets (GSM-7) ou unités UTF-16 (UCS-2)
+    segments: int
+
+
+def is_gsm7(text: str) -> bool:
+    """Vrai si tout le texte s'encode en GSM-7 (alphabet de base ou extension)"""
+    return all(char in GSM7_BASIC or char in GSM7_EXTENDED for char in text)
+
+
+def _unit_sizes(text: str, encoding: str):
+    """Taille de chaque caractère dans l'encodage (septets ou unités UTF-16)"""
+    if encoding == GSM7:
+        return [2 if char in GSM7_EXTENDED else 1 for char in text]
+    return [2 if ord(char) > 0xFFFF else 1 for char in text]
+
+
+def analyze(text: str) -> SmsInfo:
+    """
+    Calcule l'encodage et le nombre de segments d'un message
+
+    Un caractère (séquence d'échappement GSM-7, paire de substitution UCS-2)
+    n'est jamais coupé entre deux segments.
+
+    Args:
+        text: Contenu du SMS
+
+    Returns:
+        SmsInfo (encodage, unités, segments)
+    """
+    encoding = GSM7 if is_gsm7(text) else UCS2
+    sizes = _unit_sizes(text, encoding)
+    units = sum(sizes)
+    single, multi = SEGMENT_CAPACITY[encoding]
+    if units <= single:
+        return SmsInfo(encoding, units, 1 if text else 0)
+
+    segments, used = 1, 0
+    for size in sizes:
+        if used + size > multi:
+            segments += 1
+            used = 0
+        used += size
+    return SmsInfo(encoding, units, segments)
+
+
+def transliterate(text: str) -> str:
+    """
+    Remplace les caractères hors GSM-7 par un équivalent (ç -> c, œ -> oe, ’ -> ')
+    Les accents sans équivalent sont retirés, les symboles (emoji) supprimés
+
+    Args:
+        text: Contenu du SMS
+
+    Returns:
+        Texte encodable en GSM-7
+    """
+    text = text.translate(_TRANSLITERATIONS)
+    if is_gsm7(text):
+        return text
+
+    out = []
+    for char in text:
+        if char in GSM7_BASIC or char in GSM7_EXTENDED:
+            out.append(char)
+            continue
+        base = "".join(c for c in unicodedata.normalize("NFKD", char) if c in GSM7_BASIC)
+        if base:
+            out.append(base)
+        elif not unicodedata.category(char).startswith(("S", "M", "C")):
+            # Lettre ou ponctuation sans équivalent
+            out.append("?")
+    # Symboles retirés: pas d'espaces doublés ni en tête
+    return _SPACES.sub(" ", "".join(out)).strip(" ")
+
+
+def fit(text: str, max_segments: int) -> str:
+    """
+    Tronque un message pour qu'il tienne en max_segments segments
+    (marque "..." comprise, coupure sur une limite de caractère)
+
+    Args:
+        text: Contenu du SMS
+        max_segments: Nombre maximum de segments
+
+    Returns:
+        Message inchangé s'il tient, sinon tronqué
+    """
+    info = analyze(text)
+    if info.segments <= max_segments:
+        return text
+
+    single, multi = SEGMENT_CAPACITY[info.encoding]
+    capacity = single if max_segments <= 1 else multi * max_segments
+    # Première estimation par la capacité, puis ajustement aux limites de segments
+    sizes = _unit_sizes(text, info.encoding)
+    budget = capacity - len(TRUNCATION_MARK)
+    cut = 0
+    while cut < len(text) and budget - sizes[cut] >= 0:
+        budget -= sizes[cut]
+        cut += 1
+    while cut > 0:
+        candidate = text[:cut].rstrip() + TRUNCATION_MARK
+        if analyze(candidate).segments <= max_segments:
+            return candidate
+        cut -= 1
+    return TRUNCATION_MARK
+
+
+class SmsEncodingStats:
+    """Compteurs des messages préparés: encodage, segments, translittérations, troncatures"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._messages = 0
+        self._segments = 0
+        self._by_encoding = {GSM7: 0, UCS2: 0}
+        self._segments_histogram: Dict[int, int] = {}
+        self._transliterated = 0
+        self._truncated = 0
+
+    def record(self, info: SmsInfo, transliterated: bool, truncated: bool):
+        """Comptabilise un message prêt à l'envoi"""
+        with self._lock:
+            self._messages += 1
+            self._segments += info.segments
+            self._by_encoding[info.encoding] += 1
+            self._segments_histogram[info.segments] = self._segments_histogram.get(info.segments, 0) + 1
+            self._transliterated += transliterated
+            self._truncated += truncated
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques de segmentation
+
+        Returns:
+            Dictionnaire avec messages, segments (total, moyenne, répartition) et encodages
+        """
+        with self._lock:
+            return {
+                "messages": self._messages,
+                "segments": self._segments,
+                "avg_segments": round(self._segments / self._messages, 2) if self._messages else 0,
+                "segments_per_message": {str(k): v for k, v in sorted(self._segments_histogram.items())},
+                "encodings": dict(self._by_encoding),
+                "transliterated": self._transliterated,
+                "truncated": self._truncated
+            }
+
+
+def prepare_sms(text: str, max_segments: int, gsm_transliterate: bool = False) -> str:
+    """
+    Prépare un SMS pour l'envoi: translittération GSM-7 (optionnelle),
+    troncature à max_segments et comptabilisation des segments
+
+    Args:
+        text: Contenu du SMS
+        max_segments: Nombre maximum de segments facturés
+        gsm_transliterate: Remplacer les caractères hors GSM-7
+
+    Returns:
+        Contenu à envoyer
+    """
+    prepared = transliterate(text) if gsm_transliterate else text
+    transliterated = prepared != text
+    fitted = fit(prepared, max_segments)
+    sms_stats.record(analyze(fitted), transliterated, fitted != prepared)
+    return fitted
+
+
+# Instance globale partagée par les services SMS
+sms_stats = SmsEncodingStats()
@@ -0,0 +1,362 @@
+"""
+Pool de sessions SMTP authentifiées réutilisées entre les envois
+Évite le handshake TLS et le login() à chaque e-mail; les sessions inactives
+sont maintenues par NOOP puis fermées après un délai d'inactivité
+"""
+import copy
+import re
+import smtplib
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.message import Message
+from email.utils import getaddresses
+from threading import BoundedSemaphore, Event, Lock, Thread
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+from weakref import WeakKeyDictionary
+
+from config.constants import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar('T')
+
+_LEADING_DOT = re.compile(br'(?m)^\.')
+
+
+def deliver(server: smtplib.SMTP, message: Message) -> Dict[str, Tuple[int, bytes]]:
+    """
+    Envoie un message sur une session ouverte
+    Avec ESMTP PIPELINING (RFC 2920), MAIL FROM, RCPT TO et DATA partent en
+    un seul envoi réseau: deux allers-retours par message au lieu de 3 + N
+    Sans PIPELINING, délègue à send_message()
+
+    Args:
+        server: Session SMTP authentifiée
+        message: Message à envoyer (From/To/Cc/Bcc définissent l'enveloppe)
+
+    Returns:
+        Destinataires refusés (adresse -> (code, réponse)), comme sendmail()
+
+    Raises:
+        SMTPSenderRefused, SMTPRecipientsRefused, SMTPDataError: refus du serveur
+        (la session est réinitialisée par RSET et reste utilisable)
+    """
+    server.ehlo_or_helo_if_needed()
+    if not server.has_extn('pipelining'):
+        return server.send_message(message)
+
+    from_addr = getaddresses([message['Sender'] or message['From']])[0][1]
+    to_addrs = [addr for _, addr in getaddresses(
+        [value for field in ('To', 'Cc', 'Bcc') for value in message.get_all(field, [])]
+    )]
+    if 'Bcc' in message:
+        # Destinataires cachés: dans l'enveloppe, pas dans les en-têtes
+        message = copy.copy(message)
+        del message['Bcc']
+    data = message.as_bytes(policy=message.policy.clone(linesep='\r\n'))
+    return _pipelined_send(server, from_addr, to_addrs, data)
+
+
+def deliver_raw(server: smtplib.SMTP, from_addr: str, to_addrs: List[str],
+                data: bytes) -> Dict[str, Tuple[int, bytes]]:
+    """
+    Envoie un message déjà encodé (voir deliver); sans PIPELINING, délègue à sendmail()
+
+    Args:
+        server: Session SMTP authentifiée
+        from_addr: Expéditeur de l'enveloppe
+        to_addrs: Destinataires de l'enveloppe
+        data: Message complet (en-têtes et corps, CRLF)
+
+    Returns:
+        Destinataires refusés (adresse -> (code, réponse))
+    """
+    server.ehlo_or_helo_if_needed()
+    if not server.has_extn('pipelining'):
+        return server.sendmail(from_addr, to_addrs, data)
+    return _pipelined_send(server, from_addr, to_addrs, data)
+
+
+def _pipelined_send(server: smtplib.SMTP, from_addr: str, to_addrs: List[str],
+                    data: bytes) -> Dict[str, Tuple[int, bytes]]:
+    """Transaction MAIL/RCPT/DATA en un seul envoi réseau (PIPELINING annoncé)"""
+    commands = [f"MAIL FROM:<{from_addr}>"] + [f"RCPT TO:<{addr}>" for addr in to_addrs] + ["DATA"]
+    server.send("".join(command + "\r\n" for command in commands))
+    replies = [server.getreply() for _ in commands]
+
+    mail_reply, rcpt_replies, data_reply = replies[0], replies[1:-1], replies[-1]
+    refused = {addr: reply for addr, reply in zip(to_addrs, rcpt_replies) if reply[0] not in (250, 251)}
+
+    if data_reply[0] == 354 and (mail_reply[0] != 250 or len(refused) == len(to_addrs)):
+        # Serveur prêt à recevoir malgré le refus: terminer un DATA vide
+        server.send(b".\r\n")
+        server.getreply()
+        data_reply = (554, b"No valid recipients")
+
+    if mail_reply[0] != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_addr)
+    if len(refused) == len(to_addrs):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    if data_reply[0] != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(*data_reply)
+
+    payload = _LEADING_DOT.sub(b'..', data)
+    if not payload.endswith(b"\r\n"):
+        payload += b"\r\n"
+    server.send(payload + b".\r\n")
+    code, response = server.getreply()
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, response)
+    return refused
+
+
+class SMTPConnectionPool:
+    """
+    Pool borné de connexions SMTP
+
+    Une session empruntée est vérifiée par NOOP si elle est restée inactive
+    plus de keepalive_interval; une session coupée par le serveur
+    (SMTPServerDisconnected) est remplacée et l'opération rejouée une fois.
+    Un thread de maintenance envoie les NOOP et ferme les sessions inactives
+    depuis plus de idle_timeout.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], smtplib.SMTP],
+        size: int = Config.SMTP_POOL_SIZE,
+        idle_timeout: float = Config.SMTP_POOL_IDLE_TIMEOUT,
+        keepalive_interval: float = Config.SMTP_KEEPALIVE_INTERVAL,
+        max_messages: int = Config.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        name: str = "smtp-pool"
+    ):
+        """
+        Args:
+            connect: Fonction ouvrant une session SMTP authentifiée
+            size: Nombre maximum de sessions ouvertes simultanément
+            idle_timeout: Inactivité avant fermeture d'une session (secondes)
+            keepalive_interval: Inactivité avant NOOP de vérification (secondes)
+            max_messages: Messages par session avant renouvellement (limite du serveur)
+            name: Nom du thread de maintenance (logs)
+        """
+        self.connect = connect
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.max_messages = max(1, max_messages)
+
+        self._idle: Deque[Tuple[smtplib.SMTP, float]] = deque()  # (session, dernier usage)
+        self._sent: "WeakKeyDictionary[smtplib.SMTP, int]" = WeakKeyDictionary()  # messages par session
+        self._slots = BoundedSemaphore(self.size)
+        self._lock = Lock()
+        self._closed = Event()
+
+        self._opened = 0
+        self._reused = 0
+        self._reconnects = 0
+        self._noops = 0
+        self._expired = 0
+        self._retired = 0
+
+        self._thread = Thread(target=self._maintain, name=name, daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def session(self, fresh: bool = False) -> Iterator[smtplib.SMTP]:
+        """
+        Emprunte une session du pool (bloque si toutes sont utilisées)
+        La session est rendue au pool en sortie, ou abandonnée si la
+        connexion est rompue (refus d'un message: smtplib a déjà envoyé RSET)
+
+        Args:
+            fresh: Ouvrir une nouvelle session plutôt que réutiliser une session inactive
+
+        Yields:
+            Session SMTP authentifiée
+        """
+        if self._closed.is_set():
+            raise RuntimeError("SMTP pool is closed")
+
+        self._slots.acquire()
+        server = None
+        try:
+            server = self.connect_new() if fresh else self._checkout()
+            yield server
+        except OSError as e:
+            # SMTPException hérite d'OSError: un refus du serveur (destinataire,
+            # message) laisse la session saine, seule une connexion rompue l'abandonne
+            if isinstance(e, smtplib.SMTPException) and not isinstance(e, smtplib.SMTPServerDisconnected):
+                raise
+            self._discard(server)
+            server = None
+            raise
+        finally:
+            if server is not None:
+                self._checkin(server)
+            self._slots.release()
+
+    def run(self, operation: Callable[[smtplib.SMTP], T]) -> T:
+        """
+        Exécute une opération sur une session du pool
+        Rejoue une fois sur une nouvelle session si le serveur a fermé la connexion
+        (les autres sessions inactives, probablement coupées aussi, sont vérifiées par NOOP)
+
+        Args:
+            operation: Fonction recevant la session SMTP
+
+        Returns:
+            Résultat de l'opération
+        """
+        try:
+            with self.session() as server:
+                return operation(server)
+        except smtplib.SMTPServerDisconnected as e:
+            logger.warning(f"SMTP session disconnected ({e}), reconnecting")
+            with self._lock:
+                self._reconnects += 1
+            with self.session(fresh=True) as server:
+                return operation(server)
+
+    def connect_new(self) -> smtplib.SMTP:
+        """Ouvre une nouvelle session authentifiée (comptée dans les statistiques)"""
+        server = self.connect()
+        with self._lock:
+            self._opened += 1
+        return server
+
+    def count_message(self, server: smtplib.SMTP):
+        """Comptabilise un message envoyé sur une session"""
+        with self._lock:
+            self._sent[server] = self._sent.get(server, 0) + 1
+
+    def remaining(self, server: smtplib.SMTP) -> int:
+        """Nombre de messages encore acceptés par la session avant renouvellement"""
+        with self._lock:
+            return self.max_messages - self._sent.get(server, 0)
+
+    def close(self):
+        """Ferme toutes les sessions inactives et arrête le thread de maintenance"""
+        self._closed.set()
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for server, _ in idle:
+            self._quit(server)
+        logger.info(f"SMTP pool closed ({len(idle)} sessions)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Statistiques de réutilisation des sessions
+
+        Returns:
+            Dictionnaire avec sessions ouvertes, réutilisées, reconnexions et NOOP
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "opened": self._opened,
+                "reused": self._reused,
+                "reconnects": self._reconnects,
+                "noops": self._noops,
+                "expired": self._expired,
+                "retired": self._retired
+            }
+
+    def _checkout(self) -> smtplib.SMTP:
+        """Retourne une session vivante: la plus récente du pool, sinon une nouvelle"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                self._expire(server)
+                continue
+            if idle_for > self.keepalive_interval and not self._noop(server):
+                continue
+            with self._lock:
+                self._reused += 1
+            return server
+
+        return self.connect_new()
+
+    def _checkin(self, server: smtplib.SMTP):
+        """Rend une session au pool (fermée si sa limite de messages est atteinte)"""
+        with self._lock:
+            exhausted = self._sent.get(server, 0) >= self.max_messages
+            if exhausted:
+                self._retired += 1
+            elif not self._closed.is_set() and len(self._idle) < self.size:
+                self._idle.append((server, time.monotonic()))
+                return
+        self._quit(server)
+
+    def _noop(self, server: smtplib.SMTP) -> bool:
+        """Vérifie une session par NOOP; la ferme si le serveur ne répond pas 250"""
+        with self._lock:
+            self._noops += 1
+        try:
+            code, _ = server.noop()
+            if code == 250:
+                return True
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._discard(server)
+        return False
+
+    def _expire(self, server: smtplib.SMTP):
+        """Ferme une session inactive depuis plus de idle_timeout"""
+        with self._lock:
+            self._expired += 1
+        self._quit(server)
+
+    def _discard(self, server: Optional[smtplib.SMTP]):
+        """Abandonne une session inutilisable sans QUIT (connexion déjà rompue)"""
+        if server is None:
+            return
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _quit(server: smtplib.SMTP):
+        """Ferme proprement une session (QUIT)"""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _maintain(self):
+        """Thread de maintenance: NOOP des sessions inactives, fermeture des sessions expirées"""
+        interval = max(1.0, min(self.keepalive_interval, self.idle_timeout) / 2)
+        while not self._closed.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                idle = list(self._idle)
+                self._idle.clear()
+
+            keep = []
+            for server, last_used in idle:
+                if now - last_used > self.idle_timeout:
+                    self._expire(server)
+                elif now - last_used > self.keepalive_interval:
+                    if self._noop(server):
+                        keep.append((server, last_used))
+                else:
+                    keep.append((server, last_used))
+
+            with self._lock:
+                # Les sessions rendues pendant la maintenance sont plus récentes
+                self._idle.extendleft(reversed(keep))
@@ -0,0 +1,334 @@
+"""
+Templates d'e-mails précompilés
+Chaque fichier est lu une fois et découpé en morceaux statiques (bytes déjà
+encodés) et emplacements {{nom}}; le rendu est une simple jointure de bytes
+Templates par formulaire (templates/forms/<form_id>/) rechargés à chaud
+quand le fichier change sur disque
+"""
+import html
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from config.constants import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Emplacement à remplacer: {{nom}}
+SLOT_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# Conversion HTML -> texte (alternative text/plain dérivée d'un template HTML)
+_HEAD = re.compile(r'<(head|style|script)\b.*?</\1>', re.S | re.I)
+_BLOCK_END = re.compile(r'</?(p|div|h[1-6]|br|tr|li)\b[^>]*>', re.I)
+_TAG = re.compile(r'<[^>]+>')
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+
+
+class CompiledTemplate:
+    """
+    Template découpé: chunks[0] + valeur(slots[0]) + chunks[1] + ...
+
+    Les valeurs sont échappées pour le HTML si le template est au format HTML.
+    """
+
+    def __init__(self, source: str, name: str = "template", escape_html: bool = False):
+        """
+        Args:
+            source: Texte du template avec emplacements {{nom}}
+            name: Nom du template (logs, erreurs)
+            escape_html: Échapper les valeurs insérées (templates HTML)
+        """
+        parts = SLOT_PATTERN.split(source)
+        self.source = source
+        self.name = name
+        self.escape_html = escape_html
+        self.text_chunks: List[str] = parts[0::2]
+        self.chunks: List[bytes] = [part.encode('utf-8') for part in self.text_chunks]
+        self.slots: List[str] = parts[1::2]
+        self.slot_names = frozenset(self.slots)
+
+    def render_bytes(self, values: Mapping[str, Any]) -> bytes:
+        """
+        Rend le template en UTF-8
+
+        Args:
+            values: Valeur de chaque emplacement
+
+        Returns:
+            Contenu rendu encodé en UTF-8
+
+        Raises:
+            KeyError: Si un emplacement n'a pas de valeur
+        """
+        encoded = {slot: value.encode('utf-8') for slot, value in self.slot_values(values).items()}
+        out: List[bytes] = [b""] * (2 * len(self.slots) + 1)
+        out[0::2] = self.chunks
+        out[1::2] = [encoded[slot] for slot in self.slots]
+        return b"".join(out)
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        """Rend le template en texte (voir render_bytes)"""
+        rendered = self.slot_values(values)
+        out: List[str] = [""] * (2 * len(self.slots) + 1)
+        out[0::2] = self.text_chunks
+        out[1::2] = [rendered[slot] for slot in self.slots]
+        return "".join(out)
+
+    def slot_values(self, values: Mapping[str, Any]) -> Dict[str, str]:
+        """Valeurs des emplacements, converties (et échappées pour le HTML) une fois chacune"""
+        if self.escape_html:
+            return {slot: html.escape(str(values[slot])) for slot in self.slot_names}
+        return {slot: str(values[slot]) for slot in self.slot_names}
+
+
+def html_to_text(source: str) -> str:
+    """
+    Dérive un texte brut lisible d'un template HTML (les emplacements sont conservés)
+
+    Args:
+        source: Template HTML
+
+    Returns:
+        Template texte
+    """
+    text = _HEAD.sub('', source)
+    text = _BLOCK_END.sub('\n', text)
+    text = html.unescape(_TAG.sub('', text))
+    lines = [line.strip() for line in text.splitlines()]
+    return _BLANK_LINES.sub('\n\n', "\n".join(lines)).strip() + "\n"
+
+
+class TemplateRegistry:
+    """
+    Templates compilés, indexés par fichier
+
+    Recherche d'abord templates/forms/<form_id>/<nom>, puis templates/<nom>.
+    L'horodatage des fichiers est vérifié au plus toutes les reload_interval
+    secondes; un fichier modifié est recompilé au rendu suivant. Le cache
+    (fichiers absents compris: form_id vient de la requête) est un LRU de
+    max_entries chemins.
+    Sans fichier <nom>.txt, l'alternative texte est dérivée du HTML (une fois par version).
+    """
+
+    def __init__(self, directory: str = Config.TEMPLATES_DIR,
+                 reload_interval: float = Config.TEMPLATES_RELOAD_INTERVAL,
+                 max_entries: int = Config.TEMPLATES_CACHE_SIZE):
+        """
+        Args:
+            directory: Répertoire des templates
+            reload_interval: Intervalle minimal entre deux vérifications d'un fichier (secondes, 0 = toujours)
+            max_entries: Chemins gardés en cache (les moins récemment utilisés sont évincés)
+        """
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.max_entries = max(1, max_entries)
+        # chemin -> (template, (mtime_ns, taille), dernière vérification), du moins au plus récent
+        self._cache: "OrderedDict[str, Tuple[Optional[CompiledTemplate], Optional[Tuple[int, int]], float]]" = OrderedDict()
+        # chemin du HTML -> (template HTML, alternative texte dérivée)
+        self._derived: Dict[str, Tuple[CompiledTemplate, CompiledTemplate]] = {}
+        self._lock = Lock()
+        self._loads = 0
+        self._reloads = 0
+        self._evictions = 0
+
+    def get(self, name: str, form_id: Optional[str] = None) -> CompiledTemplate:
+        """
+        Retourne le template compilé d'un formulaire (ou le template par défaut)
+
+        Args:
+            name: Nom du fichier (ex: "confirmation.html", "confirmation.txt")
+            form_id: Identifiant du formulaire (optionnel)
+
+        Returns:
+            Template compilé
+
+        Raises:
+            FileNotFoundError: Si aucun fichier ne correspond
+        """
+        if form_id:
+            template = self._load(os.path.join(self.directory, "forms", _safe_form_id(form_id), name))
+            if template is not None:
+                return template
+        template = self._load(os.path.join(self.directory, name))
+        if template is None:
+            raise FileNotFoundError(f"Template not found: {name}")
+        return template
+
+    def get_text(self, name: str, form_id: Optional[str] = None) -> CompiledTemplate:
+        """
+        Retourne l'alternative text/plain d'un template HTML
+        (<nom>.txt s'il existe, sinon dérivée du HTML et mise en cache)
+
+        Args:
+            name: Nom du template HTML (ex: "confirmation.html")
+            form_id: Identifiant du formulaire (optionnel)
+
+        Returns:
+            Template texte compilé
+        """
+        text_name = os.path.splitext(name)[0] + ".txt"
+        try:
+            return self.get(text_name, form_id)
+        except FileNotFoundError:
+            pass
+
+        html_template = self.get(name, form_id)
+        cached = self._derived.get(html_template.name)
+        if cached is not None and cached[0] is html_template:
+            return cached[1]
+
+        # Nouvelle version du HTML: dériver une fois et mettre en cache
+        derived = CompiledTemplate(html_to_text(html_template.source), text_name)
+        with self._lock:
+            self._derived[html_template.name] = (html_template, derived)
+        return derived
+
+    def preload(self, *names: str) -> int:
+        """
+        Compile les templates par défaut au démarrage (le premier envoi ne lit pas le disque)
+
+        Args:
+            names: Noms des templates HTML
+
+        Returns:
+            Nombre de templates compilés
+        """
+        loaded = 0
+        for name in names:
+            try:
+                self.get(name)
+                self.get_text(name)
+                loaded += 1
+            except FileNotFoundError as e:
+                logger.warning(str(e))
+        return loaded
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du cache de templates
+
+        Returns:
+            Dictionnaire avec templates en cache, chargements et rechargements
+        """
+        with self._lock:
+            return {
+                "cached": sum(1 for template, _, _ in self._cache.values() if template is not None),
+                "entries": len(self._cache),
+                "loads": self._loads,
+                "reloads": self._reloads,
+                "evictions": self._evictions
+            }
+
+    def _load(self, path: str) -> Optional[CompiledTemplate]:
+        """Retourne le template d'un fichier, recompilé si le fichier a changé (None si absent)"""
+        now = time.monotonic()
+        # Lecture sans verrou: les entrées sont des tuples remplacés d'un bloc
+        cached = self._cache.get(path)
+        if cached is not None and now - cached[2] < self.reload_interval:
+            with self._lock:
+                if path in self._cache:
+                    self._cache.move_to_end(path)
+            return cached[0]
+
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+
+        if cached is not None and cached[1] == version:
+            self._store(path, (cached[0], version, now))
+            return cached[0]
+
+        template = None
+        if version is not None:
+            with open(path, 'r', encoding='utf-8') as f:
+                template = CompiledTemplate(f.read(), path, escape_html=path.endswith(('.html', '.htm')))
+            with self._lock:
+                if cached is not None and cached[0] is not None:
+                    self._reloads += 1
+                    logger.info(f"Template reloaded: {path}")
+                self._loads += 1
+        self._store(path, (template, version, now))
+        return template
+
+    def _store(self, path: str, entry: Tuple[Optional[CompiledTemplate], Optional[Tuple[int, int]], float]):
+        """Met à jour une entrée du cache et évince les moins récemment utilisées"""
+        with self._lock:
+            self._cache[path] = entry
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_entries:
+                evicted, _ = self._cache.popitem(last=False)
+                self._derived.pop(evicted, None)
+                self._evictions += 1
+
+
+def _safe_form_id(form_id: str) -> str:
+    """Nom de répertoire sûr pour un identifiant de formulaire (pas de ../)"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', form_id)
+
+
+# (minute, date formatée, année) de la dernière confirmation rendue
+_clock: Tuple[int, str, str] = (-1, "", "")
+
+
+def confirmation_values(display_name: str, email: str, timestamp: Optional[str] = None) -> Dict[str, str]:
+    """
+    Valeurs des emplacements du template de confirmation (une seule lecture de l'horloge)
+
+    Args:
+        display_name: Nom affiché
+        email: Adresse e-mail du répondant
+        timestamp: Date affichée (maintenant par défaut)
+
+    Returns:
+        Dictionnaire display_name, email, timestamp, year
+    """
+    global _clock
+    minute = int(time.time() // 60)
+    if _clock[0] != minute:
+        # Date affichée à la minute: formatée une fois par minute
+        now = datetime.now()
+        _clock = (minute, now.strftime("%d/%m/%Y à %H:%M"), str(now.year))
+    return {
+        "display_name": display_name,
+        "email": email,
+        "timestamp": timestamp or _clock[1],
+        "year": _clock[2]
+    }
+
+
+def render_confirmation(display_name: str, email: str, form_id: Optional[str] = None,
+                        timestamp: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Rend l'e-mail de confirmation (HTML et alternative texte)
+
+    Args:
+        display_name: Nom affiché
+        email: Adresse e-mail du répondant
+        form_id: Identifiant du formulaire (template spécifique optionnel)
+        timestamp: Date affichée (maintenant par défaut)
+
+    Returns:
+        Tuple (html, texte)
+    """
+    values = confirmation_values(display_name, email, timestamp)
+    return (
+        templates.get(CONFIRMATION_TEMPLATE, form_id).render(values),
+        templates.get_text(CONFIRMATION_TEMPLATE, form_id).render(values)
+    )
+
+
+CONFIRMATION_TEMPLATE = "confirmation.html"
+
+# Instance globale partagée par les services
+templates = TemplateRegistry(
+    os.getenv('TEMPLATES_DIR', Config.TEMPLATES_DIR),
+    float(os.getenv('TEMPLATES_RELOAD_INTERVAL', Config.TEMPLATES_RELOAD_INTERVAL)),
+    int(os.getenv('TEMPLATES_CACHE_SIZE', Config.TEMPLATES_CACHE_SIZE))
+)
@@ -2,9 +2,13 @@
 Utilitaires de validation et normalisation des données
 """
 import re
-from typing import Optional
+import hashlib
+from datetime import datetime
+from typing import Optional, Dict, Any
 from email_validator import validate_email, EmailNotValidError
 
+from config.constants import ErrorMessages
+
 
 def is_valid_email(email: str) -> bool:
     """
@@ -122,3 +126,75 @@ def truncate_text(text: str, max_length: int, suffix: str = "...") -> str:
         return text
     
     return text[:max_length - len(suffix)] + suffix
+
+
+def generate_response_id(email: str, phone: str, timestamp: Optional[str] = None) -> str:
+    """
+    Génère un ID unique pour une réponse
+    
+    Args:
+        email: E-mail du répondant
+        phone: Téléphone du répondant
+        timestamp: Timestamp de la réponse
+        
+    Returns:
+        ID unique hashé
+    """
+    if not timestamp:
+        timestamp = datetime.utcnow().isoformat()
+    
+    data = f"{email}:{phone}:{timestamp}"
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def parse_submission(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extrait, valide et normalise une soumission de formulaire
+    Supporte le format Google Apps Script (namedValues) et le format direct
+    
+    Args:
+        data: Corps JSON de la soumission
+        
+    Returns:
+        Dictionnaire avec response_id, email, phone, name, timestamp et form_id
+        
+    Raises:
+        ValueError: Si des champs sont manquants ou invalides
+    """
+    if not isinstance(data, dict):
+        raise ValueError(ErrorMessages.MISSING_REQUIRED_FIELDS.format(fields="email, phone"))
+    
+    if 'namedValues' in data:
+        # Format Google Apps Script standard
+        named_values = data['namedValues']
+        email = named_values.get('Adresse e-mail', named_values.get('Email', ['']))[0]
+        phone = named_values.get('Téléphone', named_values.get('Phone', ['']))[0]
+        name = named_values.get('Nom', named_values.get('Name', ['']))[0]
+    else:
+        # Format direct
+        email = data.get('email')
+        phone = data.get('phone')
+        name = data.get('name')
+    timestamp = data.get('timestamp', datetime.utcnow().isoformat())
+    form_id = data.get('form_id') or data.get('formId')
+    
+    if not email or not phone:
+        raise ValueError(ErrorMessages.MISSING_REQUIRED_FIELDS.format(fields="email, phone"))
+    
+    if not is_valid_email(email):
+        raise ValueError(ErrorMessages.INVALID_EMAIL.format(email=email))
+    
+    if not is_valid_phone(phone):
+        raise ValueError(ErrorMessages.INVALID_PHONE.format(phone=phone))
+    
+    phone = normalize_phone(phone)
+    name = sanitize_name(name) if name else None
+    
+    return {
+        "response_id": generate_response_id(email, phone, timestamp),
+        "email": email,
+        "phone": phone,
+        "name": name,
+        "timestamp": timestamp,
+        "form_id": str(form_id) if form_id else None
+    }
@@ -0,0 +1,252 @@
+"""
+Spool d'écriture local (write-ahead) utilisé quand la base distante est indisponible
+Les écritures refusées sont journalisées sur disque (append + fsync) puis
+rejouées par lots une fois la base de nouveau joignable
+"""
+import os
+import json
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from config.constants import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Nombre maximum de journaux par chemin (un par processus: path, path.1, path.2...)
+MAX_SLOTS = 64
+
+
+def claim_slot(path: str) -> Tuple[str, Optional[int]]:
+    """
+    Verrouille le premier fichier libre parmi path, path.1, path.2... (flock non bloquant)
+    Le verrou est tenu jusqu'à release_slot() ou la fin du processus
+
+    Args:
+        path: Chemin du journal
+
+    Returns:
+        (chemin de l'emplacement, descripteur du verrou; None sans fcntl)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        return path, None
+
+    for slot in range(MAX_SLOTS):
+        candidate = path if slot == 0 else f"{path}.{slot}"
+        fd = os.open(candidate + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return candidate, fd
+    raise RuntimeError(f"No free journal slot for {path}")
+
+
+def release_slot(fd: Optional[int]):
+    """Libère le verrou d'un emplacement (voir claim_slot)"""
+    if fd is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class WriteSpool:
+    """
+    Écritures en attente indexées par clé (response_id), adossées à un journal JSON-lines
+
+    Une clé n'a qu'une entrée en attente: une nouvelle entrée "put" remplace
+    la précédente (dernière version du document). Les entrées rejouées sont
+    marquées "done"; le journal est compacté quand le spool est vide.
+
+    Chaque processus (worker uvicorn) verrouille son propre fichier: le
+    premier emplacement libre parmi path, path.1, path.2... Au redémarrage,
+    les workers reprennent ces emplacements et rejouent leur contenu.
+    """
+
+    def __init__(self, path: str = Config.SPOOL_PATH, compact_threshold: int = Config.SPOOL_COMPACT_THRESHOLD):
+        """
+        Args:
+            path: Chemin du journal sur disque
+            compact_threshold: Entrées "done" avant compaction du journal
+        """
+        self.compact_threshold = compact_threshold
+        self._lock_fd: Optional[int] = None
+        self.path = self._claim_slot(path)
+
+        self._pending: Dict[str, Dict[str, Any]] = {}  # clé -> entrée "put"
+        self._journal = None
+        self._lock = Lock()
+        self._done_since_compaction = 0
+
+        self._spooled = 0
+        self._replayed = 0
+
+        self._pending = {entry['key']: entry for entry in self._replay_journal()}
+        if self._pending:
+            logger.warning(f"Write spool {self.path}: {len(self._pending)} pending writes to replay")
+        self._compact_journal()
+
+    def _claim_slot(self, path: str) -> str:
+        """Verrouille le premier fichier de spool libre (flock non bloquant)"""
+        path, self._lock_fd = claim_slot(path)
+        return path
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pending
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne l'écriture en attente pour une clé
+
+        Args:
+            key: Clé de l'écriture (response_id)
+
+        Returns:
+            Données de l'écriture ou None
+        """
+        entry = self._pending.get(key)
+        return entry['write'] if entry else None
+
+    def put(self, key: str, write: Dict[str, Any]):
+        """
+        Journalise durablement une écriture (remplace l'entrée existante pour la clé)
+
+        Args:
+            key: Clé de l'écriture (response_id)
+            write: Données de l'écriture (sérialisables en JSON)
+        """
+        with self._lock:
+            previous = self._pending.get(key)
+            entry = {
+                "op": "put",
+                "key": key,
+                "write": write,
+                "spooled_at": previous['spooled_at'] if previous else time.time()
+            }
+            self._append_journal([entry])
+            self._pending[key] = entry
+            self._spooled += 1
+
+    def pending(self, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Retourne les écritures en attente, plus anciennes d'abord
+
+        Args:
+            limit: Nombre maximum d'écritures
+
+        Returns:
+            Liste de (clé, données de l'écriture)
+        """
+        with self._lock:
+            entries = sorted(self._pending.values(), key=lambda e: e['spooled_at'])
+        return [(entry['key'], entry['write']) for entry in entries[:limit]]
+
+    def mark_done(self, keys: Iterable[str], writes: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Retire des écritures rejouées (un seul fsync pour le lot)
+        Une entrée remplacée depuis sa lecture (write différent) est conservée
+
+        Args:
+            keys: Clés rejouées
+            writes: Données rejouées par clé (pour détecter les remplacements)
+        """
+        with self._lock:
+            done = []
+            for key in keys:
+                entry = self._pending.get(key)
+                if entry is None or (writes is not None and entry['write'] != writes.get(key)):
+                    continue
+                del self._pending[key]
+                done.append({"op": "done", "key": key})
+            if not done:
+                return
+            self._append_journal(done)
+            self._replayed += len(done)
+            self._done_since_compaction += len(done)
+
+            if not self._pending and self._done_since_compaction >= self.compact_threshold:
+                self._compact_journal()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du spool
+
+        Returns:
+            Dictionnaire avec écritures en attente, spoolées et rejouées
+        """
+        now = time.time()
+        oldest = min((e['spooled_at'] for e in self._pending.values()), default=None)
+        return {
+            "pending": len(self._pending),
+            "spooled": self._spooled,
+            "replayed": self._replayed,
+            "oldest_pending_age_seconds": round(now - oldest, 3) if oldest else 0
+        }
+
+    def close(self):
+        """Ferme le journal et libère l'emplacement"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            release_slot(self._lock_fd)
+            self._lock_fd = None
+
+    def _append_journal(self, entries: List[Dict[str, Any]]):
+        """Ajoute des entrées au journal puis fsync (verrou détenu)"""
+        if self._journal is None:
+            self._journal = open(self.path, 'a', encoding='utf-8')
+        self._journal.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _replay_journal(self) -> List[Dict[str, Any]]:
+        """
+        Relit le journal et retourne les écritures non rejouées
+
+        Returns:
+            Liste des dernières entrées "put" sans "done" correspondant
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        pending: Dict[str, Dict[str, Any]] = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Ligne tronquée par un crash pendant l'écriture
+                    continue
+                if entry.get('op') == 'put':
+                    pending[entry['key']] = entry
+                elif entry.get('op') == 'done':
+                    pending.pop(entry['key'], None)
+        return list(pending.values())
+
+    def _compact_journal(self):
+        """Réécrit le journal avec uniquement les écritures en attente"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._pending.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._done_since_compaction = 0